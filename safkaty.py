@@ -11,95 +11,40 @@ Run:
 
 import os
 import re
+import sys
 import csv
 import time
+import zlib
 import queue
+import random
+import base64
+import hashlib
+import unicodedata
 import sqlite3
 import threading
+import multiprocessing
 import webbrowser
 import urllib.parse
-from dataclasses import dataclass
-from datetime import datetime
+from array import array
+from html.parser import HTMLParser
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, List, Tuple, Callable, Sequence, Iterator
 
 
 
 # === SAFKATY_PATCH_V21_1 ===
-# Multi-Lot: Jeder Lot = eigene Zeile ("REF | Lot X")
-# Diese Funktionen werden von der bestehenden App genutzt, ohne GUI zu ändern.
+# Multi-Lot: früher jeder Lot = eigene Zeile ("REF | Lot X").
+# Lots liegen jetzt normalisiert in tender_lots (siehe Database/_migrate_lot_suffixes);
+# safkaty_expand_rows_with_lots bleibt nur für externe Aufrufer erhalten. Lot-Popups parst allein iter_lots_popup.
 
 import json
 
-def _safkaty_norm(s: str) -> str:
-    return re.sub(r"\s+", " ", (s or "")).strip()
-
-def _safkaty_money(s: str) -> str:
-    if not s:
-        return ""
-    # akzeptiert: 400 200,00 / 400.200,00 / 400200.00
-    m = re.search(r"([0-9][0-9\s\.,\u00A0\u202F]*)\s*(DH|DHS|MAD)?", s, flags=re.I)
-    if not m:
-        return ""
-    num = _safkaty_norm(m.group(1))
-    cur = (m.group(2) or "").strip()
-    if cur:
-        return f"{num} {cur}".replace("  ", " ")
-    # wenn Währung fehlt: bei marchespublics fast immer DH
-    return f"{num} DH"
-
-def safkaty_parse_lots_popup(popup_html: str):
-    """
-    Robust: erkennt Lot-Header:
-      Lot 1:, Lot 1 -, Lot 1 – , Lot 1 — , Lot 1 (ohne Trenner)
-    und liest Estimation/Caution nur innerhalb des aktuellen Lot-Blocks.
-    """
-    from bs4 import BeautifulSoup
-
-    soup = BeautifulSoup(popup_html or "", "html.parser")
-    txt = soup.get_text("\n", strip=True)
-    lines = [_safkaty_norm(x) for x in (txt.split("\n") if txt else []) if _safkaty_norm(x)]
-
-    lots = []
-    cur = None
-    buf = []
-
-    def flush():
-        nonlocal cur, buf, lots
-        if cur is None:
-            return
-        est = ""
-        cau = ""
-        # Zeilenweise: Wert kann nach ":" kommen oder in der nächsten Zeile
-        for i, ln in enumerate(buf):
-            if re.match(r"^Estimation\b", ln, flags=re.I):
-                if ":" in ln:
-                    est = _safkaty_money(ln.split(":", 1)[1])
-                else:
-                    est = _safkaty_money(buf[i+1] if i+1 < len(buf) else "")
-            if re.match(r"^Caution\s+provisoire\b", ln, flags=re.I):
-                if ":" in ln:
-                    cau = _safkaty_money(ln.split(":", 1)[1])
-                else:
-                    cau = _safkaty_money(buf[i+1] if i+1 < len(buf) else "")
-
-        lots.append({"lot": int(cur), "estimation": _safkaty_norm(est), "caution": _safkaty_norm(cau)})
-        cur = None
-        buf = []
-
-    for ln in lines:
-        m = re.match(r"^Lot\s*(?:n[°o]\s*)?(\d+)\b(?:\s*[:\-–—]\s*.*)?$", ln, flags=re.I)
-        if m:
-            flush()
-            cur = m.group(1)
-            buf = []
-        else:
-            if cur is not None:
-                buf.append(ln)
-
-    flush()
-    return lots
-
 def safkaty_expand_rows_with_lots(rows):
     """
     rows: Liste von dict oder tuples aus deiner App.
@@ -151,40 +96,127 @@ from tkinter import ttk, messagebox, filedialog
 from tkinter.scrolledtext import ScrolledText
 
 
-def safe_float_amount(text: str) -> Optional[float]:
-    if not text:
-        return None
-    t = text.strip().replace("\u00A0", " ")
-    t = re.sub(r"(MAD|DH|DHS|Dirhams?)", "", t, flags=re.IGNORECASE).strip()
-    t = t.replace(" ", "")
-    if "," in t and t.count(",") == 1:
-        t = t.replace(".", "").replace(",", ".")
-    m = re.search(r"(\d+(?:\.\d+)?)", t)
-    if not m:
-        return None
+try:
+    import numpy as np  # optional: normalize_amounts(..., as_array=True)
+except ImportError:
+    np = None
+
+
+# --- Beträge / Datumsangaben normalisieren (Suchergebnis, Detailseite und Lot-Popup nutzen dieselbe Grammatik) ---
+# Betrag = Ziffern in 3er-Gruppen (getrennt durch Leerzeichen/NBSP, "." oder ",") oder am Stück, optional
+# Dezimalteil und Währung (DH, DHS, MAD, Dirham(s)). Zeilenumbrüche trennen Zahlen. Kommen "," und "." vor, ist das letzte der Dezimaltrenner. Ein einzelner Trenner mit genau 3 Folgeziffern
+# oder ein mehrfach vorkommender Trenner gruppiert Tausender, sonst trennt er Dezimalstellen:
+#   "400 200,00" = "400.200,00" = "400200.00" = "400.200" = 400200.0; "1,234.50 DH" = 1234.5; "12,5" = 12.5
+_AMOUNT_RX = re.compile(
+    r"((?:\d{1,3}(?:[ \u00A0\u202F.,]\d{3})+|\d+)(?:[.,]\d+)?)"
+    r"(?:[ \u00A0\u202F]*(DHS?|MAD|Dirhams?)(?![A-Za-z]))?",
+    re.IGNORECASE,
+)
+_AMOUNT_SPACES_RX = re.compile(r"[\s\u00A0\u202F]+")
+_NON_DIGIT_RX = re.compile(r"\D")
+_DATE_DMY_RX = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+_DATE_ISO_RX = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+
+
+def _amount_value(token: str) -> Optional[float]:
+    t = _AMOUNT_SPACES_RX.sub("", token)
+    last_comma, last_dot = t.rfind(","), t.rfind(".")
+    if last_comma >= 0 and last_dot >= 0:
+        dec, thousands = (",", ".") if last_comma > last_dot else (".", ",")
+        t = t.replace(thousands, "").replace(dec, ".")
+    elif last_comma >= 0 or last_dot >= 0:
+        sep = "," if last_comma >= 0 else "."
+        parts = t.split(sep)
+        if len(parts) > 2 or (len(parts[1]) == 3 and parts[0].lstrip("0")):
+            t = t.replace(sep, "")
+        else:
+            t = t.replace(sep, ".")
     try:
-        return float(m.group(1))
-    except Exception:
+        return float(t)
+    except ValueError:
         return None
 
 
+def find_amount(text: Optional[str], require_hint: bool = False) -> Optional[Tuple[str, str]]:
+    """
+    Ersten Betrag im Text finden -> (Zahl mit normalisierten Leerzeichen, Währung in Großbuchstaben oder "").
+    require_hint: nur Kandidaten mit Trenner ("," / ".") oder Währung und höchstens 15 Ziffern
+    (überspringt Telefonnummern, IDs usw.).
+    """
+    for m in _AMOUNT_RX.finditer(text or ""):
+        num, cur = m.group(1), (m.group(2) or "").upper()
+        if require_hint:
+            if "," not in num and "." not in num and not cur:
+                continue
+            if len(_NON_DIGIT_RX.sub("", num)) > 15:
+                continue
+        if cur.startswith("DIRHAM"):
+            cur = "DH"
+        return _AMOUNT_SPACES_RX.sub(" ", num), cur
+    return None
+
+
+def normalize_amount(text: Optional[str]) -> Optional[float]:
+    """Ersten Betrag im Text als float, None wenn keiner."""
+    if not text:
+        return None
+    m = _AMOUNT_RX.search(text)
+    return _amount_value(m.group(1)) if m else None
+
+
+def normalize_amounts(texts, as_array: bool = False):
+    """
+    Batch-Variante von normalize_amount (Lots, Import): gleiche Strings werden nur einmal geparst.
+    as_array=True liefert mit NumPy ein float64-Array (NaN = kein Betrag), ohne NumPy eine Liste.
+    """
+    texts = list(texts)
+    memo: Dict[Optional[str], Optional[float]] = dict.fromkeys(texts)
+    for t in memo:
+        memo[t] = normalize_amount(t)
+    out = [memo[t] for t in texts]
+    if as_array and np is not None:
+        return np.array([np.nan if v is None else v for v in out], dtype=np.float64)
+    return out
+
+
+def safe_float_amount(text: str) -> Optional[float]:
+    return normalize_amount(text)
+
+
 def parse_date_ddmmyyyy(text: str) -> Optional[str]:
-    """Parst dd/mm/yyyy (ggf. mit Uhrzeit) ODER yyyy-mm-dd."""
+    """Parst d/m/yyyy bzw. dd/mm/yyyy (ggf. mit Uhrzeit) ODER yyyy-mm-dd -> yyyy-mm-dd."""
     if not text:
         return None
-    # dd/mm/yyyy
-    m = re.search(r"(\d{2})/(\d{2})/(\d{4})", text)
+    m = _DATE_DMY_RX.search(text)
+    if m:
+        return f"{m.group(3)}-{int(m.group(2)):02d}-{int(m.group(1)):02d}"
+    m = _DATE_ISO_RX.search(text)
     if m:
-        dd, mm, yyyy = m.group(1), m.group(2), m.group(3)
-        return f"{yyyy}-{mm}-{dd}"
-    # yyyy-mm-dd
-    m2 = re.search(r"(\d{4})-(\d{2})-(\d{2})", text)
-    if m2:
-        yyyy, mm, dd = m2.group(1), m2.group(2), m2.group(3)
-        return f"{yyyy}-{mm}-{dd}"
+        return f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
     return None
 
 
+def parse_dates(texts) -> List[Optional[str]]:
+    """Batch-Variante von parse_date_ddmmyyyy (gleiche Strings nur einmal)."""
+    texts = list(texts)
+    memo: Dict[Optional[str], Optional[str]] = dict.fromkeys(texts)
+    for t in memo:
+        memo[t] = parse_date_ddmmyyyy(t)
+    return [memo[t] for t in texts]
+
+
+def deadline_ts(echeance: Optional[str], echeance_time: str = "") -> Optional[str]:
+    """
+    Kombinierter, sortierbarer Frist-Zeitstempel "yyyy-mm-dd HH:MM" (Spalte tenders.echeance_at).
+    Ohne Uhrzeit gilt die Frist bis Tagesende (23:59).
+    """
+    if not echeance or not re.fullmatch(r"\d{4}-\d{2}-\d{2}", echeance.strip()):
+        return None
+    m = re.search(r"\b(\d{1,2}):(\d{2})\b", echeance_time or "")
+    hhmm = f"{int(m.group(1)):02d}:{m.group(2)}" if m else "23:59"
+    return f"{echeance.strip()} {hhmm}"
+
+
 def fmt_money(maybe_float: Optional[float]) -> str:
     if maybe_float is None:
         return "—"
@@ -220,14 +252,557 @@ class Tender:
     contact_email: str = ""
     contact_phone: str = ""
     url: str = ""
+    lots: List["TenderLot"] = field(default_factory=list)
 
 
-class Database:
+@dataclass
+class TenderLot:
+    lot_no: int
+    title: str = ""
+    estimation: Optional[float] = None
+    caution: Optional[float] = None
+
+
+def parse_lots_json(lots_json: str) -> List[TenderLot]:
+    """lots_json aus fetch_details_by_url -> Liste TenderLot (sortiert, ohne Duplikate)."""
+    if not lots_json:
+        return []
+    try:
+        raw = json.loads(lots_json) or []
+    except Exception:
+        return []
+    items = [x for x in (raw if isinstance(raw, list) else []) if isinstance(x, dict)]
+    amounts = normalize_amounts([x.get("estimation") or "" for x in items] + [x.get("caution") or "" for x in items])
+    lots: Dict[int, TenderLot] = {}
+    for i, x in enumerate(items):
+        try:
+            no = int(x.get("lot"))
+        except (TypeError, ValueError):
+            continue
+        lots[no] = TenderLot(
+            lot_no=no,
+            title=(x.get("lot_title") or "").strip(),
+            estimation=amounts[i],
+            caution=amounts[len(items) + i],
+        )
+    return [lots[k] for k in sorted(lots)]
+
+
+# --- Lot-Popup (commun.PopUpDetailLots) ---
+# Ein Durchlauf über die Textknoten: jede Zeile wird genau einmal angesehen, offene Labels
+# ("Estimation" ohne Wert) warten höchstens LOT_LOOKAHEAD Folgezeilen auf ihren Betrag.
+LOT_LOOKAHEAD = 9
+_WS_RX = re.compile(r"\s+")
+_LOT_HEADER_RX = re.compile(r"^Lot\s*(?:n[°o]\s*)?(\d+)\b(?:\s*(?:[:\-–—].*)?)?$", re.IGNORECASE)
+_LOT_STOP_RX = re.compile(r"^Lot\s*(?:n[°o]\s*)?\d+\b", re.IGNORECASE)
+_LOT_LABEL_STOP_RX = re.compile(
+    r"^(Estimation|Caution\s+provisoire|Cat[ée]gorie|Objet|Acheteur\s+public|Lieu|Date\s+et\s+heure|Date\s+limite"
+    r"|Proc[ée]dure|Type\s+d'annonce|Allotissement)\b",
+    re.IGNORECASE,
+)
+_LOT_LABEL_LIKE_RX = re.compile(r"^[A-Za-zÀ-ÿ]")
+_LOT_FIELD_RX = re.compile(r"^(?:(Estimation)|Caution\s+provisoire)\b", re.IGNORECASE)
+_LOT_CATEGORY_RX = re.compile(r"^Cat[ée]gorie\b", re.IGNORECASE)
+_LOT_KIND_RX = re.compile(r"^(?:Services|Travaux|Fournitures)\b", re.IGNORECASE)
+_LOT_CURRENCY_RX = re.compile(r"\b(?:DH|DHS|MAD)\b", re.IGNORECASE)
+_DASHES = ("-", "—", "–")
+
+
+def _lot_amount(text: str) -> str:
+    # nur Beträge mit Trenner oder Währung (keine Telefonnummern/IDs), siehe find_amount
+    found = find_amount(text, require_hint=True)
+    return " ".join(x for x in found if x) if found else ""
+
+
+class _LotBlock:
+    """Zustand eines Lot-Blocks (Titel, Estimation, Caution) für iter_lots_popup."""
+
+    __slots__ = ("no", "title", "title_open", "values", "pending")
+
+    def __init__(self, no: Optional[int], with_title: bool = True):
+        self.no = no
+        self.title = ""
+        self.title_open = with_title
+        # Feld -> None (Label noch nicht gesehen) / "" (gesehen, kein Betrag) / Betrag
+        self.values: Dict[str, Optional[str]] = {"estimation": None, "caution": None}
+        # Feld -> verbleibende Folgezeilen, in denen der Betrag noch stehen darf
+        self.pending: Dict[str, int] = {}
+
+    def active(self) -> bool:
+        return bool(self.pending) or None in self.values.values()
+
+    def feed(self, ln: str):
+        # Titel = erste sinnvolle Zeile vor "Catégorie" (Kategoriezeilen zählen nicht)
+        if self.title_open:
+            if _LOT_CATEGORY_RX.match(ln):
+                self.title_open = False
+            elif not _LOT_KIND_RX.match(ln) and ln not in _DASHES:
+                self.title, self.title_open = ln, False
+
+        if self.pending:
+            stop = None
+            if ln not in _DASHES and ln != ":":
+                # nächstes Label oder nächster Lot beendet die Suche (kein Estimation-Betrag für Caution)
+                stop = (_LOT_STOP_RX.match(ln) or _LOT_LABEL_STOP_RX.match(ln)
+                        or (":" in ln and _LOT_LABEL_LIKE_RX.match(ln)))
+            for f, left in list(self.pending.items()):
+                if ln in _DASHES or ln == ":":
+                    v = ""
+                elif stop:
+                    del self.pending[f]
+                    continue
+                else:
+                    v = _lot_amount(ln)
+                if v:
+                    self.values[f] = v
+                    del self.pending[f]
+                elif left > 1:
+                    self.pending[f] = left - 1
+                else:
+                    del self.pending[f]
+
+        m = _LOT_FIELD_RX.match(ln)
+        if m:
+            f = "estimation" if m.group(1) else "caution"
+            if self.values[f] is None:
+                # nur das erste Vorkommen zählt; Wert nach ":" oder in den Folgezeilen
+                v = _lot_amount(ln.split(":", 1)[1]) if ":" in ln else ""
+                self.values[f] = v
+                if not v:
+                    self.pending[f] = LOT_LOOKAHEAD
+
+    def result(self) -> Tuple[str, str]:
+        out = []
+        for f in ("estimation", "caution"):
+            v = self.values[f] or ""
+            # Portal zeigt Beträge oft ohne Währung -> DH
+            if v and not _LOT_CURRENCY_RX.search(v):
+                v += " DH"
+            out.append(v)
+        return out[0], out[1]
+
+
+class _TextNodes(HTMLParser):
+    """Sammelt die Textknoten eines HTML-Dokuments (ohne script/style) in items, ohne DOM aufzubauen."""
+
+    _SKIP = frozenset(("script", "style", "template"))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items: List = []
+        self._buf: List[str] = []
+        self._skip = 0
+
+    def _flush(self):
+        # HTMLParser liefert Text bei feed() ggf. stückweise -> erst an der nächsten Markierung abschließen
+        if self._buf:
+            self._text("".join(self._buf))
+            self._buf = []
+
+    def _text(self, node: str):
+        self.items.append(node)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    handle_decl = handle_pi = unknown_decl = handle_comment
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in self._SKIP:
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in self._SKIP and self._skip:
+            self._skip -= 1
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._buf.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _stream_parse(parser, html: str, chunk: int) -> Iterator:
+    # HTML stückweise einspeisen und parser.items nach jedem Stück abgeben: bricht der Aufrufer ab,
+    # wird der Rest des Dokuments gar nicht mehr gelesen
+    html = html or ""
+    pos = 0
+    while True:
+        parser.feed(html[pos:pos + chunk])
+        pos += chunk
+        done = pos >= len(html)
+        if done:
+            parser.close()
+        items, parser.items = parser.items, []
+        yield from items
+        if done:
+            return
+
+
+def iter_text_lines(html: str, chunk: int = 1 << 16) -> Iterator[str]:
+    """Nichtleere, whitespace-normalisierte Textzeilen in Dokumentreihenfolge (wie get_text("\\n", strip=True))."""
+    for node in _stream_parse(_TextNodes(), html, chunk):
+        for part in node.split("\n"):
+            ln = _WS_RX.sub(" ", part).strip()
+            if ln:
+                yield ln
+
+
+# Elemente ohne End-Tag (wie bei BeautifulSoup: werden sofort geschlossen)
+_VOID_TAGS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem", "meta",
+    "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame", "image", "isindex",
+    "nextid", "spacer",
+))
+
+
+def is_detail_href(href: str) -> bool:
+    return "EntrepriseDetailsConsultation" in href and "refConsultation=" in href
+
+
+class _TableRows(_TextNodes):
+    """
+    Streamt <tr>-Zeilen als (Textknoten, Href des ersten Detail-Links, Textknoten dieses Links).
+    Statt eines DOM nur ein Stack der offenen Tags; End-Tags schließen wie bei BeautifulSoup bis zum
+    passenden offenen Tag, verschachtelte <tr> sind eigene Zeilen. Eine Zeile wird abgegeben, sobald
+    ihr äußerstes <tr> geschlossen ist (Reihenfolge = Start-Tags, wie soup.find_all("tr")).
+    """
+
     def __init__(self):
+        super().__init__()
+        self._stack: List[list] = []      # [tag, Zeile|None, Link|None]
+        self._rows: List[list] = []       # offene Zeilen: [Nr., Texte, Href|None, Linktexte|None]
+        self._links: List[List[str]] = []  # Texte offener Detail-Links
+        self._closed: List[list] = []     # fertige Zeilen, deren äußeres <tr> noch offen ist
+        self._seq = 0
+
+    def _text(self, node: str):
+        node = node.strip()
+        if node:
+            for row in self._rows:
+                row[1].append(node)
+            for link in self._links:
+                link.append(node)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _VOID_TAGS:
+            return
+        entry = [tag, None, None]
+        if tag in self._SKIP:
+            self._skip += 1
+        elif tag == "tr":
+            entry[1] = [self._seq, [], None, None]
+            self._seq += 1
+            self._rows.append(entry[1])
+        elif tag == "a":
+            href = dict(attrs).get("href") or ""
+            if is_detail_href(href):
+                entry[2] = []
+                self._links.append(entry[2])
+                for row in self._rows:
+                    if row[2] is None:
+                        row[2], row[3] = href, entry[2]
+        self._stack.append(entry)
+
+    def handle_endtag(self, tag):
+        self._flush()
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                self._pop(i)
+                return
+
+    def _pop(self, i: int):
+        while len(self._stack) > i:
+            tag, row, link = self._stack.pop()
+            if tag in self._SKIP:
+                self._skip -= 1
+            # offene Zeilen/Links liegen in Stack-Reihenfolge -> das geschlossene Element ist immer das letzte
+            if row is not None:
+                self._closed.append(self._rows.pop())
+            if link is not None:
+                self._links.pop()
+        if self._closed and not self._rows:
+            self._closed.sort(key=lambda r: r[0])
+            self.items.extend((texts, href, link) for _no, texts, href, link in self._closed)
+            self._closed = []
+
+    def close(self):
+        super().close()
+        self._pop(0)
+
+
+def iter_table_rows(html: str, chunk: int = 1 << 13) -> Iterator[Tuple[List[str], Optional[str], Optional[List[str]]]]:
+    """<tr>-Zeilen des Dokuments nacheinander, siehe _TableRows; Abbruch spart den Rest des Dokuments."""
+    return _stream_parse(_TableRows(), html, chunk)
+
+
+def iter_lots_popup(popup_html: str) -> Iterator[Tuple[int, str, str, str]]:
+    """
+    Lot-Popup -> (lot_no, lot_title, estimation, caution), jeweils sobald der Lot-Block abgeschlossen ist.
+    Lot-Kopf: "Lot 1", "Lot n° 1 :", "Lot 1 - ..." usw.; Estimation/Caution werden nur innerhalb des
+    eigenen Blocks gelesen. Ohne Lot-Köpfe (Lot unique) gilt der ganze Text als Lot 1.
+    """
+    # Gesamttext als Lot-unique-Fallback: läuft mit, bis beide Labels entschieden sind
+    whole = _LotBlock(None, with_title=False)
+    block: Optional[_LotBlock] = None
+    emitted = False
+    for ln in iter_text_lines(popup_html):
+        if whole.active():
+            whole.feed(ln)
+        m = _LOT_HEADER_RX.match(ln)
+        if m:
+            if block is not None:
+                est, cau = block.result()
+                if est or cau or block.title:
+                    emitted = True
+                    yield block.no, block.title, est, cau
+            block = _LotBlock(int(m.group(1)))
+        elif block is not None:
+            block.feed(ln)
+    if block is not None:
+        est, cau = block.result()
+        if est or cau or block.title:
+            emitted = True
+            yield block.no, block.title, est, cau
+    if not emitted:
+        est, cau = whole.result()
+        if est or cau:
+            yield 1, "", est, cau
+
+
+# --- Near-Duplicate-Erkennung (MinHash + LSH) ---
+# 64 Hashfunktionen, 16 Bänder à 4 Zeilen -> Kandidaten ab ca. 50% Jaccard-Ähnlichkeit.
+# Parameter sind fest (Seed), weil Signaturen in der DB gespeichert werden.
+MINHASH_PERM = 64
+MINHASH_BANDS = 16
+_MINHASH_ROWS = MINHASH_PERM // MINHASH_BANDS
+_MINHASH_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5AF)
+_MINHASH_AB = [(_rng.randrange(1, _MINHASH_PRIME), _rng.randrange(0, _MINHASH_PRIME)) for _ in range(MINHASH_PERM)]
+del _rng
+
+
+def _minhash_shingles(text: str) -> set:
+    # Wort-Bigramme über normalisierten Text (klein, ohne Akzente, Wörter >= 2 Zeichen)
+    t = unicodedata.normalize("NFKD", (text or "").lower())
+    t = "".join(ch for ch in t if not unicodedata.combining(ch))
+    words = [w for w in re.findall(r"\w+", t) if len(w) >= 2]
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def minhash_signature(text: str) -> Optional[array]:
+    """MinHash-Signatur (array 'Q', MINHASH_PERM Werte) oder None bei leerem Text."""
+    hashes = [zlib.crc32(sh.encode("utf-8")) for sh in _minhash_shingles(text)]
+    if not hashes:
+        return None
+    P = _MINHASH_PRIME
+    return array("Q", [min((a * h + b) % P for h in hashes) for a, b in _MINHASH_AB])
+
+
+def minhash_bands(sig: array) -> List[int]:
+    # ein Bucket-Schlüssel (signed 64 bit, passt in SQLite INTEGER) je Band
+    r = _MINHASH_ROWS
+    return [
+        int.from_bytes(hashlib.blake2b(sig[i * r:(i + 1) * r].tobytes(), digest_size=8).digest(), "big", signed=True)
+        for i in range(MINHASH_BANDS)
+    ]
+
+
+def minhash_similarity(a: array, b: array) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / float(len(a) or 1)
+
+
+class DbConnectionManager:
+    """
+    Thread-sicherer DB-Zugriff:
+    - genau EIN Writer-Thread mit eigener Verbindung; Schreibjobs kommen über eine Queue
+      und werden gebündelt in einer Transaktion committet (je Job ein SAVEPOINT,
+      ein fehlerhafter Job rollt nur sich selbst zurück).
+    - kleiner Pool read-only WAL-Verbindungen für parallele Abfragen.
+    Jobs sind Funktionen fn(conn) -> Ergebnis. Jobs dürfen NICHT selbst committen.
+    """
+
+    def __init__(self, db_file: str, setup=None, reader_setup=None, readers: int = 3, batch_max: int = 64):
+        self.db_file = db_file
+        self._batch_max = max(1, batch_max)
+        self._wq: "queue.Queue" = queue.Queue()
+        self._closed = False
+
+        # isolation_level=None: Transaktionen steuern wir selbst (BEGIN/SAVEPOINT/COMMIT)
+        self._wconn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+        self._wconn.execute("PRAGMA journal_mode=WAL;")
+        self._wconn.execute("PRAGMA synchronous=NORMAL;")
+        if setup:
+            setup(self._wconn)
+
+        readers = max(1, readers)
+        ro_uri = Path(db_file).resolve().as_uri() + "?mode=ro"
+        self._readers: List[sqlite3.Connection] = []
+        self._rq: "queue.Queue" = queue.Queue()
+        for _ in range(readers):
+            c = sqlite3.connect(ro_uri, uri=True, check_same_thread=False)
+            if reader_setup:
+                reader_setup(c)
+            self._readers.append(c)
+            self._rq.put(c)
+        self._read_exec = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="safkaty-db-read")
+
+        self._writer = threading.Thread(target=self._writer_loop, name="safkaty-db-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- Schreiben ----------
+
+    def submit_write(self, fn, callback=None) -> Future:
+        """Schreibjob einreihen. callback(future) wird nach dem Commit aufgerufen (im Writer-Thread)."""
+        if self._closed:
+            raise RuntimeError("Datenbank ist geschlossen.")
+        fut: Future = Future()
+        if callback:
+            fut.add_done_callback(callback)
+        self._wq.put((fn, fut))
+        return fut
+
+    def write(self, fn):
+        """Schreibjob ausführen und auf den Commit warten."""
+        if threading.current_thread() is self._writer:
+            # verschachtelter Aufruf aus einem Job: direkt in der laufenden Transaktion
+            return fn(self._wconn)
+        return self.submit_write(fn).result()
+
+    def _writer_loop(self):
+        while True:
+            job = self._wq.get()
+            if job is None:
+                break
+            batch = [job]
+            stop = False
+            while len(batch) < self._batch_max:
+                try:
+                    nxt = self._wq.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._run_batch(batch)
+            if stop:
+                break
+        try:
+            self._wconn.close()
+        except Exception:
+            pass
+
+    def _run_batch(self, batch):
+        conn = self._wconn
+        outcome = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, fut in batch:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    res = fn(conn)
+                    conn.execute("RELEASE job")
+                    outcome.append((fut, res, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcome.append((fut, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            # alle offenen Jobs des Batches scheitern lassen (auch die, die noch nicht liefen, z.B. wenn
+            # BEGIN IMMEDIATE "database is locked" meldet) -> write() wartet sonst ewig
+            for _fn, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        # Ergebnisse erst nach dem Commit freigeben -> Leser sehen die Daten sicher
+        for fut, res, err in outcome:
+            if err is not None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(res)
+
+    # ---------- Lesen ----------
+
+    def read(self, fn):
+        """Lesejob auf einer freien read-only Verbindung ausführen (blockiert, bis eine frei ist)."""
+        conn = self._rq.get()
+        try:
+            return fn(conn)
+        finally:
+            self._rq.put(conn)
+
+    def submit_read(self, fn, callback=None) -> Future:
+        if self._closed:
+            raise RuntimeError("Datenbank ist geschlossen.")
+        fut = self._read_exec.submit(self.read, fn)
+        if callback:
+            fut.add_done_callback(callback)
+        return fut
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wq.put(None)
+        self._writer.join(timeout=10)
+        self._read_exec.shutdown(wait=True)
+        for c in self._readers:
+            try:
+                c.close()
+            except Exception:
+                pass
+
+
+class Database:
+    # Von upsert_tender geschriebene Spalten (auch Feldnamen im Change-Feed)
+    TENDER_FIELDS = (
+        "titre", "lieux", "estimation", "caution", "echeance", "echeance_time",
+        "organisation", "publication", "categorie", "description",
+        "contact_email", "contact_phone", "url",
+    )
+
+    # Abgeschlossene Status: solche Tender wandern nach Fristablauf ins Archiv
+    CLOSED_STATUSES = ("gewonnen", "verloren", "abgebrochen")
+    # Tabellen, die ins Archiv (attached DB "archive") verschoben werden; Union-Views heißen all_<name>
+    ARCHIVE_TABLES = ("tenders", "tender_status", "tender_lots")
+
+    def __init__(self, readers: int = 3, cache_size: int = 256):
+        # LRU-Cache für get_tender (tender_id -> dict), invalidiert von allen Schreibmethoden
+        self._cache: "OrderedDict[int, Dict]" = OrderedDict()
+        self._cache_size = max(0, cache_size)
+        self._cache_lock = threading.Lock()
+        self._cache_gen = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        # Volltextindex (FTS5/trigram) für die Suche, sonst LIKE-Scan – wird in _create_fts gesetzt
+        self.fts_enabled = False
+
         self.db_file = self._get_database_path()
-        self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
-        self.conn.execute("PRAGMA journal_mode=WAL;")
-        self._create_tables()
+        self.archive_file = str(Path(self.db_file).with_name("safkaty_archive.db"))
+        self.pool = DbConnectionManager(
+            self.db_file,
+            setup=self._setup_writer,
+            reader_setup=self._setup_reader,
+            readers=readers,
+        )
+        # Für Aufrufe, die komplett im Hintergrund laufen sollen (z.B. aus der GUI)
+        self._async_exec = ThreadPoolExecutor(max_workers=2, thread_name_prefix="safkaty-db-async")
 
     def _get_database_path(self) -> str:
         docs = Path.home() / ("Dokumente" if os.name == "nt" else "Documents")
@@ -237,8 +812,65 @@ class Database:
         folder.mkdir(parents=True, exist_ok=True)
         return str(folder / "safkaty.db")
 
-    def _create_tables(self):
-        cur = self.conn.cursor()
+    def submit(self, fn, *args, callback=None, **kwargs) -> Future:
+        """
+        Beliebige Database-Methode im Hintergrund ausführen, z.B.
+          db.submit(db.update_status, tid, "gewonnen", callback=lambda f: q.put(("DB_OK", f.result())))
+        callback(future) läuft im Hintergrund-Thread -> GUI-Updates über self.q leiten.
+        """
+        fut = self._async_exec.submit(fn, *args, **kwargs)
+        if callback:
+            fut.add_done_callback(callback)
+        return fut
+
+    def _setup_writer(self, conn: sqlite3.Connection):
+        self._create_tables(conn)
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_file,))
+        # WAL auch im Archiv: Leser (ro-ATTACH) blockieren den Writer nicht
+        conn.execute("PRAGMA archive.journal_mode=WAL")
+        self._sync_archive_schema(conn)
+        self._create_union_views(conn)
+
+    def _setup_reader(self, conn: sqlite3.Connection):
+        conn.execute("ATTACH DATABASE ? AS archive", (Path(self.archive_file).resolve().as_uri() + "?mode=ro",))
+        self._create_union_views(conn)
+
+    def _sync_archive_schema(self, conn: sqlite3.Connection):
+        # Archiv-Tabellen folgen dem Hot-Schema (neue Spalten aus Migrationen werden nachgezogen)
+        for table in self.ARCHIVE_TABLES:
+            exists = conn.execute(
+                "SELECT 1 FROM archive.sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone()
+            if not exists:
+                conn.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+            have = {r[1] for r in conn.execute(f"PRAGMA archive.table_info({table})")}
+            for r in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if r[1] not in have:
+                    conn.execute(f"ALTER TABLE archive.{table} ADD COLUMN {r[1]} {r[2]}")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_arch_tenders_id ON tenders(id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_arch_tenders_reference ON tenders(reference)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_arch_status_tender ON tender_status(tender_id)")
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_arch_lots ON tender_lots(tender_id, lot_no)")
+        # Listen verbinden tenders/tender_status per INNER JOIN (siehe _migrate_sort_indexes)
+        conn.execute("""
+            INSERT INTO archive.tender_status (tender_id, status, priority)
+            SELECT id, 'neu', 3 FROM archive.tenders
+            WHERE id NOT IN (SELECT tender_id FROM archive.tender_status WHERE tender_id IS NOT NULL)
+        """)
+
+    def _create_union_views(self, conn: sqlite3.Connection):
+        # TEMP-Views (pro Verbindung), da normale Views keine attached DB referenzieren dürfen
+        for table in self.ARCHIVE_TABLES:
+            cols = ", ".join(r[1] for r in conn.execute(f"PRAGMA main.table_info({table})"))
+            conn.execute(f"""
+                CREATE TEMP VIEW IF NOT EXISTS all_{table} AS
+                SELECT {cols} FROM main.{table}
+                UNION ALL
+                SELECT {cols} FROM archive.{table}
+            """)
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        cur = conn.cursor()
         cur.execute("""
         CREATE TABLE IF NOT EXISTS tenders (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -249,6 +881,7 @@ class Database:
             caution REAL,
             echeance TEXT,
             echeance_time TEXT,
+            echeance_at TEXT,
             organisation TEXT,
             publication TEXT,
             categorie TEXT,
@@ -256,7 +889,8 @@ class Database:
             contact_email TEXT,
             contact_phone TEXT,
             url TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 0
         )
         """)
         cur.execute("""
@@ -269,65 +903,509 @@ class Database:
             FOREIGN KEY(tender_id) REFERENCES tenders(id)
         )
         """)
-        self.conn.commit()
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tender_lots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tender_id INTEGER NOT NULL,
+            lot_no INTEGER NOT NULL,
+            title TEXT,
+            estimation REAL,
+            caution REAL,
+            UNIQUE(tender_id, lot_no),
+            FOREIGN KEY(tender_id) REFERENCES tenders(id)
+        )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tender_lots_estimation ON tender_lots(estimation)")
+        # Near-Duplicate-Index: Signatur je Tender + LSH-Buckets (band, bucket) -> tender_id
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tender_minhash (
+            tender_id INTEGER PRIMARY KEY,
+            sig BLOB NOT NULL
+        )
+        """)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tender_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            tender_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, tender_id)
+        ) WITHOUT ROWID
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_tender_lsh_tender ON tender_lsh(tender_id)")
+        # Append-only Change-Feed (seq = Cursor für changes_since)
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tender_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tender_id INTEGER NOT NULL,
+            reference TEXT,
+            op TEXT NOT NULL,
+            changes TEXT NOT NULL,
+            changed_at TEXT
+        )
+        """)
+        self._create_counters(cur)
+        self._create_fts(cur)
+        self._migrate(conn)
+
+    # Schema-Migrationen: PRAGMA user_version zählt die bereits angewendeten Schritte
+    def _migrate(self, conn: sqlite3.Connection):
+        steps = [
+            self._migrate_lot_suffixes,
+            self._migrate_deadline_ts,
+            self._migrate_minhash,
+            self._migrate_row_version,
+            self._migrate_sort_indexes,
+        ]
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, step in enumerate(steps[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {i}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _migrate_lot_suffixes(self, conn: sqlite3.Connection):
+        """
+        Alte Lot-Zeilen ("REF [Lot N]" aus search bzw. "REF | Lot N" aus safkaty_expand_rows_with_lots)
+        zu einem Tender je Konsultation + Zeilen in tender_lots zusammenführen.
+        Status/Notizen der ersten Lot-Zeile bleiben erhalten, wenn es noch keinen Basis-Tender gibt.
+        """
+        rx = re.compile(r"^(.*?)\s*(?:\[\s*Lot\s+(\d+)\s*\]|\|\s*Lot\s+(\d+))\s*$", flags=re.IGNORECASE)
+        rows = conn.execute("""
+            SELECT id, reference, titre, estimation, caution, description FROM tenders
+            WHERE reference LIKE '%[Lot %]' OR reference LIKE '%| Lot %'
+            ORDER BY id
+        """).fetchall()
+        groups: Dict[str, List[Tuple]] = {}
+        for tid, ref, titre, est, cau, desc in rows:
+            m = rx.match(ref or "")
+            if not m:
+                continue
+            base = m.group(1).strip() or "(unknown)"
+            lot_no = int(m.group(2) or m.group(3))
+            groups.setdefault(base, []).append((tid, lot_no, titre, est, cau, desc))
+
+        for base, items in groups.items():
+            row = conn.execute("SELECT id FROM tenders WHERE reference=?", (base,)).fetchone()
+            if row:
+                base_id = row[0]
+                drop = [it[0] for it in items]
+            else:
+                # erste Lot-Zeile wird zum Basis-Tender (Objet steht in description)
+                base_id = items[0][0]
+                drop = [it[0] for it in items[1:]]
+                conn.execute("""
+                    UPDATE tenders SET reference=?, titre=COALESCE(NULLIF(description,''), titre),
+                      estimation=?, caution=?
+                    WHERE id=?
+                """, (
+                    base,
+                    sum(it[3] for it in items if it[3] is not None) if any(it[3] is not None for it in items) else None,
+                    sum(it[4] for it in items if it[4] is not None) if any(it[4] is not None for it in items) else None,
+                    base_id,
+                ))
+            conn.executemany("""
+                INSERT INTO tender_lots (tender_id, lot_no, title, estimation, caution) VALUES (?,?,?,?,?)
+                ON CONFLICT(tender_id, lot_no) DO UPDATE SET
+                  title=excluded.title, estimation=excluded.estimation, caution=excluded.caution
+            """, [(base_id, lot_no, titre or "", est, cau) for _tid, lot_no, titre, est, cau, _d in items])
+            conn.executemany("DELETE FROM tender_status WHERE tender_id=?", [(x,) for x in drop])
+            conn.executemany("DELETE FROM tenders WHERE id=?", [(x,) for x in drop])
+
+    def _migrate_deadline_ts(self, conn: sqlite3.Connection):
+        # echeance + echeance_time -> echeance_at (indiziert) für due_between()
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(tenders)")]
+        if "echeance_at" not in cols:
+            conn.execute("ALTER TABLE tenders ADD COLUMN echeance_at TEXT")
+        rows = conn.execute("SELECT id, echeance, echeance_time FROM tenders").fetchall()
+        conn.executemany(
+            "UPDATE tenders SET echeance_at=? WHERE id=?",
+            [(deadline_ts(ech, tm), tid) for tid, ech, tm in rows]
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tenders_echeance_at ON tenders(echeance_at)")
+
+    def _migrate_minhash(self, conn: sqlite3.Connection):
+        # Signaturen/Buckets für bestehende Tender nachberechnen
+        rows = conn.execute("SELECT id, titre, description, organisation FROM tenders").fetchall()
+        for tid, titre, desc, org in rows:
+            self._index_similarity(conn, tid, self._similarity_text(titre, desc, org))
+
+    def _migrate_row_version(self, conn: sqlite3.Connection):
+        # row_version = seq des letzten Change-Feed-Eintrags (für den Abgleich der Treeviews)
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(tenders)")]
+        if "row_version" not in cols:
+            conn.execute("ALTER TABLE tenders ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0")
+        conn.execute("""
+            UPDATE tenders SET row_version = COALESCE(
+              (SELECT MAX(c.seq) FROM tender_changes c WHERE c.tender_id=tenders.id), 0)
+        """)
+
+    def _migrate_sort_indexes(self, conn: sqlite3.Connection):
+        # Sortierung per Spaltenkopf: (spalte, id)-Indizes, damit ORDER BY + LIMIT ein Index-Walk ist.
+        # Status/Prio-Sortierung läuft über tender_status -> jeder Tender braucht eine Statuszeile (INNER JOIN).
+        conn.execute("""
+            INSERT INTO tender_status (tender_id)
+            SELECT id FROM tenders WHERE id NOT IN (SELECT tender_id FROM tender_status WHERE tender_id IS NOT NULL)
+        """)
+        for col in ("estimation", "caution", "echeance", "organisation"):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tenders_sort_{col} ON tenders({col}, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tender_status_sort_status ON tender_status(status, tender_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tender_status_sort_priority ON tender_status(priority, tender_id)")
+
+    def _create_counters(self, cur):
+        # Zähler für Dashboard/stats(): per Trigger gepflegt, damit stats() nur eine kleine Tabelle liest.
+        # Schlüssel: "TOTAL" (Anzahl tenders) und je Status (Anzahl tender_status-Zeilen).
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS tender_counters (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        cur.executescript("""
+        CREATE TRIGGER IF NOT EXISTS trg_counters_tender_ins AFTER INSERT ON tenders
+        BEGIN
+            INSERT INTO tender_counters (key, value) VALUES ('TOTAL', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_counters_tender_del AFTER DELETE ON tenders
+        BEGIN
+            UPDATE tender_counters SET value = value - 1 WHERE key = 'TOTAL';
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_counters_status_ins AFTER INSERT ON tender_status
+        BEGIN
+            INSERT INTO tender_counters (key, value) VALUES (COALESCE(NEW.status, 'neu'), 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_counters_status_del AFTER DELETE ON tender_status
+        BEGIN
+            UPDATE tender_counters SET value = value - 1 WHERE key = COALESCE(OLD.status, 'neu');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_counters_status_upd AFTER UPDATE OF status ON tender_status
+        WHEN COALESCE(OLD.status, 'neu') <> COALESCE(NEW.status, 'neu')
+        BEGIN
+            UPDATE tender_counters SET value = value - 1 WHERE key = COALESCE(OLD.status, 'neu');
+            INSERT INTO tender_counters (key, value) VALUES (COALESCE(NEW.status, 'neu'), 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1;
+        END;
+        """)
+        # Bestehende DB ohne Zähler (Upgrade): einmalig aus den Tabellen aufbauen
+        cur.execute("SELECT 1 FROM tender_counters WHERE key='TOTAL'")
+        if not cur.fetchone():
+            self._rebuild_counters(cur)
+
+    def _create_fts(self, cur):
+        # Trigram-Index = Teilstring-Suche wie LIKE '%x%' (ab 3 Zeichen), per Trigger synchron zu tenders.
+        # Ohne FTS5/trigram (SQLite < 3.34) bleibt es beim LIKE-Scan.
+        cur.execute("SELECT 1 FROM sqlite_master WHERE name='tenders_fts'")
+        existed = cur.fetchone() is not None
+        try:
+            cur.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS tenders_fts USING fts5(
+                reference, titre, lieux, organisation,
+                content='tenders', content_rowid='id', tokenize='trigram'
+            )
+            """)
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+            return
+        cur.executescript("""
+        CREATE TRIGGER IF NOT EXISTS trg_fts_tender_ins AFTER INSERT ON tenders
+        BEGIN
+            INSERT INTO tenders_fts (rowid, reference, titre, lieux, organisation)
+            VALUES (NEW.id, NEW.reference, NEW.titre, NEW.lieux, NEW.organisation);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_fts_tender_del AFTER DELETE ON tenders
+        BEGIN
+            INSERT INTO tenders_fts (tenders_fts, rowid, reference, titre, lieux, organisation)
+            VALUES ('delete', OLD.id, OLD.reference, OLD.titre, OLD.lieux, OLD.organisation);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_fts_tender_upd AFTER UPDATE OF reference, titre, lieux, organisation ON tenders
+        BEGIN
+            INSERT INTO tenders_fts (tenders_fts, rowid, reference, titre, lieux, organisation)
+            VALUES ('delete', OLD.id, OLD.reference, OLD.titre, OLD.lieux, OLD.organisation);
+            INSERT INTO tenders_fts (rowid, reference, titre, lieux, organisation)
+            VALUES (NEW.id, NEW.reference, NEW.titre, NEW.lieux, NEW.organisation);
+        END;
+        """)
+        if not existed:
+            cur.execute("INSERT INTO tenders_fts (tenders_fts) VALUES ('rebuild')")
+        self.fts_enabled = True
+
+    def _rebuild_counters(self, cur):
+        cur.execute("DELETE FROM tender_counters")
+        cur.execute("INSERT INTO tender_counters (key, value) SELECT 'TOTAL', COUNT(*) FROM tenders")
+        cur.execute("""
+            INSERT INTO tender_counters (key, value)
+            SELECT COALESCE(status,'neu'), COUNT(*) FROM tender_status GROUP BY COALESCE(status,'neu')
+        """)
+
+    def check_counters(self, repair: bool = True) -> bool:
+        """
+        Konsistenzprüfung: vergleicht tender_counters mit echten COUNT(*)-Werten.
+        Gibt True zurück, wenn alles stimmt. Bei repair=True werden abweichende Zähler neu aufgebaut.
+        """
+        return self.pool.write(lambda conn: self._check_counters(conn, repair))
+
+    def _check_counters(self, conn: sqlite3.Connection, repair: bool) -> bool:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM tenders")
+        expected = {"TOTAL": cur.fetchone()[0]}
+        cur.execute("""SELECT COALESCE(status,'neu'), COUNT(*) FROM tender_status GROUP BY COALESCE(status,'neu')""")
+        expected.update({k: v for k, v in cur.fetchall()})
+        cur.execute("SELECT key, value FROM tender_counters WHERE value <> 0 OR key='TOTAL'")
+        actual = {k: v for k, v in cur.fetchall()}
+        ok = actual == expected
+        if not ok and repair:
+            self._rebuild_counters(cur)
+        return ok
 
     def upsert_tender(self, t: Tender) -> Tuple[bool, int]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT id FROM tenders WHERE reference=?", (t.reference,))
-        row = cur.fetchone()
+        new, tender_id = self.pool.write(lambda conn: self._upsert_tender(conn, t))
+        self._invalidate(tender_id)
+        return (new, tender_id)
+
+    def upsert_tenders(self, tenders: List[Tender]) -> List[Tuple[bool, int]]:
+        """Mehrere Tender in EINEM Writer-Job (eine Transaktion) schreiben."""
+        if not tenders:
+            return []
+        results = self.pool.write(lambda conn: [self._upsert_tender(conn, t) for t in tenders])
+        self._invalidate(*[tid for _new, tid in results])
+        return results
+
+    def _upsert_tender(self, conn: sqlite3.Connection, t: Tender) -> Tuple[bool, int]:
+        values = {f: getattr(t, f) for f in self.TENDER_FIELDS}
+        cols = ", ".join(self.TENDER_FIELDS)
+        schema = "main"
+        row = conn.execute(f"SELECT id, {cols} FROM main.tenders WHERE reference=?", (t.reference,)).fetchone()
+        if not row:
+            # bereits archiviert: dort aktualisieren statt einer zweiten (heißen) Zeile mit neuer id;
+            # Status, Notizen und Lots hängen an der archivierten Zeile
+            schema = "archive"
+            row = conn.execute(f"SELECT id, {cols} FROM archive.tenders WHERE reference=?", (t.reference,)).fetchone()
         if row:
             tender_id = row[0]
-            cur.execute("""
-                UPDATE tenders SET
-                  titre=?,
-                  lieux=?,
-                  estimation=?,
-                  caution=?,
-                  echeance=?,
-                  echeance_time=?,
-                  organisation=?,
-                  publication=?,
-                  categorie=?,
-                  description=?,
-                  contact_email=?,
-                  contact_phone=?,
-                  url=?
-                WHERE id=?
-            """, (
-                t.titre, t.lieux, t.estimation, t.caution,
-                t.echeance, t.echeance_time,
-                t.organisation, t.publication, t.categorie,
-                t.description, t.contact_email, t.contact_phone, t.url,
-                tender_id
-            ))
-            self.conn.commit()
+            old = dict(zip(self.TENDER_FIELDS, row[1:]))
+            diff = {k: [old[k], v] for k, v in values.items() if old[k] != v}
+            if diff:
+                sets = {k: v for k, (_o, v) in diff.items()}
+                if "echeance" in sets or "echeance_time" in sets:
+                    sets["echeance_at"] = deadline_ts(t.echeance, t.echeance_time)
+                conn.execute(
+                    f"UPDATE {schema}.tenders SET {', '.join(f'{k}=?' for k in sets)} WHERE id=?",
+                    (*sets.values(), tender_id)
+                )
+            lots_diff = self._write_lots(conn, tender_id, t.lots, schema)
+            if lots_diff:
+                diff["lots"] = lots_diff
+            if diff:
+                self._log_change(conn, tender_id, t.reference, "update", diff)
+            if any(k in diff for k in ("titre", "description", "organisation")):
+                self._index_similarity(conn, tender_id, self._similarity_text(t.titre, t.description, t.organisation))
             return (False, tender_id)
 
-        cur.execute("""
-            INSERT INTO tenders
-              (reference, titre, lieux, estimation, caution, echeance, echeance_time,
-               organisation, publication, categorie, description, contact_email, contact_phone, url)
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """, (
-            t.reference, t.titre, t.lieux, t.estimation, t.caution,
-            t.echeance, t.echeance_time,
-            t.organisation, t.publication, t.categorie,
-            t.description, t.contact_email, t.contact_phone, t.url
-        ))
+        cur = conn.cursor()
+        cur.execute(f"""
+            INSERT INTO tenders (reference, {cols}, echeance_at)
+            VALUES ({",".join("?" * (len(self.TENDER_FIELDS) + 2))})
+        """, (t.reference, *values.values(), deadline_ts(t.echeance, t.echeance_time)))
         tender_id = cur.lastrowid
         cur.execute("INSERT OR IGNORE INTO tender_status (tender_id) VALUES (?)", (tender_id,))
-        self.conn.commit()
+        diff = {k: [None, v] for k, v in values.items() if v not in (None, "")}
+        lots_diff = self._write_lots(conn, tender_id, t.lots)
+        if lots_diff:
+            diff["lots"] = lots_diff
+        self._log_change(conn, tender_id, t.reference, "insert", diff)
+        self._index_similarity(conn, tender_id, self._similarity_text(t.titre, t.description, t.organisation))
         return (True, tender_id)
 
-    def list_tenders(self, search: str = "", status: str = "Alle", priority: str = "Alle") -> List[Tuple]:
-        cur = self.conn.cursor()
+    def _write_lots(self, conn: sqlite3.Connection, tender_id: int, lots: List[TenderLot],
+                    schema: str = "main") -> Optional[List]:
+        """Schreibt die Lots (bulk) und liefert [alt, neu] für den Change-Feed, falls sich etwas geändert hat."""
+        # Ohne Lot-Daten nichts anfassen (z.B. Import ohne Popup) -> bestehende Lots bleiben
+        if not lots:
+            return None
+        old = [list(r) for r in conn.execute(
+            f"SELECT lot_no, title, estimation, caution FROM {schema}.tender_lots WHERE tender_id=? ORDER BY lot_no",
+            (tender_id,)
+        )]
+        new = [[l.lot_no, l.title, l.estimation, l.caution] for l in sorted(lots, key=lambda x: x.lot_no)]
+        if old == new:
+            return None
+        conn.execute(f"DELETE FROM {schema}.tender_lots WHERE tender_id=?", (tender_id,))
+        conn.executemany(
+            f"INSERT INTO {schema}.tender_lots (tender_id, lot_no, title, estimation, caution) VALUES (?,?,?,?,?)",
+            [(tender_id, *x) for x in new]
+        )
+        return [old, new]
+
+    def _log_change(self, conn: sqlite3.Connection, tender_id: int, reference: str, op: str, diff: Dict):
+        # Change-Feed: gleiche Transaktion wie die Änderung selbst (Job im Writer-Thread)
+        seq = conn.execute(
+            "INSERT INTO tender_changes (tender_id, reference, op, changes, changed_at) VALUES (?,?,?,?,?)",
+            (tender_id, reference, op, json.dumps(diff, ensure_ascii=False, separators=(",", ":")),
+             datetime.now().isoformat(timespec="seconds"))
+        ).lastrowid
+        # Versionsstempel der Zeile (auch Status/Priorität/Notizen laufen hier durch)
+        if not conn.execute("UPDATE main.tenders SET row_version=? WHERE id=?", (seq, tender_id)).rowcount:
+            conn.execute("UPDATE archive.tenders SET row_version=? WHERE id=?", (seq, tender_id))
+
+    @staticmethod
+    def _similarity_text(titre: str, description: str, organisation: str) -> str:
+        parts = [titre or ""]
+        if description and description != titre:
+            parts.append(description)
+        parts.append(organisation or "")
+        return " ".join(parts)
+
+    def _index_similarity(self, conn: sqlite3.Connection, tender_id: int, text: str):
+        conn.execute("DELETE FROM tender_lsh WHERE tender_id=?", (tender_id,))
+        sig = minhash_signature(text)
+        if sig is None:
+            conn.execute("DELETE FROM tender_minhash WHERE tender_id=?", (tender_id,))
+            return
+        conn.execute("INSERT OR REPLACE INTO tender_minhash (tender_id, sig) VALUES (?,?)", (tender_id, sig.tobytes()))
+        conn.executemany(
+            "INSERT OR IGNORE INTO tender_lsh (band, bucket, tender_id) VALUES (?,?,?)",
+            [(i, b, tender_id) for i, b in enumerate(minhash_bands(sig))]
+        )
+
+    def similar_tenders(self, tender_id: int, threshold: float = 0.5, limit: int = 10) -> List[Tuple]:
+        """
+        Wahrscheinliche Duplikate über LSH-Buckets (Punktabfragen je Band, kein Vergleich gegen die ganze Tabelle).
+        Zeilen: (id, reference, titre, organisation, similarity) absteigend nach similarity.
+        """
+        def _op(conn: sqlite3.Connection):
+            row = conn.execute("SELECT sig FROM tender_minhash WHERE tender_id=?", (tender_id,)).fetchone()
+            if not row:
+                return []
+            sig = array("Q")
+            sig.frombytes(row[0])
+            cands = set()
+            for i, b in enumerate(minhash_bands(sig)):
+                cands.update(r[0] for r in conn.execute(
+                    "SELECT tender_id FROM tender_lsh WHERE band=? AND bucket=?", (i, b)
+                ))
+            cands.discard(tender_id)
+            out = []
+            for cid in cands:
+                other = conn.execute("SELECT sig FROM tender_minhash WHERE tender_id=?", (cid,)).fetchone()
+                if not other:
+                    continue
+                osig = array("Q")
+                osig.frombytes(other[0])
+                score = minhash_similarity(sig, osig)
+                if score < threshold:
+                    continue
+                info = conn.execute(
+                    "SELECT reference, titre, organisation FROM all_tenders WHERE id=?", (cid,)
+                ).fetchone()
+                if info:
+                    out.append((cid, info[0], info[1], info[2], score))
+            out.sort(key=lambda x: -x[4])
+            return out[:limit]
+        return self.pool.read(_op)
+
+    def changes_since(self, seq: int = 0, limit: int = 500) -> List[Dict]:
+        """
+        Änderungen mit seq > seq (aufsteigend, max. limit). Konsumenten merken sich die letzte seq
+        als Cursor und holen beim nächsten Mal nur das Neue.
+        changes: {feld: [alt, neu]}; op: insert | update | workflow | delete
+        """
+        rows = self.pool.read(lambda conn: conn.execute("""
+            SELECT seq, tender_id, reference, op, changes, changed_at FROM tender_changes
+            WHERE seq > ? ORDER BY seq LIMIT ?
+        """, (int(seq), int(limit))).fetchall())
+        return [
+            {"seq": sq, "tender_id": tid, "reference": ref, "op": op,
+             "changes": json.loads(ch or "{}"), "changed_at": at}
+            for sq, tid, ref, op, ch, at in rows
+        ]
+
+    def get_lots(self, tender_id: int) -> List[TenderLot]:
+        rows = self.pool.read(lambda conn: conn.execute(
+            "SELECT lot_no, title, estimation, caution FROM all_tender_lots WHERE tender_id=? ORDER BY lot_no",
+            (tender_id,)
+        ).fetchall())
+        return [TenderLot(lot_no=n, title=t or "", estimation=e, caution=c) for n, t, e, c in rows]
+
+    def lot_totals(self, tender_id: Optional[int] = None) -> List[Tuple]:
+        """(tender_id, reference, anzahl_lots, summe_estimation, summe_caution) je Konsultation."""
+        where = "WHERE l.tender_id=?" if tender_id is not None else ""
+        params = (tender_id,) if tender_id is not None else ()
+        sql = f"""
+            SELECT l.tender_id, t.reference, COUNT(*), SUM(l.estimation), SUM(l.caution)
+            FROM tender_lots l
+            JOIN tenders t ON t.id=l.tender_id
+            {where}
+            GROUP BY l.tender_id
+            ORDER BY l.tender_id
+        """
+        return self.pool.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    def lots_above(self, min_estimation: float) -> List[Tuple]:
+        """Lots mit Estimation >= min_estimation (MAD): (tender_id, reference, lot_no, title, estimation, caution)."""
+        return self.pool.read(lambda conn: conn.execute("""
+            SELECT l.tender_id, t.reference, l.lot_no, l.title, l.estimation, l.caution
+            FROM tender_lots l
+            JOIN tenders t ON t.id=l.tender_id
+            WHERE l.estimation >= ?
+            ORDER BY l.estimation DESC
+        """, (float(min_estimation),)).fetchall())
+
+    # Sortierbare Spalten (logischer Name -> SQL-Ausdruck) für list_tenders_page
+    SORT_COLUMNS = {
+        "id": "t.id",
+        "reference": "t.reference",
+        "titre": "t.titre",
+        "organisation": "t.organisation",
+        "lieux": "t.lieux",
+        "estimation": "t.estimation",
+        "caution": "t.caution",
+        "echeance": "t.echeance",
+        "status": "ts.status",
+        "priority": "ts.priority",
+    }
+    # zweiter Sortierschlüssel (eindeutig, gleiche Richtung) – passend zu den Indizes aus _migrate_sort_indexes
+    SORT_TIEBREAK = {"status": "ts.tender_id", "priority": "ts.tender_id"}
+    # Spalten einer list_tenders_page-Zeile (für Keyset-Paging: Sortwert aus der letzten Zeile)
+    PAGE_COLUMNS = ("id", "reference", "titre", "organisation", "lieux", "estimation", "caution",
+                    "echeance", "status", "priority", "row_version")
+    DEFAULT_ORDER = """
+          COALESCE(ts.priority,3) ASC,
+          CASE WHEN t.echeance IS NULL OR t.echeance='' THEN 1 ELSE 0 END,
+          t.echeance ASC"""
+
+    def _tender_filter(self, search: str, status: str, priority: str, include_archive: bool) -> Tuple[str, List]:
+        # gemeinsamer FROM/WHERE-Teil für list_tenders / list_tenders_page / count_tenders
         conditions = []
         params: List = []
 
-        if search.strip():
-            conditions.append("(LOWER(reference) LIKE ? OR LOWER(titre) LIKE ? OR LOWER(lieux) LIKE ? OR LOWER(organisation) LIKE ?)")
-            s = f"%{search.lower().strip()}%"
-            params.extend([s, s, s, s])
+        term = search.lower().strip()
+        if term:
+            like = "(LOWER(reference) LIKE ? OR LOWER(titre) LIKE ? OR LOWER(lieux) LIKE ? OR LOWER(organisation) LIKE ?)"
+            s = f"%{term}%"
+            if self.fts_enabled and len(term) >= 3:
+                # Hot-Set über den Trigram-Index; das Archiv hat keinen Index und wird (opt-in) gescannt
+                fts = "t.id IN (SELECT rowid FROM main.tenders_fts WHERE tenders_fts MATCH ?)"
+                phrase = '"' + term.replace('"', '""') + '"'
+                if include_archive:
+                    conditions.append(f"({fts} OR t.id IN (SELECT id FROM archive.tenders WHERE {like}))")
+                    params.extend([phrase, s, s, s, s])
+                else:
+                    conditions.append(fts)
+                    params.append(phrase)
+            else:
+                conditions.append(like)
+                params.extend([s, s, s, s])
 
         if status != "Alle":
             conditions.append("COALESCE(ts.status,'neu') = ?")
@@ -338,163 +1416,1251 @@ class Database:
             params.append(int(priority))
 
         where = " AND ".join(conditions) if conditions else "1=1"
-
-        cur.execute(f"""
+        sql = f"""
+        FROM {"all_tenders" if include_archive else "tenders"} t
+        JOIN {"all_tender_status" if include_archive else "tender_status"} ts ON ts.tender_id=t.id
+        WHERE {where}"""
+        return sql, params
+
+    def list_tenders(self, search: str = "", status: str = "Alle", priority: str = "Alle",
+                     include_archive: bool = False) -> List[Tuple]:
+        return self.list_tenders_page(search, status, priority, include_archive, limit=-1)
+
+    def list_tenders_page(self, search: str = "", status: str = "Alle", priority: str = "Alle",
+                          include_archive: bool = False, offset: int = 0, limit: int = 200,
+                          sort: Optional[Tuple[str, bool]] = None, after: Optional[Tuple] = None) -> List[Tuple]:
+        """
+        Eine Seite von list_tenders. sort = (spalte aus SORT_COLUMNS, absteigend) oder None (Standard-Reihenfolge).
+        limit=-1: alle Zeilen. Letzte Spalte: row_version (ändert sich mit jedem Change-Feed-Eintrag).
+        after = letzte Zeile der vorigen Seite (nur mit sort): Keyset-Paging ab dieser Zeile statt OFFSET.
+        """
+        if after is not None and sort and sort[0] in self.SORT_COLUMNS:
+            return self.pool.read(
+                lambda conn: self._keyset_page(conn, search, status, priority, include_archive, limit, sort, after))
+        sql, params = self._page_query(search, status, priority, include_archive, offset, limit, sort)
+        return self.pool.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    def _keyset_page(self, conn: sqlite3.Connection, search: str, status: str, priority: str,
+                     include_archive: bool, limit: int, sort: Tuple[str, bool], after: Tuple) -> List[Tuple]:
+        # Fortsetzung hinter (Sortwert, id) der letzten Zeile. NULL steht aufsteigend vorn, absteigend hinten;
+        # jedes Segment ist ein eigener Range-Scan auf dem Index, das nächste nur, wenn die Seite nicht voll ist.
+        name, desc = sort
+        key = self.SORT_COLUMNS[name]
+        tie = self.SORT_TIEBREAK.get(name, "t.id")
+        value, last_id = after[self.PAGE_COLUMNS.index(name)], after[0]
+        if not desc:
+            segments = [(f"({key}, {tie}) > (?, ?)", [value, last_id])] if value is not None else [
+                (f"{key} IS NULL AND {tie} > ?", [last_id]), (f"{key} IS NOT NULL", [])]
+        else:
+            segments = [(f"({key}, {tie}) < (?, ?)", [value, last_id]), (f"{key} IS NULL", [])] \
+                if value is not None else [(f"{key} IS NULL AND {tie} < ?", [last_id])]
+        rows: List[Tuple] = []
+        for cond in segments:
+            remaining = -1 if limit < 0 else limit - len(rows)
+            sql, params = self._page_query(search, status, priority, include_archive, 0, remaining, sort, cond)
+            rows.extend(conn.execute(sql, params).fetchall())
+            if 0 <= limit <= len(rows):
+                break
+        return rows
+
+    def _page_query(self, search: str, status: str, priority: str, include_archive: bool,
+                    offset: int, limit: int, sort: Optional[Tuple[str, bool]],
+                    extra: Optional[Tuple[str, List]] = None) -> Tuple[str, List]:
+        base, params = self._tender_filter(search, status, priority, include_archive)
+        if extra:
+            base += f" AND ({extra[0]})"
+            params = params + list(extra[1])
+        if sort and sort[0] in self.SORT_COLUMNS:
+            direction = "DESC" if sort[1] else "ASC"
+            order = f"{self.SORT_COLUMNS[sort[0]]} {direction}, {self.SORT_TIEBREAK.get(sort[0], 't.id')} {direction}"
+        else:
+            order = self.DEFAULT_ORDER
+        sql = f"""
         SELECT
             t.id, t.reference, t.titre, t.organisation, t.lieux,
             t.estimation, t.caution, t.echeance,
             COALESCE(ts.status,'neu') as status,
-            COALESCE(ts.priority,3) as priority
-        FROM tenders t
-        LEFT JOIN tender_status ts ON ts.tender_id=t.id
-        WHERE {where}
-        ORDER BY
-          COALESCE(ts.priority,3) ASC,
-          CASE WHEN t.echeance IS NULL OR t.echeance='' THEN 1 ELSE 0 END,
-          t.echeance ASC
-        """, params)
-        return cur.fetchall()
+            COALESCE(ts.priority,3) as priority,
+            t.row_version
+        {base}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+        """
+        return sql, params + [int(limit), int(offset)]
+
+    def count_tenders(self, search: str = "", status: str = "Alle", priority: str = "Alle",
+                      include_archive: bool = False) -> int:
+        sql, params = self._count_query(search, status, priority, include_archive)
+        return self.pool.read(lambda conn: conn.execute(sql, params).fetchone()[0])
+
+    def _count_query(self, search: str, status: str, priority: str, include_archive: bool) -> Tuple[str, List]:
+        term = search.lower().strip()
+        if status == "Alle" and priority == "Alle" and not include_archive:
+            if not term:
+                # O(1) über die Trigger-Zähler (wie stats())
+                return "SELECT COALESCE((SELECT value FROM tender_counters WHERE key='TOTAL'), 0)", []
+            if self.fts_enabled and len(term) >= 3:
+                # nur Suchbegriff: direkt im Index zählen, ohne Join auf tenders/tender_status
+                return ("SELECT COUNT(*) FROM main.tenders_fts WHERE tenders_fts MATCH ?",
+                        ['"' + term.replace('"', '""') + '"'])
+        base, params = self._tender_filter(search, status, priority, include_archive)
+        return f"SELECT COUNT(*) {base}", params
+
+    def filter_page(self, search: str = "", status: str = "Alle", priority: str = "Alle",
+                    include_archive: bool = False, limit: int = 200, sort: Optional[Tuple[str, bool]] = None,
+                    is_stale: Optional[Callable[[], bool]] = None) -> Tuple[int, List[Tuple]]:
+        """
+        Trefferzahl + erste Seite in einem Lesejob (Suche während der Eingabe).
+        is_stale() -> True bricht die laufende Abfrage ab (sqlite3.OperationalError "interrupted").
+        """
+        count_sql, params = self._count_query(search, status, priority, include_archive)
+        sql, page_params = self._page_query(search, status, priority, include_archive, 0, limit, sort)
 
-    def get_tender(self, tender_id: int) -> Optional[Dict]:
-        cur = self.conn.cursor()
-        cur.execute("""
+        def _op(conn: sqlite3.Connection):
+            if is_stale:
+                conn.set_progress_handler(lambda: 1 if is_stale() else 0, 1000)
+            try:
+                total = conn.execute(count_sql, params).fetchone()[0]
+                return total, conn.execute(sql, page_params).fetchall()
+            finally:
+                if is_stale:
+                    conn.set_progress_handler(None, 0)
+        return self.pool.read(_op)
+
+    def due_between(self, start, end, status=None, limit: int = 500) -> List[Tuple]:
+        """
+        Tender mit Frist im Zeitfenster [start, end) – Index-Range-Scan über echeance_at.
+        start/end: datetime oder "yyyy-mm-dd[ HH:MM]". status: None, ein Status oder Liste.
+        Zeilen wie list_tenders, aber mit echeance_at statt echeance.
+        """
+        def _ts(v) -> str:
+            return v.strftime("%Y-%m-%d %H:%M") if isinstance(v, datetime) else str(v)
+
+        conditions = ["t.echeance_at >= ?", "t.echeance_at < ?"]
+        params: List = [_ts(start), _ts(end)]
+        if status:
+            sts = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"COALESCE(ts.status,'neu') IN ({','.join('?' * len(sts))})")
+            params.extend(sts)
+        params.append(int(limit))
+        sql = f"""
         SELECT
-          t.*, COALESCE(ts.status,'neu') as status, COALESCE(ts.priority,3) as priority, COALESCE(ts.notes,'') as notes
+            t.id, t.reference, t.titre, t.organisation, t.lieux,
+            t.estimation, t.caution, t.echeance_at,
+            COALESCE(ts.status,'neu') as status,
+            COALESCE(ts.priority,3) as priority,
+            t.row_version
         FROM tenders t
         LEFT JOIN tender_status ts ON ts.tender_id=t.id
-        WHERE t.id=?
-        """, (tender_id,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        cols = [d[0] for d in cur.description]
-        return dict(zip(cols, row))
+        WHERE {" AND ".join(conditions)}
+        ORDER BY t.echeance_at ASC
+        LIMIT ?
+        """
+        return self.pool.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    def get_tender(self, tender_id: int) -> Optional[Dict]:
+        with self._cache_lock:
+            data = self._cache.get(tender_id)
+            if data is not None:
+                self._cache.move_to_end(tender_id)
+                self._cache_hits += 1
+                return self._copy_tender(data)
+            self._cache_misses += 1
+            gen = self._cache_gen
+        data = self.pool.read(lambda conn: self._get_tender(conn, tender_id))
+        if data is not None and self._cache_size:
+            with self._cache_lock:
+                # nur cachen, wenn seit Beginn des Lesens nichts invalidiert wurde (sonst evtl. veraltet)
+                if gen == self._cache_gen:
+                    self._cache[tender_id] = data
+                    self._cache.move_to_end(tender_id)
+                    while len(self._cache) > self._cache_size:
+                        self._cache.popitem(last=False)
+            return self._copy_tender(data)
+        return data
+
+    @staticmethod
+    def _copy_tender(data: Dict) -> Dict:
+        # Aufrufer bekommen eine Kopie, damit niemand den Cache-Eintrag verändert
+        out = dict(data)
+        out["lots"] = [dict(l) for l in data.get("lots") or []]
+        return out
+
+    def _invalidate(self, *tender_ids: int):
+        # nach dem Commit aufrufen: Generation erhöhen, damit parallele Leser nichts Altes einlagern
+        with self._cache_lock:
+            self._cache_gen += 1
+            for tid in tender_ids:
+                self._cache.pop(tid, None)
+
+    def cache_stats(self) -> Dict[str, float]:
+        with self._cache_lock:
+            total = self._cache_hits + self._cache_misses
+            return {
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hit_rate": (self._cache_hits / total) if total else 0.0,
+                "size": len(self._cache),
+                "capacity": self._cache_size,
+            }
+
+    def _get_tender(self, conn: sqlite3.Connection, tender_id: int) -> Optional[Dict]:
+        # erst Hot-Set, dann Archiv (z.B. Details aus "inkl. Archiv"-Liste)
+        for schema in ("main", "archive"):
+            cur = conn.cursor()
+            cur.execute(f"""
+            SELECT
+              t.*, COALESCE(ts.status,'neu') as status, COALESCE(ts.priority,3) as priority, COALESCE(ts.notes,'') as notes
+            FROM {schema}.tenders t
+            LEFT JOIN {schema}.tender_status ts ON ts.tender_id=t.id
+            WHERE t.id=?
+            """, (tender_id,))
+            row = cur.fetchone()
+            if not row:
+                continue
+            cols = [d[0] for d in cur.description]
+            data = dict(zip(cols, row))
+            data["archived"] = schema == "archive"
+            data["lots"] = [
+                {"lot_no": n, "title": t or "", "estimation": e, "caution": c}
+                for n, t, e, c in conn.execute(
+                    f"SELECT lot_no, title, estimation, caution FROM {schema}.tender_lots WHERE tender_id=? ORDER BY lot_no",
+                    (tender_id,)
+                )
+            ]
+            return data
+        return None
 
     def update_status(self, tender_id: int, status: str):
-        cur = self.conn.cursor()
-        cur.execute("""
-          INSERT INTO tender_status (tender_id, status, updated_at)
-          VALUES (?,?,?)
-          ON CONFLICT(tender_id) DO UPDATE SET status=excluded.status, updated_at=excluded.updated_at
-        """, (tender_id, status, datetime.now().isoformat(timespec="seconds")))
-        self.conn.commit()
+        self.pool.write(lambda conn: self._set_workflow_field(conn, tender_id, "status", status))
+        self._invalidate(tender_id)
 
     def update_priority(self, tender_id: int, priority: int):
-        cur = self.conn.cursor()
-        cur.execute("""
-          INSERT INTO tender_status (tender_id, priority, updated_at)
-          VALUES (?,?,?)
-          ON CONFLICT(tender_id) DO UPDATE SET priority=excluded.priority, updated_at=excluded.updated_at
-        """, (tender_id, priority, datetime.now().isoformat(timespec="seconds")))
-        self.conn.commit()
+        self.pool.write(lambda conn: self._set_workflow_field(conn, tender_id, "priority", priority))
+        self._invalidate(tender_id)
 
     def update_notes(self, tender_id: int, notes: str):
-        cur = self.conn.cursor()
-        cur.execute("""
-          INSERT INTO tender_status (tender_id, notes, updated_at)
+        self.pool.write(lambda conn: self._set_workflow_field(conn, tender_id, "notes", notes))
+        self._invalidate(tender_id)
+
+    def _set_workflow_field(self, conn: sqlite3.Connection, tender_id: int, field_name: str, value):
+        # field_name kommt nur aus den update_*-Methoden oben (kein User-Input)
+        schema = "main"
+        if not conn.execute("SELECT 1 FROM main.tenders WHERE id=?", (tender_id,)).fetchone() \
+                and conn.execute("SELECT 1 FROM archive.tenders WHERE id=?", (tender_id,)).fetchone():
+            schema = "archive"
+        old = conn.execute(f"SELECT {field_name} FROM {schema}.tender_status WHERE tender_id=?", (tender_id,)).fetchone()
+        conn.execute(f"""
+          INSERT INTO {schema}.tender_status (tender_id, {field_name}, updated_at)
           VALUES (?,?,?)
-          ON CONFLICT(tender_id) DO UPDATE SET notes=excluded.notes, updated_at=excluded.updated_at
-        """, (tender_id, notes, datetime.now().isoformat(timespec="seconds")))
-        self.conn.commit()
-
-    def stats(self) -> Dict[str, int]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM tenders")
-        total = cur.fetchone()[0]
-        cur.execute("""SELECT COALESCE(status,'neu'), COUNT(*) FROM tender_status GROUP BY COALESCE(status,'neu')""")
-        by_status = {k: v for k, v in cur.fetchall()}
-        by_status["TOTAL"] = total
+          ON CONFLICT(tender_id) DO UPDATE SET {field_name}=excluded.{field_name}, updated_at=excluded.updated_at
+        """, (tender_id, value, datetime.now().isoformat(timespec="seconds")))
+        if old is None or old[0] != value:
+            ref = conn.execute(f"SELECT reference FROM {schema}.tenders WHERE id=?", (tender_id,)).fetchone()
+            self._log_change(conn, tender_id, ref[0] if ref else None, "workflow",
+                             {field_name: [old[0] if old else None, value]})
+
+    def stats(self, include_archive: bool = False) -> Dict[str, int]:
+        # O(1): Zähler werden per Trigger gepflegt (siehe _create_counters) – nur Hot-Set
+        rows = self.pool.read(lambda conn: conn.execute("SELECT key, value FROM tender_counters").fetchall())
+        by_status = {k: v for k, v in rows if v or k == "TOTAL"}
+        by_status.setdefault("TOTAL", 0)
+        if include_archive:
+            # opt-in: zählt das Archiv direkt (nicht O(1))
+            def _arch(conn):
+                total = conn.execute("SELECT COUNT(*) FROM archive.tenders").fetchone()[0]
+                per = conn.execute(
+                    "SELECT COALESCE(status,'neu'), COUNT(*) FROM archive.tender_status GROUP BY COALESCE(status,'neu')"
+                ).fetchall()
+                return total, per
+            total, per = self.pool.read(_arch)
+            by_status["TOTAL"] += total
+            for k, v in per:
+                by_status[k] = by_status.get(k, 0) + v
+            by_status["ARCHIV"] = total
         return by_status
 
+    def archive_expired(self, grace_days: int = 30, batch_size: int = 500, now: Optional[datetime] = None) -> int:
+        """
+        Verschiebt abgelaufene Tender ins Archiv (safkaty_archive.db), in Batches:
+        - abgeschlossener Status (gewonnen/verloren/abgebrochen) und Frist vorbei, oder
+        - Frist seit mehr als grace_days vorbei (außer 'angebot_abgegeben' – wartet auf Zuschlag).
+        Jeder Batch ist ein eigener Writer-Job, andere Schreibzugriffe (GUI) kommen dazwischen dran.
+        Gibt die Anzahl verschobener Tender zurück.
+        """
+        now = now or datetime.now()
+        now_ts = now.strftime("%Y-%m-%d %H:%M")
+        cutoff = (now - timedelta(days=grace_days)).strftime("%Y-%m-%d %H:%M")
+        moved = 0
+        while True:
+            # zwei Jobs, jeder schreibt nur in EINE Datei: SQLite committet ATTACH-Transaktionen im WAL-Modus
+            # nicht atomar über beide Dateien. Erst kopieren (idempotent), dann nur im Archiv vorhandene
+            # Zeilen aus main löschen. Bricht es dazwischen ab, liegt die Zeile doppelt vor und der nächste
+            # Lauf (beim Start) schließt den Umzug ab.
+            ids = self.pool.write(lambda conn: self._archive_copy(conn, now_ts, cutoff, batch_size))
+            if ids:
+                ids = self.pool.write(lambda conn: self._archive_drop(conn, ids))
+            self._invalidate(*ids)
+            moved += len(ids)
+            if len(ids) < batch_size:
+                return moved
+
+    def _archive_copy(self, conn: sqlite3.Connection, now_ts: str, cutoff: str, batch_size: int) -> List[int]:
+        closed = ",".join("?" * len(self.CLOSED_STATUSES))
+        rows = conn.execute(f"""
+            SELECT t.id FROM main.tenders t
+            LEFT JOIN main.tender_status ts ON ts.tender_id=t.id
+            WHERE (t.echeance_at < ?
+                   AND (COALESCE(ts.status,'neu') IN ({closed})
+                        OR (t.echeance_at < ? AND COALESCE(ts.status,'neu') <> 'angebot_abgegeben')))
+               OR t.id IN (SELECT id FROM archive.tenders)
+            LIMIT ?
+        """, (now_ts, *self.CLOSED_STATUSES, cutoff, batch_size)).fetchall()
+        if not rows:
+            return []
+        ids = json.dumps([r[0] for r in rows])
+        # Lots vorher leeren: bei einem Wiederholungslauf könnten in main Lots weggefallen sein
+        conn.execute("DELETE FROM archive.tender_lots WHERE tender_id IN (SELECT value FROM json_each(?))", (ids,))
+        for table, key in (("tenders", "id"), ("tender_status", "tender_id"), ("tender_lots", "tender_id")):
+            cols = ", ".join(r[1] for r in conn.execute(f"PRAGMA main.table_info({table})"))
+            conn.execute(f"""
+                INSERT OR REPLACE INTO archive.{table} ({cols})
+                SELECT {cols} FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))
+            """, (ids,))
+        return [r[0] for r in rows]
+
+    def _archive_drop(self, conn: sqlite3.Connection, ids: List[int]) -> List[int]:
+        # nur Zeilen löschen, die (committet) im Archiv liegen
+        rows = conn.execute("""
+            SELECT t.id, t.reference FROM main.tenders t
+            WHERE t.id IN (SELECT value FROM json_each(?)) AND t.id IN (SELECT id FROM archive.tenders)
+        """, (json.dumps(ids),)).fetchall()
+        if not rows:
+            return []
+        ids_json = json.dumps([r[0] for r in rows])
+        for tid, ref in rows:
+            self._log_change(conn, tid, ref, "archive", {})
+        for table, key in (("tender_lots", "tender_id"), ("tender_status", "tender_id"), ("tenders", "id")):
+            conn.execute(f"DELETE FROM main.{table} WHERE {key} IN (SELECT value FROM json_each(?))", (ids_json,))
+        return [r[0] for r in rows]
+
+    def delete_tender(self, tender_id: int):
+        def _op(conn: sqlite3.Connection):
+            ref = conn.execute("SELECT reference FROM all_tenders WHERE id=?", (tender_id,)).fetchone()
+            if ref:
+                self._log_change(conn, tender_id, ref[0], "delete", {})
+            conn.execute("DELETE FROM tender_lsh WHERE tender_id=?", (tender_id,))
+            conn.execute("DELETE FROM tender_minhash WHERE tender_id=?", (tender_id,))
+            for schema in ("main", "archive"):
+                conn.execute(f"DELETE FROM {schema}.tender_lots WHERE tender_id=?", (tender_id,))
+                conn.execute(f"DELETE FROM {schema}.tender_status WHERE tender_id=?", (tender_id,))
+                conn.execute(f"DELETE FROM {schema}.tenders WHERE id=?", (tender_id,))
+        self.pool.write(_op)
+        self._invalidate(tender_id)
+
     def close(self):
         try:
-            self.conn.close()
+            self._async_exec.shutdown(wait=True)
+            self.pool.close()
         except Exception:
             pass
 
 
+# --- Seiten-Parser ---
+# Reine Funktionen (HTML/Soup rein, JSON-fähige Daten raus, kein Scraper-Zustand): picklebar für ParsePool
+# und cachebar in ParseCache. Der Scraper holt nur die Seiten und reicht das HTML weiter.
+
+
+def norm_text(s: str) -> str:
+    if not s:
+        return ""
+    s = s.replace("\u00A0", " ")
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def abs_url(base_url: str, href: str) -> str:
+    if not href:
+        return ""
+    if href.startswith("http"):
+        return href
+    if href.startswith("/"):
+        return base_url + href
+    return f"{base_url}/{href}"
+
+
+_DETAIL_HREF_RX = re.compile(r"""href\s*=\s*["']?[^"'\s>]*EntrepriseDetailsConsultation[^"'\s>]*refConsultation=""")
+
+
+def count_detail_links(html: str) -> int:
+    # nur für die Wahl des Endpunkts (_fetch_search_page): im Roh-HTML zählen, ohne Seite zu parsen
+    return len(_DETAIL_HREF_RX.findall(html or ""))
+
+
+def detail_links_fallback(soup: BeautifulSoup, base_url: str) -> List[str]:
+    links: List[str] = []
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if is_detail_href(href):
+            links.append(abs_url(base_url, href))
+    seen = set()
+    out: List[str] = []
+    for u in links:
+        if u not in seen:
+            seen.add(u)
+            out.append(u)
+    return out
+
+
+def parse_result_table(html: str, base_url: str) -> Iterator[Tuple[Dict[str, str], str]]:
+    """
+    SUPER robust (ohne Spaltenindex-Mapping):
+    - Wir lesen pro Zeile per Regex/Heuristik aus dem Zeilentext.
+    - Wichtig: In jeder Ergebniszeile gibt es mehrere Links (InfoSite, Tester, Ajouter, ...).
+      Wir akzeptieren NUR den Link EntrepriseDetailsConsultation&refConsultation=...
+    Generator über iter_table_rows: wer nach N Zeilen aufhört, lässt den Rest der Seite ungeparst.
+    """
+    import unicodedata
+
+    BAD_KEYS = [
+        "infosite",
+        "conditions d'utilisation", "conditions dutilisation", "conditions d’utilisation",
+        "pre requis", "prerequis", "pre-requis",
+        "acceder a la consultation", "accéder à la consultation",
+        "tester la configuration", "ajouter au panier",
+        "reponse electronique", "réponse électronique",
+        "signature electronique", "signature électronique",
+        "pas de reponse electronique", "pas de réponse électronique",
+        "nouvelle recherche", "actions"
+    ]
+
+    def key(s: str) -> str:
+        # lower + remove accents + normalize spaces
+        s = s.lower()
+        s = unicodedata.normalize("NFKD", s)
+        s = "".join(ch for ch in s if not unicodedata.combining(ch))
+        s = re.sub(r"\s+", " ", s).strip()
+        return s
+
+    def clean_lines(texts: List[str]) -> List[str]:
+        txt = "\n".join(texts)
+        lines = [norm_text(x) for x in txt.split("\n")]
+        lines = [x for x in lines if x and x != "-"]
+        return lines
+
+    bad_keys = [key(x) for x in BAD_KEYS]
+
+    def is_bad_line(ln: str) -> bool:
+        k = key(ln)
+        return any(b in k for b in bad_keys)
+
+    def pick_location(lines: List[str]) -> str:
+        # 1) Nach Acheteur public suchen -> nächste gute kurze Zeile ist meist der Ort
+        for i, ln in enumerate(lines):
+            if "acheteur public" in key(ln):
+                for j in range(i+1, min(i+6, len(lines))):
+                    cand = lines[j]
+                    if is_bad_line(cand):
+                        continue
+                    if ":" in cand:
+                        continue
+                    if 2 <= len(cand) <= 80:
+                        return cand
+
+        # 2) Caps-Heuristik
+        cands = []
+        for ln in lines:
+            if is_bad_line(ln):
+                continue
+            if ":" in ln:
+                continue
+            if len(ln) > 80:
+                continue
+            score = 0
+            if ln.upper() == ln and any(ch.isalpha() for ch in ln):
+                score += 3
+            if re.fullmatch(r"[A-ZÀ-Ü\s'\-]{3,}", ln):
+                score += 2
+            if 1 <= len(ln.split()) <= 5:
+                score += 1
+            if score >= 3:
+                cands.append((score, ln))
+        if cands:
+            cands.sort(key=lambda x: (-x[0], len(x[1])))
+            return cands[0][1]
+
+        # 3) fallback: letzte gute kurze Zeile
+        for ln in reversed(lines):
+            if is_bad_line(ln):
+                continue
+            if ":" in ln:
+                continue
+            if 2 <= len(ln) <= 80:
+                return ln
+        return ""
+
+    def pick_published_and_deadline(lines: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        dates_ddmmyyyy = []
+        for ln in lines:
+            for m in re.finditer(r"\b(\d{2})/(\d{2})/(\d{4})\b", ln):
+                dd, mm, yy = m.group(1), m.group(2), m.group(3)
+                dates_ddmmyyyy.append((yy, mm, dd, f"{dd}/{mm}/{yy}"))
+        if not dates_ddmmyyyy:
+            return (None, None)
+        dates_ddmmyyyy.sort()
+        publication = dates_ddmmyyyy[0][3]
+        deadline = dates_ddmmyyyy[-1][3]
+        return (publication, deadline)
+
+    def pick_time(lines: List[str]) -> str:
+        for ln in lines:
+            m = re.search(r"\b(\d{1,2}:\d{2})\b", ln)
+            if m:
+                return m.group(1)
+        return ""
+
+    def extract_reference(full_text: str) -> str:
+        # Return ONLY the reference code (never "Objet : ..." etc.)
+        text = full_text or ""
+        # cut anything after 'Objet :' if present on same line
+        text = re.split(r"\bObjet\b\s*:", text, flags=re.IGNORECASE)[0]
+
+        patterns = [
+            r"\b\d{1,6}/[A-Z]{1,10}/\d{4}\b",                 # 34/BP/2025
+            r"\b[A-Z0-9]{1,20}/\d{4}/[A-Z0-9_-]+\b",           # TC4129613/2025/ONEEBELEC
+            r"\b\d{1,6}/\d{4}/[A-Z0-9_-]+\b",                 # 336/2025/SRMCS
+            r"\b\d{1,6}/[A-Z0-9_-]{2,20}/\d{4}\b",            # 21/DAAF/FNAC/2025
+            r"\b\d{1,6}/\d{4}\b",                             # 08/2026
+        ]
+        for pat in patterns:
+            mm = re.search(pat, text)
+            if mm:
+                return mm.group(0)
+
+        first_line = (text.splitlines()[0] if text.splitlines() else text).strip()
+        first_token = re.split(r"\s+", first_line)[0]
+        first_token = re.sub(r"[^A-Za-z0-9/_-]", "", first_token)
+        return first_token or ""
+
+
+
+    for texts, href, link_texts in iter_table_rows(html):
+        if href is None:
+            continue
+
+        detail_url = abs_url(base_url, href)
+        lines = clean_lines(texts)
+        lines_clean = [ln for ln in lines if not is_bad_line(ln)]
+        full = "\n".join(lines_clean)
+
+        ref = extract_reference(full)
+
+        objet = ""
+        m = re.search(r"Objet\s*:\s*(.+)", full, flags=re.IGNORECASE)
+        if m:
+            objet = norm_text(m.group(1))
+        else:
+            objet = norm_text(" ".join(link_texts))
+
+        org = ""
+        m = re.search(r"Acheteur\s+public\s*:\s*(.+)", full, flags=re.IGNORECASE)
+        if m:
+            org = norm_text(m.group(1))
+            # falls der Match doch Action-Text enthält -> leeren
+            if is_bad_line(org):
+                org = ""
+
+        lieux = pick_location(lines_clean)
+
+        publication_dd, deadline_dd = pick_published_and_deadline(lines_clean)
+        time_dead = pick_time(lines_clean)
+
+        row_data = {
+            "reference": ref,
+            "objet": objet,
+            "lieux": lieux if not is_bad_line(lieux) else "",
+            "organisation_raw": org if not is_bad_line(org) else "",
+            "date_publication_raw": publication_dd or "",
+            "date_limite_raw": (deadline_dd or "") + (f" {time_dead}" if time_dead else ""),
+        }
+
+        yield row_data, detail_url
+
+
+# Kriterien der erweiterten Suche -> GET-Parameter des Formulars EntrepriseAdvancedSearch (eine Stelle zum Anpassen)
+ADVANCED_SEARCH_PARAMS = {
+    "procedure": "typeProcedure",
+    "category": "categorie",
+    "lieu": "lieuxExecution",
+    "acheteur": "acheteur",
+    "published_from": "dateMiseEnLigneStart",
+    "published_to": "dateMiseEnLigneEnd",
+    "deadline_from": "dateFinStart",
+    "deadline_to": "dateFinEnd",
+}
+SEARCH_CATEGORIES = {"Travaux": "1", "Fournitures": "2", "Services": "3"}
+
+
+def _fold(s: str) -> str:
+    # Vergleich ohne Groß-/Kleinschreibung und Akzente
+    s = unicodedata.normalize("NFKD", (s or "").lower())
+    return _WS_RX.sub(" ", "".join(ch for ch in s if not unicodedata.combining(ch))).strip()
+
+
+_WORD_RX = re.compile(r"[a-z0-9]+")
+
+
+def _phrase_in(phrase: str, text: str) -> bool:
+    # ganze Wortfolge, ohne Akzente/Groß-Klein, Bindestriche usw. als Wortgrenze: "El Jadida" passt nicht auf "EL KELAA"
+    p = " ".join(_WORD_RX.findall(_fold(phrase)))
+    return not p or f" {p} " in " " + " ".join(_WORD_RX.findall(_fold(text))) + " "
+
+
+@dataclass(frozen=True)
+class SearchQuery:
+    """
+    Erweiterte Suche: to_params() lässt das Portal filtern (weniger Ergebnisseiten), matches() prüft
+    Datumsbereiche zusätzlich an jeder Ergebniszeile, bevor Detailseiten geladen werden. Ort und Acheteur
+    filtert nur das Portal (Region "Rabat-Salé-Kénitra" liefert auch "TEMARA"); lokal und dann streng als
+    ganze Wortfolge nur die Felder in ignored, die das Portal nachweislich nicht bekommen hat
+    (siehe MarchesPublicsScraper._as_received). Datumsangaben als yyyy-mm-dd, leer = egal.
+    Prozedur und Kategorie stehen nicht in der Ergebniszeile und werden nur vom Portal gefiltert.
+    """
+    keyword: str = ""
+    procedure: str = ""   # Code des Portals (Typ de procédure)
+    category: str = ""    # Travaux / Services / Fournitures
+    lieu: str = ""
+    acheteur: str = ""
+    published_from: str = ""
+    published_to: str = ""
+    deadline_from: str = ""
+    deadline_to: str = ""
+    ignored: Tuple[str, ...] = ()  # "lieu"/"acheteur", wenn das Portal den Parameter verworfen hat
+
+    def to_params(self) -> Dict[str, str]:
+        params = {"page": "entreprise.EntrepriseAdvancedSearch", "keyWord": self.keyword, "searchAnnCons": "", "lang": "fr"}
+        for attr, name in ADVANCED_SEARCH_PARAMS.items():
+            v = getattr(self, attr)
+            if not v:
+                continue
+            if attr == "category":
+                v = SEARCH_CATEGORIES.get(v, v)
+            elif attr.endswith(("_from", "_to")):
+                y, m, d = v.split("-")
+                v = f"{d}/{m}/{y}"
+            params[name] = v
+        return params
+
+    def matches(self, row: Dict[str, str]) -> bool:
+        # unbekannte (leere) Felder der Zeile schließen nichts aus
+        for attr, key in (("lieu", "lieux"), ("acheteur", "organisation_raw")):
+            if attr in self.ignored and row.get(key) and not _phrase_in(getattr(self, attr), row[key]):
+                return False
+        for raw_key, lo, hi in (("date_publication_raw", self.published_from, self.published_to),
+                                ("date_limite_raw", self.deadline_from, self.deadline_to)):
+            if not (lo or hi):
+                continue
+            d = parse_date_ddmmyyyy(row.get(raw_key, ""))
+            if d and ((lo and d < lo) or (hi and d > hi)):
+                return False
+        return True
+
+
+def parse_search_html(html: str, base_url: str, limit: Optional[int] = None,
+                      query: Optional[SearchQuery] = None) -> Tuple[int, List[Tuple[Dict[str, str], str]], List[str]]:
+    """
+    (Anzahl Detail-Links, Ergebniszeilen, Fallback-Links falls keine Zeilen) – Eintrag "search" im ParseCache.
+    limit: nach so vielen (zu query passenden) Ergebniszeilen aufhören, der Rest der Seite wird nicht geparst.
+    """
+    rows_iter = parse_result_table(html, base_url)
+    if query is not None:
+        rows_iter = (r for r in rows_iter if query.matches(r[0]))
+    rows = list(islice(rows_iter, limit))
+    fallback = []
+    # Fallback nur, wenn die Seite gar keine Ergebnistabelle hat (nicht, wenn query alles verworfen hat)
+    if not rows and (query is None or next(parse_result_table(html, base_url), None) is None):
+        fallback = detail_links_fallback(BeautifulSoup(html, "html.parser"), base_url)
+    return count_detail_links(html), rows, fallback
+
+
+def parse_detail_html(html: str) -> Tuple[Dict[str, str], str]:
+    """Detailseite -> (Felder, Href des Lot-Popups oder ""); Eintrag "detail" im ParseCache."""
+    soup = BeautifulSoup(html, "html.parser")
+    full_text = soup.get_text("\n", strip=True)
+
+    def extract_after_label(label: str) -> str:
+        # robust: accepts "Label : value" and also cases where ':' is on the next line or even missing
+        # Example: "Estimation (en Dhs TTC) : 400 200,00"
+        lab = re.escape(label)
+        m = re.search(
+            rf"{lab}\s*(?:\([^)]*\))?\s*(?:(?::)|(?:\n\s*:))?\s*(.*?)(?:\n(?=[A-Za-zÀ-ÿ0-9][^:\n]{1,80}\s*:)|\Z)",
+            full_text,
+            flags=re.IGNORECASE | re.DOTALL
+        )
+        if not m:
+            return ""
+        val = re.sub(r"\s+", " ", m.group(1)).strip()
+        return val
+
+    def first_email(txt: str) -> str:
+        em = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", txt or "")
+        return em.group(0) if em else ""
+
+    def pick_time(txt: str) -> str:
+        m = re.search(r"\b(\d{1,2}:\d{2})\b", txt or "")
+        return m.group(1) if m else ""
+
+    data: Dict[str, str] = {}
+
+    data["reference"] = norm_text(extract_after_label("Référence") or extract_after_label("Reference"))
+    data["objet"] = norm_text(extract_after_label("Objet"))
+    data["organisation"] = norm_text(extract_after_label("Acheteur public"))
+
+    lieux_raw = extract_after_label("Lieu d'exécution") or extract_after_label("Lieu d’exécution")
+    lieux_raw = re.split(r"\bEstimation\b", lieux_raw, flags=re.IGNORECASE)[0].strip()
+    data["lieux"] = norm_text(lieux_raw)
+
+    echeance_txt = extract_after_label("Date et heure limite de remise des plis") or extract_after_label("Date limite de remise des plis")
+    data["echeance"] = parse_date_ddmmyyyy(echeance_txt) or ""
+    data["echeance_time"] = pick_time(echeance_txt)
+
+    data["estimation"] = norm_text(
+        extract_after_label("Estimation") or
+        extract_after_label("Montant estimatif") or
+        extract_after_label("Montant estimé")
+    )
+    if not data["estimation"]:
+        m = re.search(r"Estimation\s*(?:\([^)]*\))?\s*:\s*([0-9][0-9\s\.,\u00A0\u202F]*)", full_text, flags=re.IGNORECASE)
+        if m:
+            data["estimation"] = norm_text(m.group(1))
+        if not data["estimation"]:
+            m2 = re.search(r"Estimation\s*(?:\([^)]*\))?\s*(?:(?::)|(?:\n\s*:))?\s*([0-9][0-9\s\.,\u00A0\u202F]*)", full_text, flags=re.IGNORECASE)
+            if m2:
+                data["estimation"] = norm_text(m2.group(1))
+
+    data["caution"] = norm_text(
+        extract_after_label("Caution provisoire") or
+        extract_after_label("Garantie provisoire") or
+        extract_after_label("Caution")
+    )
+
+    # "Allotissement : Oui/Non" (siehe lot_popup_needed)
+    m = re.match(r"(Oui|Non)\b", norm_text(extract_after_label("Allotissement")), flags=re.IGNORECASE)
+    data["allotissement"] = m.group(1).capitalize() if m else ""
+
+    # Contact (prefer "Contact Administratif" block to avoid footer text)
+    def _contact_block(txt: str) -> str:
+        if not txt:
+            return ""
+        m = re.search(r"(Contact\s+Administratif|Contact\s+administratif)", txt, flags=re.IGNORECASE)
+        if not m:
+            return txt  # fallback: whole text
+        tail = txt[m.start():]
+        stop = re.search(r"\n(?:Contact\s+technique|Objet\s*:|Acheteur\s+public|Lieu\s+d['’]exécution|Date\s+et\s+heure\s+limite|Lots?)\b", tail, flags=re.IGNORECASE)
+        return tail[:stop.start()] if stop else tail
+
+    def _first_email(txt: str) -> str:
+        m = re.search(r"([A-Z0-9._%+\-]+@[A-Z0-9.\-]+\.[A-Z]{2,})", txt or "", flags=re.IGNORECASE)
+        return m.group(1) if m else ""
+
+    def _phone(txt: str) -> str:
+        if not txt:
+            return ""
+        m = re.search(r"(?:Téléphone|Telephone|Tel|Tél)\s*[:\-]?\s*([+]?\d[\d\s\-/]{6,})", txt, flags=re.IGNORECASE)
+        if m:
+            return m.group(1).strip()
+        m = re.search(r"(\+212[\d\s\-/]{7,}|0[\d\s\-/]{8,})", txt)
+        return m.group(1).strip() if m else ""
+
+    cb = _contact_block(full_text)
+    data["contact_email"] = norm_text(extract_after_label("Adresse électronique") or _first_email(cb))
+    data["contact_phone"] = norm_text(_phone(cb))
+
+    # Prefer to discover the *real* popup URL from the HTML (robust against parameter naming changes)
+    def find_popup_url_from_html(soup_obj, html_text: str) -> str:
+        # 1) direct link in href
+        for a in soup_obj.find_all("a", href=True):
+            href = a.get("href", "")
+            if "PopUpDetailLots" in href:
+                return href
+        # 2) sometimes it is embedded in onclick JS
+        for a in soup_obj.find_all("a"):
+            onclick = a.get("onclick") or ""
+            m = re.search(r"(index\.php\?page=commun\.PopUpDetailLots[^'\"]+)", onclick)
+            if m:
+                return m.group(1)
+        # 3) last resort: regex scan in HTML
+        m = re.search(r"(index\.php\?page=commun\.PopUpDetailLots[^'\"\s>]+)", html_text or "")
+        if m:
+            return m.group(1)
+        return ""
+
+    return data, find_popup_url_from_html(soup, html)
+
+
+def parse_popup_html(html: str) -> List[Tuple[int, str, str, str]]:
+    # Eintrag "popup" im ParseCache
+    return list(iter_lots_popup(html))
+
+
+def lot_popup_needed(data: Dict[str, str], popup_href: str) -> bool:
+    """
+    Lot-Popup nur abrufen, wenn die Detailseite Lot-Daten offen lässt:
+    - Allotissement "Oui": ja, Beträge je Lot stehen nur im Popup
+    - Allotissement "Non": nur wenn Estimation oder Caution fehlt (das Popup füllt sie bei Lot unique)
+    - keine Angabe: Popup-Link auf der Seite spricht für Lots; ohne Link nur, wenn Beträge fehlen
+    """
+    filled = all((data.get(k) or "").strip() not in ("", "-", "—", "–") for k in ("estimation", "caution"))
+    allot = data.get("allotissement", "")
+    if allot == "Oui":
+        return True
+    if allot == "Non":
+        return not filled
+    return bool(popup_href) or not filled
+
+
+PAGE_PARSERS: Dict[str, Callable] = {
+    "search": parse_search_html,
+    "detail": parse_detail_html,
+    "popup": parse_popup_html,
+}
+
+
+# Parser-Versionen je Seitentyp: Hochzählen, wenn sich die Extraktion ändert -> alte Cache-Einträge
+# werden nicht mehr getroffen und beim nächsten Öffnen des Caches gelöscht.
+PARSER_VERSIONS = {"search": 4, "detail": 2, "popup": 1}
+
+
+class ParseCache:
+    """
+    Ergebnis-Cache für Seiten-Parser: (Seitentyp, Parser-Version, SHA-256 des HTML) -> JSON des Ergebnisses.
+    Unveränderte Seiten (Detailseiten, Popups, Ergebnisseiten) werden nicht erneut geparst.
+    Vorne ein LRU im Speicher, optional dahinter eine SQLite-Datei (überlebt Neustarts), beide begrenzt.
+    Werte müssen JSON-fähig sein (Tupel kommen als Listen zurück); jeder Treffer ist eine frische Kopie.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 256, disk_capacity: int = 5000):
+        self.path = path
+        self.capacity = max(0, capacity)
+        self.disk_capacity = max(0, disk_capacity)
+        self._mem: "OrderedDict[Tuple[str, int, bytes], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+        self._disk_rows = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        # erst beim ersten Zugriff öffnen (im Scraper-Thread, nicht beim Programmstart)
+        if self._opened:
+            return self._conn
+        self._opened = True
+        if not self.path or not self.disk_capacity:
+            return None
+        try:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache (
+                    kind TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    digest BLOB NOT NULL,
+                    payload TEXT NOT NULL,
+                    used_at REAL NOT NULL,
+                    PRIMARY KEY (kind, version, digest)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_used ON parse_cache(used_at)")
+            # Einträge alter Parser-Versionen (und unbekannter Seitentypen) verwerfen
+            conn.execute(
+                f"DELETE FROM parse_cache WHERE kind NOT IN ({','.join('?' * len(PARSER_VERSIONS))})",
+                tuple(PARSER_VERSIONS),
+            )
+            for kind, version in PARSER_VERSIONS.items():
+                conn.execute("DELETE FROM parse_cache WHERE kind = ? AND version <> ?", (kind, version))
+            conn.commit()
+            self._disk_rows = conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+            self._conn = conn
+        except sqlite3.Error:
+            self._conn = None
+        return self._conn
+
+    def get_or_parse(self, kind: str, body: str, parse: Callable[[str], object], extra: str = ""):
+        """
+        parse(body) nur ausführen, wenn für genau diesen Inhalt (und diese Parser-Version) nichts gespeichert ist.
+        extra: weitere Eingaben des Parsers, die das Ergebnis ändern (z.B. Base URL für absolute Links).
+        """
+        digest = hashlib.sha256((body or "").encode("utf-8", "surrogatepass"))
+        if extra:
+            digest.update(b"\0" + extra.encode("utf-8", "surrogatepass"))
+        key = (kind, PARSER_VERSIONS[kind], digest.digest())
+        with self._lock:
+            payload = self._mem.get(key)
+            if payload is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+            conn = self._disk()
+            if conn is not None:
+                try:
+                    row = conn.execute(
+                        "SELECT payload FROM parse_cache WHERE kind = ? AND version = ? AND digest = ?", key
+                    ).fetchone()
+                    if row:
+                        conn.execute(
+                            "UPDATE parse_cache SET used_at = ? WHERE kind = ? AND version = ? AND digest = ?",
+                            (time.time(),) + key,
+                        )
+                        conn.commit()
+                        self.hits += 1
+                        self.disk_hits += 1
+                        self._remember(key, row[0])
+                        return json.loads(row[0])
+                except sqlite3.Error:
+                    pass
+            self.misses += 1
+
+        # Parsen außerhalb des Locks (kann dauern); ein paralleler Miss auf dieselbe Seite parst eben doppelt
+        value = parse(body)
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, payload)
+            conn = self._disk()
+            if conn is not None:
+                try:
+                    cur = conn.execute(
+                        "INSERT OR REPLACE INTO parse_cache (kind, version, digest, payload, used_at) VALUES (?, ?, ?, ?, ?)",
+                        key + (payload, time.time()),
+                    )
+                    self._disk_rows += cur.rowcount
+                    if self._disk_rows > self.disk_capacity * 1.1:
+                        # älteste (zuletzt genutzte) Einträge bis auf disk_capacity löschen
+                        conn.execute("""
+                            DELETE FROM parse_cache WHERE (kind, version, digest) IN (
+                                SELECT kind, version, digest FROM parse_cache ORDER BY used_at LIMIT ?
+                            )
+                        """, (self._disk_rows - self.disk_capacity,))
+                        self._disk_rows = conn.execute("SELECT COUNT(*) FROM parse_cache").fetchone()[0]
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+        return json.loads(payload)
+
+    def _remember(self, key, payload: str):
+        if not self.capacity:
+            return
+        self._mem[key] = payload
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.capacity:
+            self._mem.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "size": len(self._mem),
+                "disk_size": self._disk_rows,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+
+
+class ParsePool:
+    """
+    Parse-Stufe in eigenen Prozessen: BeautifulSoup ist CPU-gebunden und hält die GIL, hier parst ein Prozess
+    je Kern (PAGE_PARSERS), während die Netzwerk-Threads weiterladen und die GUI flüssig bleibt.
+    max_pending begrenzt die Seiten in der Parse-Warteschlange (Backpressure: Netzwerk-Threads warten,
+    statt HTML im Speicher zu stapeln). Prozesse starten erst beim ersten Auftrag.
+    Fällt der Pool aus (Worker-Prozess abgestürzt/beendet), wird ab dann im aufrufenden Thread geparst.
+    """
+
+    def __init__(self, processes: Optional[int] = None, max_pending: Optional[int] = None):
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.max_pending = max(1, max_pending or 2 * self.processes)
+        # spawn statt fork: der Aufrufer hat Threads (Tk, DB, Netzwerk), fork würde deren Locks mitkopieren
+        self._exec = ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.inline = 0  # Aufträge, die wegen eines Pool-Fehlers im aufrufenden Thread liefen
+        self.broken = False
+        self.wait_s = 0.0  # Zeit, die Netzwerk-Threads auf einen freien Platz gewartet haben
+
+    def parse(self, kind: str, html: str, *args):
+        """Blockierend (aus einem Netzwerk-Thread): PAGE_PARSERS[kind](html, *args) in einem Worker-Prozess."""
+        if not self.broken:
+            t0 = time.perf_counter()
+            with self._slots:
+                waited = time.perf_counter() - t0
+                with self._lock:
+                    self.jobs += 1
+                    self.wait_s += waited
+                try:
+                    return self._exec.submit(PAGE_PARSERS[kind], html, *args).result()
+                except BrokenProcessPool:
+                    self.broken = True
+        # Fehler des Parsers selbst kommen oben unverändert durch, hier nur Ausfälle des Pools
+        with self._lock:
+            self.inline += 1
+        return PAGE_PARSERS[kind](html, *args)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"processes": self.processes, "max_pending": self.max_pending,
+                    "jobs": self.jobs, "inline": self.inline, "broken": self.broken, "wait_s": self.wait_s}
+
+    def close(self):
+        self._exec.shutdown(wait=False, cancel_futures=True)
+
+
+_NO_RESULTS_RX = re.compile(r"aucun(?:e)?\s+(?:r[ée]sultat|consultation)", re.IGNORECASE)
+
+
+class SessionStore:
+    """
+    Portal-Sitzung je Base URL in einer JSON-Datei: funktionierender Endpoint (index.php5/index.php) und Cookies.
+    Neue Scraper (Programmstart, _apply_settings) übernehmen sie, statt Endpoint und PHP-Sitzung neu aufzubauen.
+    Zwei Ablaufzeiten: der Endpoint gilt lange, die Cookies nur so lange, wie das Portal eine untätige
+    Sitzung hält (jede erfolgreiche Anfrage verlängert).
+    """
+
+    def __init__(self, path: str, endpoint_ttl: float = 7 * 86400, session_ttl: float = 20 * 60):
+        self.path = path
+        self.endpoint_ttl = endpoint_ttl
+        self.session_ttl = session_ttl
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data: Dict[str, Dict]):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def load(self, base_url: str, now: Optional[float] = None) -> Optional[Dict]:
+        """{"endpoint", "cookies"} für base_url; abgelaufene Teile fehlen (None = nichts Gültiges)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            state = self._read().get(base_url)
+        if not state or state.get("endpoint_expires", 0) < now:
+            return None
+        cookies = []
+        if state.get("session_expires", 0) >= now:
+            cookies = [c for c in state.get("cookies", []) if not c.get("expires") or c["expires"] > now]
+        return {"endpoint": state.get("endpoint"), "cookies": cookies}
+
+    def save(self, base_url: str, endpoint: str, cookies: List[Dict], used_at: float):
+        with self._lock:
+            data = self._read()
+            data[base_url] = {
+                "endpoint": endpoint,
+                "cookies": cookies,
+                "endpoint_expires": used_at + self.endpoint_ttl,
+                "session_expires": used_at + self.session_ttl,
+            }
+            try:
+                self._write(data)
+            except OSError:
+                pass
+
+    def drop(self, base_url: str):
+        with self._lock:
+            data = self._read()
+            if data.pop(base_url, None) is not None:
+                try:
+                    self._write(data)
+                except OSError:
+                    pass
+
+
 class MarchesPublicsScraper:
-    def __init__(self, base_url: str = "https://www.marchespublics.gov.ma"):
+    def __init__(self, base_url: str = "https://www.marchespublics.gov.ma", parse_cache: Optional[ParseCache] = None,
+                 parse_pool: Optional[ParsePool] = None, fetch_workers: int = 1,
+                 session_store: Optional[SessionStore] = None):
         self.base_url = base_url.rstrip("/")
+        # Parse-Ergebnisse je Seiteninhalt (von der App geteilt, überlebt _apply_settings)
+        self.parse_cache = parse_cache if parse_cache is not None else ParseCache()
+        # optional: Parsen in Prozessen (ParsePool) und mehrere Detailseiten gleichzeitig laden (große Crawls);
+        # Standard bleibt eine Seite nach der anderen mit polite_delay
+        self.parse_pool = parse_pool
+        self.fetch_workers = max(1, fetch_workers)
+        # Lot-Popups der letzten Suche: abgerufene / dank Detailseite eingesparte Anfragen (lot_popup_needed)
+        self.popup_stats: Dict[str, int] = {"requests": 0, "avoided": 0}
+        self._stats_lock = threading.Lock()
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.6",
         })
+        # Fetch-Threads (_fetch_details_many) bekommen je eine eigene Session (requests.Session ist nicht threadsicher)
+        self._local = threading.local()
+        # funktionierender Endpoint (index.php5/index.php) und Zeit der letzten erfolgreichen Portal-Anfrage;
+        # beides mit den Cookies im SessionStore, damit der nächste Scraper ohne Aufwärmen startet
+        self.endpoint: Optional[str] = None
+        self._session_used: Optional[float] = None
+        self.last_response_url = ""
+        self.last_status = 0
+        self.session_store = session_store
+        self.restore_session()
+
+    def restore_session(self) -> bool:
+        """Gespeicherte Sitzung (Endpoint, Cookies) übernehmen; False, wenn keine gültige vorliegt."""
+        state = self.session_store.load(self.base_url) if self.session_store else None
+        if not state:
+            return False
+        self.endpoint = state["endpoint"]
+        for c in state["cookies"]:
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain", ""), path=c.get("path", "/"),
+                                     expires=c.get("expires"), secure=c.get("secure", False))
+        return True
+
+    def save_session(self):
+        if not self.session_store or not self.endpoint or self._session_used is None:
+            return
+        cookies = [
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path,
+             "expires": c.expires, "secure": c.secure}
+            for c in self.session.cookies
+        ]
+        self.session_store.save(self.base_url, self.endpoint, cookies, self._session_used)
+
+    def invalidate_session(self):
+        """Portal hat die Sitzung abgelehnt: Cookies, Endpoint und gespeicherten Stand verwerfen."""
+        self.session.cookies.clear()
+        self.endpoint = None
+        if self.session_store:
+            self.session_store.drop(self.base_url)
+
+    def _session(self) -> requests.Session:
+        return getattr(self._local, "session", None) or self.session
+
+    def _init_fetch_thread(self):
+        # Kopie der Portal-Sitzung (Header, Cookies) für diesen Fetch-Thread
+        s = requests.Session()
+        s.headers.update(self.session.headers)
+        s.cookies.update(self.session.cookies)
+        self._local.session = s
 
     def _abs_url(self, href: str) -> str:
-        if not href:
-            return ""
-        if href.startswith("http"):
-            return href
-        if href.startswith("/"):
-            return self.base_url + href
-        return f"{self.base_url}/{href}"
+        return abs_url(self.base_url, href)
 
     def _norm(self, s: str) -> str:
-        if not s:
-            return ""
-        s = s.replace("\u00A0", " ")
-        s = re.sub(r"\s+", " ", s).strip()
-        return s
+        return norm_text(s)
+
+    def _count_popup(self, key: str):
+        with self._stats_lock:
+            self.popup_stats[key] += 1
+
+    def _parse(self, kind: str, html: str, *args):
+        # ParseCache zuerst; bei Miss im ParsePool (falls vorhanden), sonst direkt in diesem Thread
+        pool = self.parse_pool
+        if pool is not None:
+            run = lambda h: pool.parse(kind, h, *args)
+        else:
+            run = lambda h: PAGE_PARSERS[kind](h, *args)
+        return self.parse_cache.get_or_parse(kind, html, run, extra="\0".join(map(str, args)))
 
     def _get(self, url: str, params: Optional[dict] = None, timeout: int = 40, headers: Optional[dict] = None) -> str:
         last_err = None
         for attempt in range(3):
             try:
-                r = self.session.get(url, params=params, timeout=timeout, headers=headers)
+                r = self._session().get(url, params=params, timeout=timeout, headers=headers)
                 self.last_response_url = str(r.url)
+                self.last_status = r.status_code
                 txt = r.text or ""
                 if "captcha" in txt.lower() or "access denied" in txt.lower():
                     raise RuntimeError("CAPTCHA/Block erkannt. Bitte 'Max' kleiner machen (z.B. 10) oder später erneut.")
+                if r.ok:
+                    self._session_used = time.time()
                 return txt
             except Exception as e:
                 last_err = e
                 time.sleep(1.3 + attempt * 1.2)
         raise RuntimeError(str(last_err))
 
-    # NEW: robust fetch (index.php5 vs index.php)
-    def _count_detail_links(self, soup: BeautifulSoup) -> int:
-        return sum(
-            1 for a in soup.find_all("a", href=True)
-            if "EntrepriseDetailsConsultation" in a["href"] and "refConsultation=" in a["href"]
-        )
-
-    def _fetch_search_soup(self, keyword: str) -> BeautifulSoup:
-        params = {"page": "entreprise.EntrepriseAdvancedSearch", "keyWord": keyword, "searchAnnCons": "", "lang": "fr"}
-        best_html = ""
-        best_links = -1
+    # robust fetch (index.php5 vs index.php)
+    def _fetch_search_page(self, query: SearchQuery,
+                           limit: Optional[int] = None) -> Tuple[int, List[Tuple[Dict[str, str], str]], List[str]]:
+        params = query.to_params()
 
+        # bekannter Endpoint (ggf. aus dem SessionStore): eine Anfrage statt beider Varianten
+        if self.endpoint:
+            try:
+                html = self._get(f"{self.base_url}/{self.endpoint}", params=params)
+                rejected = not self._search_accepted(params["page"])
+                if not rejected:
+                    page = self._parse("search", html, self.base_url, limit, self._as_received(query))
+                    # auch ohne Treffer gültig, solange es die Suchseite ist (Filter ohne Ergebnis)
+                    rejected = not self._is_search_page(html, params["page"], page)
+                    if not rejected:
+                        return page
+            except Exception:
+                # Timeout, Netzfehler, CAPTCHA: sagt nichts über die Sitzung -> Stand behalten, Endpoints neu prüfen
+                rejected = False
+            if rejected:
+                # Fehlerstatus, Umleitung oder fremde Seite: Portal hat die Sitzung abgelehnt -> neu aufbauen
+                self.invalidate_session()
+
+        best = None
+        best_endpoint = None
         for endpoint in ("index.php5", "index.php"):
             url = f"{self.base_url}/{endpoint}"
             try:
                 html = self._get(url, params=params)
-                soup = BeautifulSoup(html, "html.parser")
-                cnt = self._count_detail_links(soup)
-                if cnt > best_links:
-                    best_links = cnt
-                    best_html = html
+                if not self._search_accepted(params["page"]):
+                    continue
+                page = self._parse("search", html, self.base_url, limit, self._as_received(query))
+                if not self._is_search_page(html, params["page"], page):
+                    continue
+                if best is None or page[0] > best[0]:
+                    best = page
+                    best_endpoint = endpoint
             except Exception:
                 continue
 
-        if not best_html:
-            best_html = self._get(f"{self.base_url}/index.php", params=params)
-
-        return BeautifulSoup(best_html, "html.parser")
-
-    def _extract_detail_links_fallback(self, soup: BeautifulSoup) -> List[str]:
-        links: List[str] = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if "EntrepriseDetailsConsultation" in href and "refConsultation=" in href:
-                links.append(self._abs_url(href))
-        seen = set()
-        out: List[str] = []
-        for u in links:
-            if u not in seen:
-                seen.add(u)
-                out.append(u)
-        return out
+        if best is None:
+            html = self._get(f"{self.base_url}/index.php", params=params)
+            best = self._parse("search", html, self.base_url, limit, self._as_received(query))
+        else:
+            self.endpoint = best_endpoint
+
+        return best
+
+    def _search_accepted(self, page: str) -> bool:
+        # abgelaufene PRADO-Sitzungen leiten auf eine andere Seite (Startseite/Login) um
+        if self.last_status >= 400:
+            return False
+        q = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.last_response_url).query))
+        return q.get("page", page) == page
+
+    def _as_received(self, query: SearchQuery) -> SearchQuery:
+        # Ort/Acheteur, die in der (ggf. umgeleiteten) Antwort-URL fehlen, hat das Portal nicht gefiltert
+        got = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.last_response_url).query))
+        ignored = tuple(a for a in ("lieu", "acheteur") if getattr(query, a) and ADVANCED_SEARCH_PARAMS[a] not in got)
+        return replace(query, ignored=ignored)
+
+    @staticmethod
+    def _is_search_page(html: str, page: str, parsed) -> bool:
+        # Treffer, oder Markup der Suchseite selbst (PRADO-Formular postet auf ?page=..., "Aucun résultat")
+        return bool(parsed[0] or parsed[1]) or page in html or bool(_NO_RESULTS_RX.search(html))
 
     def _find_value_by_labels(self, soup: BeautifulSoup, labels: List[str]) -> str:
         labels_norm = [self._norm(l).lower() for l in labels]
@@ -535,238 +2701,15 @@ class MarchesPublicsScraper:
 
         referer = f"{self.base_url}/index.php?page=entreprise.EntrepriseAdvancedSearch&lang=fr"
         html = self._get(detail_url, headers={"Referer": referer})
-        soup = BeautifulSoup(html, "html.parser")
-        full_text = soup.get_text("\n", strip=True)
-
-        def extract_after_label(label: str) -> str:
-            # robust: accepts "Label : value" and also cases where ':' is on the next line or even missing
-            # Example: "Estimation (en Dhs TTC) : 400 200,00"
-            lab = re.escape(label)
-            m = re.search(
-                rf"{lab}\s*(?:\([^)]*\))?\s*(?:(?::)|(?:\n\s*:))?\s*(.*?)(?:\n(?=[A-Za-zÀ-ÿ0-9][^:\n]{1,80}\s*:)|\Z)",
-                full_text,
-                flags=re.IGNORECASE | re.DOTALL
-            )
-            if not m:
-                return ""
-            val = re.sub(r"\s+", " ", m.group(1)).strip()
-            return val
-
-        def first_email(txt: str) -> str:
-            em = re.search(r"[\w\.-]+@[\w\.-]+\.\w+", txt or "")
-            return em.group(0) if em else ""
-
-        def pick_time(txt: str) -> str:
-            m = re.search(r"\b(\d{1,2}:\d{2})\b", txt or "")
-            return m.group(1) if m else ""
-
-        data: Dict[str, str] = {}
-
-        data["reference"] = self._norm(extract_after_label("Référence") or extract_after_label("Reference"))
-        data["objet"] = self._norm(extract_after_label("Objet"))
-        data["organisation"] = self._norm(extract_after_label("Acheteur public"))
+        data, popup_href = self._parse("detail", html)
 
-        lieux_raw = extract_after_label("Lieu d'exécution") or extract_after_label("Lieu d’exécution")
-        lieux_raw = re.split(r"\bEstimation\b", lieux_raw, flags=re.IGNORECASE)[0].strip()
-        data["lieux"] = self._norm(lieux_raw)
-
-        echeance_txt = extract_after_label("Date et heure limite de remise des plis") or extract_after_label("Date limite de remise des plis")
-        data["echeance"] = parse_date_ddmmyyyy(echeance_txt) or ""
-        data["echeance_time"] = pick_time(echeance_txt)
-
-        data["estimation"] = self._norm(
-            extract_after_label("Estimation") or
-            extract_after_label("Montant estimatif") or
-            extract_after_label("Montant estimé")
-        )
-        if not data["estimation"]:
-            m = re.search(r"Estimation\s*(?:\([^)]*\))?\s*:\s*([0-9][0-9\s\.,\u00A0\u202F]*)", full_text, flags=re.IGNORECASE)
-            if m:
-                data["estimation"] = self._norm(m.group(1))
-            if not data["estimation"]:
-                m2 = re.search(r"Estimation\s*(?:\([^)]*\))?\s*(?:(?::)|(?:\n\s*:))?\s*([0-9][0-9\s\.,\u00A0\u202F]*)", full_text, flags=re.IGNORECASE)
-                if m2:
-                    data["estimation"] = self._norm(m2.group(1))
-
-        data["caution"] = self._norm(
-            extract_after_label("Caution provisoire") or
-            extract_after_label("Garantie provisoire") or
-            extract_after_label("Caution")
-        )
-
-        # Contact (prefer "Contact Administratif" block to avoid footer text)
-        def _contact_block(txt: str) -> str:
-            if not txt:
-                return ""
-            m = re.search(r"(Contact\s+Administratif|Contact\s+administratif)", txt, flags=re.IGNORECASE)
-            if not m:
-                return txt  # fallback: whole text
-            tail = txt[m.start():]
-            stop = re.search(r"\n(?:Contact\s+technique|Objet\s*:|Acheteur\s+public|Lieu\s+d['’]exécution|Date\s+et\s+heure\s+limite|Lots?)\b", tail, flags=re.IGNORECASE)
-            return tail[:stop.start()] if stop else tail
-
-        def _first_email(txt: str) -> str:
-            m = re.search(r"([A-Z0-9._%+\-]+@[A-Z0-9.\-]+\.[A-Z]{2,})", txt or "", flags=re.IGNORECASE)
-            return m.group(1) if m else ""
-
-        def _phone(txt: str) -> str:
-            if not txt:
-                return ""
-            m = re.search(r"(?:Téléphone|Telephone|Tel|Tél)\s*[:\-]?\s*([+]?\d[\d\s\-/]{6,})", txt, flags=re.IGNORECASE)
-            if m:
-                return m.group(1).strip()
-            m = re.search(r"(\+212[\d\s\-/]{7,}|0[\d\s\-/]{8,})", txt)
-            return m.group(1).strip() if m else ""
-
-        cb = _contact_block(full_text)
-        data["contact_email"] = self._norm(extract_after_label("Adresse électronique") or _first_email(cb))
-        data["contact_phone"] = self._norm(_phone(cb))
         # LOT popup parsing (Estimation/Caution per lot)
         try:
             import urllib.parse
-            import json as _json
-
-            def is_empty(v: str) -> bool:
-                return (v or "").strip() in ("", "-", "—", "–")
-
-            def parse_money_from_text(t: str) -> str:
-                """
-                Extract a money-like amount from text.
-                We avoid accidentally grabbing phone numbers / huge concatenations.
-                Prefer amounts with decimals (',' or '.') or an explicit currency.
-                """
-                if not t:
-                    return ""
-                t = self._norm(t)
-
-                # Find candidates like: "12 000,00 DH" / "12000.00 MAD" / "400 200,00"
-                candidates = re.findall(
-                    r"([0-9][0-9\s\.,\u00A0\u202F]*)(?:\s*(DH|DHS|MAD))?",
-                    t,
-                    flags=re.IGNORECASE
-                )
-                for num_raw, cur in candidates:
-                    num = self._norm(num_raw)
-                    cur = (cur or "").strip().upper()
-
-                    # Require either decimal separators OR explicit currency (to avoid phones/IDs)
-                    if ("," not in num_raw and "." not in num_raw) and not cur:
-                        continue
-
-                    # remove separators to gauge digit length (ignore decimals)
-                    digits = re.sub(r"[^0-9]", "", num_raw)
-                    if len(digits) > 15:
-                        continue
-
-                    out = num
-                    if cur:
-                        out = f"{out} {cur}"
-                    return out.strip()
-
-                return ""
-
-            def extract_value_from_lines(lines, key_regex):
-                # Find line containing label; value may be on same line after ':' or on next line(s).
-                # IMPORTANT: stop scanning if another label or next Lot starts (prevents stealing Estimation for Caution etc.)
-                LABEL_STOP = re.compile(
-                    r"^(Estimation|Caution\s+provisoire|Cat[ée]gorie|Objet|Acheteur\s+public|Lieu|Date\s+et\s+heure|Date\s+limite|Proc[ée]dure|Type\s+d'annonce|Allotissement)\b",
-                    flags=re.IGNORECASE
-                )
-                LOT_STOP = re.compile(r"^Lot\s*(?:n[°o]\s*)?\d+\b", flags=re.IGNORECASE)
-
-                for i, line in enumerate(lines):
-                    if re.search(key_regex, line, flags=re.IGNORECASE):
-                        # same line: Label : value
-                        if ":" in line:
-                            after = line.split(":", 1)[1].strip()
-                            v = parse_money_from_text(after)
-                            if v:
-                                return v
-
-                        # next lines: value might be after ':' on own line or on following line
-                        for j in range(i + 1, min(i + 10, len(lines))):
-                            nxt = lines[j].strip()
-                            if not nxt or nxt in ("-", "—", "–"):
-                                continue
-                            if nxt == ":":
-                                continue
-
-                            # stop if we hit another label (and it's not just the same one repeated) or next Lot
-                            if LOT_STOP.match(nxt):
-                                break
-                            if (":" in nxt and re.match(r"^[A-Za-zÀ-ÿ]", nxt)) or LABEL_STOP.match(nxt):
-                                break
-
-                            v = parse_money_from_text(nxt)
-                            if v:
-                                return v
-                        return ""
-                return ""
-
-            def extract_lot_title(lines):
-                # Usually: first meaningful line after "Lot X:" before "Catégorie"
-                for ln in lines:
-                    if re.match(r"^Cat[ée]gorie\b", ln, flags=re.IGNORECASE):
-                        break
-                    if re.match(r"^(Services|Travaux|Fournitures)\b", ln, flags=re.IGNORECASE):
-                        # category line; not a title
-                        continue
-                    if ln and ln not in ("-", "—", "–"):
-                        return ln
-                return ""
-
-            def parse_popup(html_text: str):
-                soup = BeautifulSoup(html_text, "html.parser")
-                text = soup.get_text("\n", strip=True)
-                lines = [self._norm(x) for x in text.split("\n") if self._norm(x)]
-
-                lots = []
-                current_no = None
-                current_lines = []
-
-                def flush():
-                    nonlocal current_no, current_lines
-                    if current_no is None:
-                        return
-                    title = extract_lot_title(current_lines)
-                    est = extract_value_from_lines(current_lines, r"^Estimation\b")
-                    cau = extract_value_from_lines(current_lines, r"^Caution\s+provisoire\b")
-
-                    # Portal often shows estimation without currency; normalize to DH if none
-                    if est and not re.search(r"\b(DH|DHS|MAD)\b", est, flags=re.IGNORECASE):
-                        est = est + " DH"
-                    if cau and not re.search(r"\b(DH|DHS|MAD)\b", cau, flags=re.IGNORECASE):
-                        cau = cau + " DH"
-
-                    if est or cau or title:
-                        lots.append((current_no, self._norm(title), self._norm(est), self._norm(cau)))
-                    current_no = None
-                    current_lines = []
-
-                for ln in lines:
-                    mlot = re.match(r"^Lot\s*(?:n[°o]\s*)?(\d+)\b(?:\s*(?:[:\-–—].*)?)?$", ln, flags=re.IGNORECASE)
-                    if mlot:
-                        flush()
-                        current_no = int(mlot.group(1))
-                        current_lines = []
-                        continue
-                    if current_no is not None:
-                        current_lines.append(ln)
-
-                flush()
-
-                if not lots:
-                    # Lot unique fallback: treat whole text
-                    title = ""
-                    est = extract_value_from_lines(lines, r"^Estimation\b")
-                    cau = extract_value_from_lines(lines, r"^Caution\s+provisoire\b")
-                    if est and not re.search(r"\b(DH|DHS|MAD)\b", est, flags=re.IGNORECASE):
-                        est = est + " DH"
-                    if cau and not re.search(r"\b(DH|DHS|MAD)\b", cau, flags=re.IGNORECASE):
-                        cau = cau + " DH"
-                    if est or cau:
-                        lots = [(1, title, self._norm(est), self._norm(cau))]
-                return lots
+            import json as _json
+
+            def is_empty(v: str) -> bool:
+                return (v or "").strip() in ("", "-", "—", "–")
 
             parsed = urllib.parse.urlparse(detail_url)
             q = dict(urllib.parse.parse_qsl(parsed.query, keep_blank_values=True))
@@ -776,39 +2719,26 @@ class MarchesPublicsScraper:
             retraits = q.get("retraits", "")
             lang = (q.get("lang") or "fr").strip() or "fr"
 
-            
-            # Prefer to discover the *real* popup URL from the HTML (robust against parameter naming changes)
-            def find_popup_url_from_html(soup_obj, html_text: str) -> str:
-                # 1) direct link in href
-                for a in soup_obj.find_all("a", href=True):
-                    href = a.get("href", "")
-                    if "PopUpDetailLots" in href:
-                        return href
-                # 2) sometimes it is embedded in onclick JS
-                for a in soup_obj.find_all("a"):
-                    onclick = a.get("onclick") or ""
-                    m = re.search(r"(index\.php\?page=commun\.PopUpDetailLots[^'\"]+)", onclick)
-                    if m:
-                        return m.group(1)
-                # 3) last resort: regex scan in HTML
-                m = re.search(r"(index\.php\?page=commun\.PopUpDetailLots[^'\"\s>]+)", html_text or "")
-                if m:
-                    return m.group(1)
-                return ""
-
-            popup_href = find_popup_url_from_html(soup, html)
             popup_url = self._abs_url(popup_href) if popup_href else ""
+            # Detailseite schlüssig (z.B. Allotissement: Non mit Estimation/Caution) -> kein Popup
+            need_popup = lot_popup_needed(data, popup_href)
+            if not need_popup and (popup_url or (refc and orga)):
+                self._count_popup("avoided")
 
             lots = []
-            if popup_url:
+            if not need_popup:
+                # Lot unique: Lot 1 = Beträge der Detailseite (wie es das Popup liefern würde)
+                lots = [(1, "", data["estimation"], data["caution"])]
+            if popup_url and need_popup:
                 try:
+                    self._count_popup("requests")
                     pop_html = self._get(popup_url, headers={"Referer": detail_url})
-                    lots = parse_popup(pop_html)
+                    lots = self._parse("popup", pop_html)
                 except Exception:
                     lots = []
 
             # Fallback: construct popup URL from query parameters
-            if (not lots) and refc and orga:
+            if need_popup and (not lots) and refc and orga:
                 popup_variants = [
                     {"orgAcronyme": orga, "orgAccronyme": orga},
                     {"orgAccronyme": orga},
@@ -825,8 +2755,9 @@ class MarchesPublicsScraper:
                     }
                     try:
                         tmp_url = f"{self.base_url}/index.php?{urllib.parse.urlencode(popup_q, doseq=True)}"
+                        self._count_popup("requests")
                         pop_html = self._get(tmp_url, headers={"Referer": detail_url})
-                        lots = parse_popup(pop_html)
+                        lots = self._parse("popup", pop_html)
                         if lots:
                             break
                     except Exception:
@@ -834,21 +2765,21 @@ class MarchesPublicsScraper:
                     if lots:
                         break
 
-                if lots:
-                    lots.sort(key=lambda x: x[0])
+            if lots:
+                lots.sort(key=lambda x: x[0])
 
-                    # store lots for caller (search() can expand into multiple rows)
-                    data["lots_json"] = _json.dumps(
-                        [{"lot": n, "lot_title": t, "estimation": e, "caution": c} for n, t, e, c in lots],
-                        ensure_ascii=False
-                    )
+                # store lots for caller (search() attaches them to the Tender -> tender_lots)
+                data["lots_json"] = _json.dumps(
+                    [{"lot": n, "lot_title": t, "estimation": e, "caution": c} for n, t, e, c in lots],
+                    ensure_ascii=False
+                )
 
-                    # For single-lot consultations, also fill the normal fields
-                    if len(lots) == 1:
-                        if is_empty(data.get("estimation", "")) and lots[0][2]:
-                            data["estimation"] = lots[0][2]
-                        if is_empty(data.get("caution", "")) and lots[0][3]:
-                            data["caution"] = lots[0][3]
+                # For single-lot consultations, also fill the normal fields
+                if len(lots) == 1:
+                    if is_empty(data.get("estimation", "")) and lots[0][2]:
+                        data["estimation"] = lots[0][2]
+                    if is_empty(data.get("caution", "")) and lots[0][3]:
+                        data["caution"] = lots[0][3]
         except Exception:
             pass
 
@@ -857,225 +2788,47 @@ class MarchesPublicsScraper:
 
         return data
 
-    def _parse_result_table(self, soup: BeautifulSoup) -> List[Tuple[Dict[str, str], str]]:
-        """
-        SUPER robust (ohne Spaltenindex-Mapping):
-        - Wir lesen pro Zeile per Regex/Heuristik aus dem Zeilentext.
-        - Wichtig: In jeder Ergebniszeile gibt es mehrere Links (InfoSite, Tester, Ajouter, ...).
-          Wir akzeptieren NUR den Link EntrepriseDetailsConsultation&refConsultation=...
-        """
-        import unicodedata
-
-        results: List[Tuple[Dict[str, str], str]] = []
-
-        BAD_KEYS = [
-            "infosite",
-            "conditions d'utilisation", "conditions dutilisation", "conditions d’utilisation",
-            "pre requis", "prerequis", "pre-requis",
-            "acceder a la consultation", "accéder à la consultation",
-            "tester la configuration", "ajouter au panier",
-            "reponse electronique", "réponse électronique",
-            "signature electronique", "signature électronique",
-            "pas de reponse electronique", "pas de réponse électronique",
-            "nouvelle recherche", "actions"
-        ]
-
-        def key(s: str) -> str:
-            # lower + remove accents + normalize spaces
-            s = s.lower()
-            s = unicodedata.normalize("NFKD", s)
-            s = "".join(ch for ch in s if not unicodedata.combining(ch))
-            s = re.sub(r"\s+", " ", s).strip()
-            return s
-
-        def clean_lines(tr) -> List[str]:
-            txt = tr.get_text("\n", strip=True)
-            lines = [self._norm(x) for x in txt.split("\n")]
-            lines = [x for x in lines if x and x != "-"]
-            return lines
-
-        def is_bad_line(ln: str) -> bool:
-            k = key(ln)
-            return any(b in k for b in [key(x) for x in BAD_KEYS])
-
-        def pick_location(lines: List[str]) -> str:
-            # 1) Nach Acheteur public suchen -> nächste gute kurze Zeile ist meist der Ort
-            for i, ln in enumerate(lines):
-                if "acheteur public" in key(ln):
-                    for j in range(i+1, min(i+6, len(lines))):
-                        cand = lines[j]
-                        if is_bad_line(cand):
-                            continue
-                        if ":" in cand:
-                            continue
-                        if 2 <= len(cand) <= 80:
-                            return cand
-
-            # 2) Caps-Heuristik
-            cands = []
-            for ln in lines:
-                if is_bad_line(ln):
-                    continue
-                if ":" in ln:
-                    continue
-                if len(ln) > 80:
-                    continue
-                score = 0
-                if ln.upper() == ln and any(ch.isalpha() for ch in ln):
-                    score += 3
-                if re.fullmatch(r"[A-ZÀ-Ü\s'\-]{3,}", ln):
-                    score += 2
-                if 1 <= len(ln.split()) <= 5:
-                    score += 1
-                if score >= 3:
-                    cands.append((score, ln))
-            if cands:
-                cands.sort(key=lambda x: (-x[0], len(x[1])))
-                return cands[0][1]
-
-            # 3) fallback: letzte gute kurze Zeile
-            for ln in reversed(lines):
-                if is_bad_line(ln):
-                    continue
-                if ":" in ln:
-                    continue
-                if 2 <= len(ln) <= 80:
-                    return ln
-            return ""
-
-        def pick_published_and_deadline(lines: List[str]) -> Tuple[Optional[str], Optional[str]]:
-            dates_ddmmyyyy = []
-            for ln in lines:
-                for m in re.finditer(r"\b(\d{2})/(\d{2})/(\d{4})\b", ln):
-                    dd, mm, yy = m.group(1), m.group(2), m.group(3)
-                    dates_ddmmyyyy.append((yy, mm, dd, f"{dd}/{mm}/{yy}"))
-            if not dates_ddmmyyyy:
-                return (None, None)
-            dates_ddmmyyyy.sort()
-            publication = dates_ddmmyyyy[0][3]
-            deadline = dates_ddmmyyyy[-1][3]
-            return (publication, deadline)
-
-        def pick_time(lines: List[str]) -> str:
-            for ln in lines:
-                m = re.search(r"\b(\d{1,2}:\d{2})\b", ln)
-                if m:
-                    return m.group(1)
-            return ""
-
-        def extract_reference(full_text: str) -> str:
-            # Return ONLY the reference code (never "Objet : ..." etc.)
-            text = full_text or ""
-            # cut anything after 'Objet :' if present on same line
-            text = re.split(r"\bObjet\b\s*:", text, flags=re.IGNORECASE)[0]
-
-            patterns = [
-                r"\b\d{1,6}/[A-Z]{1,10}/\d{4}\b",                 # 34/BP/2025
-                r"\b[A-Z0-9]{1,20}/\d{4}/[A-Z0-9_-]+\b",           # TC4129613/2025/ONEEBELEC
-                r"\b\d{1,6}/\d{4}/[A-Z0-9_-]+\b",                 # 336/2025/SRMCS
-                r"\b\d{1,6}/[A-Z0-9_-]{2,20}/\d{4}\b",            # 21/DAAF/FNAC/2025
-                r"\b\d{1,6}/\d{4}\b",                             # 08/2026
-            ]
-            for pat in patterns:
-                mm = re.search(pat, text)
-                if mm:
-                    return mm.group(0)
-
-            first_line = (text.splitlines()[0] if text.splitlines() else text).strip()
-            first_token = re.split(r"\s+", first_line)[0]
-            first_token = re.sub(r"[^A-Za-z0-9/_-]", "", first_token)
-            return first_token or ""
-
-
-
-        for tr in soup.find_all("tr"):
-            detail_a = None
-            for a in tr.find_all("a", href=True):
-                href = a["href"]
-                if "EntrepriseDetailsConsultation" in href and "refConsultation=" in href:
-                    detail_a = a
-                    break
-            if not detail_a:
-                continue
-
-            detail_url = self._abs_url(detail_a["href"])
-            lines = clean_lines(tr)
-            lines_clean = [ln for ln in lines if not is_bad_line(ln)]
-            full = "\n".join(lines_clean)
-
-            ref = extract_reference(full)
-
-            objet = ""
-            m = re.search(r"Objet\s*:\s*(.+)", full, flags=re.IGNORECASE)
-            if m:
-                objet = self._norm(m.group(1))
-            else:
-                objet = self._norm(detail_a.get_text(" ", strip=True))
-
-            org = ""
-            m = re.search(r"Acheteur\s+public\s*:\s*(.+)", full, flags=re.IGNORECASE)
-            if m:
-                org = self._norm(m.group(1))
-                # falls der Match doch Action-Text enthält -> leeren
-                if is_bad_line(org):
-                    org = ""
-
-            lieux = pick_location(lines_clean)
-
-            publication_dd, deadline_dd = pick_published_and_deadline(lines_clean)
-            time_dead = pick_time(lines_clean)
-
-            row_data = {
-                "reference": ref,
-                "objet": objet,
-                "lieux": lieux if not is_bad_line(lieux) else "",
-                "organisation_raw": org if not is_bad_line(org) else "",
-                "date_publication_raw": publication_dd or "",
-                "date_limite_raw": (deadline_dd or "") + (f" {time_dead}" if time_dead else ""),
-            }
-
-            results.append((row_data, detail_url))
-
-        try:
-            results = safkaty_expand_rows_with_lots(results)
-        except Exception:
-            pass
-
-        return results
-
-    def search(self, keyword: str, max_results: int = 20, polite_delay: float = 0.8, enrich_details: bool = True) -> List[Tender]:
-        keyword = keyword.strip()
-        soup = self._fetch_search_soup(keyword)
-
-        rows = self._parse_result_table(soup)
+    def search(self, keyword, max_results: int = 20, polite_delay: float = 0.8, enrich_details: bool = True) -> List[Tender]:
+        """keyword: Suchbegriff (str) oder SearchQuery mit weiteren Kriterien der erweiterten Suche."""
+        if isinstance(keyword, SearchQuery):
+            query = replace(keyword, keyword=keyword.keyword.strip())
+        else:
+            query = SearchQuery(keyword=(keyword or "").strip())
+        with self._stats_lock:
+            self.popup_stats = {"requests": 0, "avoided": 0}
+        _links, rows, detail_links = self._fetch_search_page(query, limit=max_results)
 
         # Fallback: wenn Parser keine Tabelle findet, trotzdem echte Detail-Links nutzen
         if not rows:
-            detail_links = self._extract_detail_links_fallback(soup)
             if not detail_links:
+                self.save_session()
                 return []
             rows = [({}, u) for u in detail_links[:max_results]]
 
+        rows = rows[:max_results]
+        dead_raws = [(row_data.get("date_limite_raw") if row_data else "") or "" for row_data, _ in rows]
+        deadlines = parse_dates(dead_raws)
+        publications = parse_dates([(row_data.get("date_publication_raw") if row_data else "") or ""
+                                    for row_data, _ in rows])
+
+        if enrich_details:
+            extras = self._fetch_details_many([u for _, u in rows], polite_delay)
+        else:
+            extras = [{} for _ in rows]
+
         tenders: List[Tender] = []
-        for row_data, detail_url in rows[:max_results]:
+        for i, (row_data, detail_url) in enumerate(rows):
             ref = (row_data.get("reference") if row_data else "") or ""
             objet = (row_data.get("objet") if row_data else "") or ""
             lieux = (row_data.get("lieux") if row_data else "") or ""
 
-            dead_raw = (row_data.get("date_limite_raw") if row_data else "") or ""
-            echeance = parse_date_ddmmyyyy(dead_raw)
-            tm = re.search(r"\b(\d{1,2}:\d{2})\b", dead_raw)
+            echeance = deadlines[i]
+            tm = re.search(r"\b(\d{1,2}:\d{2})\b", dead_raws[i])
             echeance_time = tm.group(1) if tm else ""
 
-            publication_raw = (row_data.get("date_publication_raw") if row_data else "") or ""
-            publication = parse_date_ddmmyyyy(publication_raw)
+            publication = publications[i]
 
-            extra: Dict[str, str] = {}
-            if enrich_details:
-                try:
-                    extra = self.fetch_details_by_url(detail_url)
-                except Exception:
-                    extra = {}
+            extra = extras[i]
 
             if not ref:
                 ref = extra.get("reference", "") or ""
@@ -1096,45 +2849,14 @@ class MarchesPublicsScraper:
             if extra.get("echeance_time"):
                 echeance_time = extra.get("echeance_time") or echeance_time
 
-            
-            # If consultation has multiple LOTS, list each LOT as its own row (same reference + lot suffix)
-            lots = []
-            if extra.get("lots_json"):
-                try:
-                    import json as _json
-                    lots = _json.loads(extra.get("lots_json") or "[]") or []
-                except Exception:
-                    lots = []
-
-            if isinstance(lots, list) and len(lots) >= 1 and any(isinstance(x, dict) and x.get('lot') for x in lots):
-                for lot in lots:
-                    lot_no = lot.get("lot") if isinstance(lot, dict) else None
-                    lot_title = lot.get("lot_title", "") if isinstance(lot, dict) else ""
-                    lot_est = safe_float_amount((lot.get("estimation", "") if isinstance(lot, dict) else "") or "")
-                    lot_cau = safe_float_amount((lot.get("caution", "") if isinstance(lot, dict) else "") or "")
-                    lot_ref = ref or "(unknown)"
-                    if lot_no:
-                        lot_ref = f"{lot_ref} [Lot {lot_no}]"
-                    lot_obj = lot_title.strip() or objet
-
-                    tenders.append(Tender(
-                        reference=lot_ref,
-                        titre=lot_obj,
-                        lieux=final_lieux,
-                        estimation=lot_est,
-                        caution=lot_cau,
-                        echeance=echeance,
-                        echeance_time=echeance_time,
-                        organisation=final_org,
-                        publication=publication,
-                        categorie=final_cat,
-                        description=objet,
-                        contact_email=final_email,
-                        contact_phone=final_phone,
-                        url=detail_url
-                    ))
-                time.sleep(polite_delay)
-                continue
+            # Lots bleiben am Tender (-> Tabelle tender_lots) statt "[Lot N]"-Zeilen
+            lots = parse_lots_json(extra.get("lots_json", ""))
+            if len(lots) > 1:
+                # Konsultationssumme, falls die Detailseite keinen Gesamtbetrag zeigt
+                if est is None and any(l.estimation is not None for l in lots):
+                    est = sum(l.estimation for l in lots if l.estimation is not None)
+                if cau is None and any(l.caution is not None for l in lots):
+                    cau = sum(l.caution for l in lots if l.caution is not None)
 
             tenders.append(Tender(
                 reference=ref or "(unknown)",
@@ -1150,30 +2872,1004 @@ class MarchesPublicsScraper:
                 description=objet,
                 contact_email=final_email,
                 contact_phone=final_phone,
-                url=detail_url
+                url=detail_url,
+                lots=lots
             ))
-            time.sleep(polite_delay)
 
+        self.save_session()
         return tenders
 
+    def _fetch_details_many(self, urls: List[str], polite_delay: float) -> List[Dict[str, str]]:
+        """
+        fetch_details_by_url für alle URLs (Reihenfolge bleibt), Fehler -> {}.
+        Mit fetch_workers > 1 laden mehrere Threads gleichzeitig; jeder hält polite_delay zwischen seinen Seiten.
+        """
+        def one(url: str) -> Dict[str, str]:
+            try:
+                extra = self.fetch_details_by_url(url)
+            except Exception:
+                extra = {}
+            time.sleep(polite_delay)
+            return extra
+
+        if self.fetch_workers <= 1 or len(urls) <= 1:
+            return [one(u) for u in urls]
+        with ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix="safkaty-fetch",
+                                initializer=self._init_fetch_thread) as ex:
+            return list(ex.map(one, urls))
+
+
+# --- DCE-Downloader (Dossier de consultation je Tender) ---
+# Dateien liegen inhaltsadressiert unter <root>/objects/<sha[:2]>/<sha256> (gleiche Datei aus mehreren Tendern
+# nur einmal), Warteschlange und Teilstücke in einer eigenen SQLite-Datei -> Downloads laufen nach Neustart weiter.
+
+_DIGEST_RX = re.compile(r"sha-256=:?([A-Za-z0-9+/=]+):?", re.IGNORECASE)
+_CONTENT_RANGE_RX = re.compile(r"bytes\s+\d+-\d+/(\d+)", re.IGNORECASE)
+_DISPOSITION_RX = re.compile(r"""filename\*?=(?:UTF-8'[^']*')?["']?([^"';]+)""", re.IGNORECASE)
+
+
+def dce_url(detail_url: str) -> str:
+    """
+    Detailseite (tenders.url) -> Download-Seite des DCE derselben Konsultation ("" ohne refConsultation).
+    Das Portal liefert dort erst nach dem PRADO-Formular (Bedingungen/Identifikation) das Archiv, direkt
+    abgerufen kommt die HTML-Seite -> in der App noch nicht verdrahtet, bis dieser Schritt umgesetzt ist.
+    """
+    u = urllib.parse.urlsplit(detail_url or "")
+    q = dict(urllib.parse.parse_qsl(u.query))
+    if not q.get("refConsultation"):
+        return ""
+    params = {"page": "entreprise.EntrepriseDemandeTelechargementDce", "refConsultation": q["refConsultation"]}
+    if q.get("orgAcronyme"):
+        params["orgAcronyme"] = q["orgAcronyme"]
+    return urllib.parse.urlunsplit((u.scheme, u.netloc, u.path, urllib.parse.urlencode(params), ""))
+
+
+class DownloadError(RuntimeError):
+    """retry: erneuter Versuch sinnvoll; restart: Teilstücke verwerfen (Datei geändert / Prüfsumme falsch)."""
+
+    def __init__(self, msg: str, retry: bool = True, restart: bool = False):
+        super().__init__(msg)
+        self.retry = retry
+        self.restart = restart
+
+
+class DceDownloader:
+    """
+    Lädt DCE-Archive parallel in Byte-Bereichen (Range-Requests, je Datei bis zu `segments` Teilstücke),
+    höchstens `workers` Verbindungen insgesamt und `per_host` je Host. Teilstücke liegen als Dateien unter
+    <root>/tmp; ihr Fortschritt ist die Dateigröße, ein Neustart setzt dort per Range fort (If-Range mit
+    ETag/Last-Modified: hat sich die Datei auf dem Server geändert, wird neu begonnen).
+    Fertige Dateien werden per SHA-256 geprüft (erwartete Prüfsumme des Aufrufers, Digest-Header der aktuellen Fassung)
+    und inhaltsadressiert abgelegt. on_done(job) läuft im Download-Thread -> GUI-Updates über self.q leiten.
+    """
+
+    def __init__(self, root: str, db_path: Optional[str] = None, workers: int = 4, per_host: int = 2,
+                 segments: int = 4, min_segment: int = 4 << 20, max_jobs: int = 2, max_attempts: int = 3,
+                 session_factory: Optional[Callable[[], requests.Session]] = None,
+                 on_done: Optional[Callable[[Dict], None]] = None, chunk_size: int = 1 << 16,
+                 timeout: int = 60, retry_delay: float = 2.0):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.tmp = self.root / "tmp"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path or str(self.root / "downloads.db")
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.segments = max(1, segments)
+        self.min_segment = max(1, min_segment)
+        self.max_attempts = max(1, max_attempts)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.session_factory = session_factory or requests.Session
+        self.on_done = on_done
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+        self._local = threading.local()
+        self._hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self._stop = threading.Event()
+        self._pending: set = set()
+        # Jobs holen sich Teilstücke aus einem eigenen Pool (Jobs warten auf Teilstücke, nie umgekehrt)
+        self._jobs = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="safkaty-dce-job")
+        self._parts = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="safkaty-dce-part")
+
+        # Metriken: Bytes gesamt, gleitendes Fenster für die aktuelle Rate, aktive Zeit für den Durchschnitt
+        self._window: deque = deque()
+        self.window_s = 5.0
+        self.bytes_total = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.dedup_hits = 0
+        self.dedup_bytes = 0
+        self.retries = 0
+        self._running = 0
+        self._busy_since: Optional[float] = None
+        self._busy_s = 0.0
+
+    def _create_tables(self):
+        with self._lock:
+            self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dce_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tender_id INTEGER,
+                url TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                size INTEGER,
+                ranges INTEGER NOT NULL DEFAULT 0,
+                validator TEXT,
+                filename TEXT,
+                expected_sha256 TEXT,
+                server_sha256 TEXT,
+                sha256 TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL,
+                updated_at REAL,
+                UNIQUE(tender_id, url)
+            );
+            CREATE INDEX IF NOT EXISTS idx_dce_jobs_status ON dce_jobs(status);
+            CREATE INDEX IF NOT EXISTS idx_dce_jobs_sha ON dce_jobs(sha256);
+            CREATE TABLE IF NOT EXISTS dce_parts (
+                job_id INTEGER NOT NULL,
+                part_no INTEGER NOT NULL,
+                start INTEGER NOT NULL,
+                stop INTEGER,
+                PRIMARY KEY (job_id, part_no)
+            ) WITHOUT ROWID;
+            """)
+            # expected_sha256 = Vorgabe des Aufrufers (bleibt), server_sha256 = Digest-Header des letzten _plan
+            if "server_sha256" not in {r[1] for r in self._conn.execute("PRAGMA table_info(dce_jobs)")}:
+                self._conn.execute("ALTER TABLE dce_jobs ADD COLUMN server_sha256 TEXT")
+            # beim letzten Beenden unterbrochene Jobs wieder einreihen
+            self._conn.execute("UPDATE dce_jobs SET status='queued' WHERE status='running'")
+            self._conn.commit()
+
+    # --- Warteschlange ---
+
+    def start(self):
+        """Alle offenen Jobs (auch aus früheren Sitzungen) einplanen."""
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT id FROM dce_jobs WHERE status='queued' ORDER BY id")]
+        for job_id in ids:
+            self._schedule(job_id)
+
+    def enqueue(self, url: str, tender_id: Optional[int] = None, expected_sha256: Optional[str] = None) -> int:
+        """Download einreihen (gleiche tender_id/url nur einmal; fehlgeschlagene starten neu). -> job_id"""
+        expected = (expected_sha256 or "").lower() or None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status FROM dce_jobs WHERE tender_id IS ? AND url = ?", (tender_id, url)).fetchone()
+            if row is None:
+                job_id = self._conn.execute("""
+                    INSERT INTO dce_jobs (tender_id, url, expected_sha256, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                """, (tender_id, url, expected, now, now)).lastrowid
+                status = "queued"
+            else:
+                job_id, status = row
+                if status == "failed":
+                    status = "queued"
+                    self._conn.execute("""
+                        UPDATE dce_jobs SET status = 'queued', attempts = 0,
+                          expected_sha256 = COALESCE(?, expected_sha256), updated_at = ? WHERE id = ?
+                    """, (expected, now, job_id))
+            self._conn.commit()
+        if status == "queued":
+            self._schedule(job_id)
+        return job_id
+
+    def enqueue_tender(self, tender_id: int, detail_url: str) -> Optional[int]:
+        """DCE zu tenders.url einreihen; None, wenn die URL keine Konsultation enthält."""
+        url = dce_url(detail_url)
+        return self.enqueue(url, tender_id=tender_id) if url else None
+
+    def _schedule(self, job_id: int):
+        with self._lock:
+            if job_id in self._pending or self._stop.is_set():
+                return
+            self._pending.add(job_id)
+        self._jobs.submit(self._run_job, job_id)
+
+    def job(self, job_id: int) -> Optional[Dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM dce_jobs WHERE id = ?", (job_id,))
+            row = cur.fetchone()
+            return dict(zip([c[0] for c in cur.description], row)) if row else None
+
+    def jobs(self, tender_id: Optional[int] = None) -> List[Dict]:
+        with self._lock:
+            if tender_id is None:
+                cur = self._conn.execute("SELECT * FROM dce_jobs ORDER BY id")
+            else:
+                cur = self._conn.execute("SELECT * FROM dce_jobs WHERE tender_id = ? ORDER BY id", (tender_id,))
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def path_for(self, sha256: str) -> Path:
+        return self.objects / sha256[:2] / sha256
+
+    def _update(self, job_id: int, **fields):
+        fields["updated_at"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE dce_jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    # --- Ablauf je Job ---
+
+    def _run_job(self, job_id: int):
+        if not self._busy(+1):
+            return
+        try:
+            self._update(job_id, status="running")
+            while True:
+                try:
+                    self._download(job_id)
+                    self._notify(job_id)
+                    return
+                except Exception as e:
+                    if self._stop.is_set():
+                        self._update(job_id, status="queued")
+                        return
+                    retry = getattr(e, "retry", True)
+                    if getattr(e, "restart", False):
+                        self._drop_parts(job_id)
+                    with self._lock:
+                        self._conn.execute(
+                            "UPDATE dce_jobs SET attempts = attempts + 1, error = ? WHERE id = ?", (str(e), job_id))
+                        attempts = self._conn.execute(
+                            "SELECT attempts FROM dce_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+                        self._conn.commit()
+                    if not retry or attempts >= self.max_attempts:
+                        self._update(job_id, status="failed")
+                        with self._lock:
+                            self.files_failed += 1
+                        self._notify(job_id)
+                        return
+                    with self._lock:
+                        self.retries += 1
+                    if self._stop.wait(self.retry_delay * attempts):
+                        self._update(job_id, status="queued")
+                        return
+        finally:
+            with self._lock:
+                self._pending.discard(job_id)
+            self._busy(-1)
+
+    def _notify(self, job_id: int):
+        if self.on_done:
+            self.on_done(self.job(job_id))
+
+    def _download(self, job_id: int):
+        job = self.job(job_id)
+        parts = self._load_parts(job_id)
+        if not parts:
+            job, parts = self._plan(job)
+        abort = threading.Event()
+
+        def run(part):
+            try:
+                self._fetch_part(job, part, abort)
+            except Exception:
+                abort.set()
+                raise
+
+        futs = [self._parts.submit(run, p) for p in parts]
+        errors = []
+        for f in futs:
+            try:
+                f.result()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            # eigentliche Ursache vor den Folgeabbrüchen der anderen Teilstücke
+            raise next((e for e in errors if not getattr(e, "aborted", False)), errors[0])
+        self._assemble(job, parts)
+
+    def _plan(self, job: Dict) -> Tuple[Dict, List[Tuple[int, int, Optional[int]]]]:
+        """Erster Abruf mit Range 0-0: Größe, Range-Unterstützung, Validator, Dateiname, ggf. Digest."""
+        with self._host_slot(job["url"]):
+            r = self._session().get(job["url"], headers={"Range": "bytes=0-0"}, stream=True, timeout=self.timeout)
+            r.close()
+        if r.status_code not in (200, 206):
+            raise DownloadError(f"HTTP {r.status_code}", retry=r.status_code >= 500 or r.status_code in (408, 429))
+        if "text/html" in r.headers.get("Content-Type", "").lower():
+            raise DownloadError("Keine Datei, sondern eine HTML-Seite (DCE auf dem Portal anfordern?)", retry=False)
+        ranges = r.status_code == 206
+        if ranges:
+            m = _CONTENT_RANGE_RX.search(r.headers.get("Content-Range", ""))
+            size = int(m.group(1)) if m else None
+            ranges = size is not None
+        else:
+            size = int(r.headers["Content-Length"]) if r.headers.get("Content-Length", "").isdigit() else None
+        etag = r.headers.get("ETag", "")
+        validator = etag if etag and not etag.startswith("W/") else r.headers.get("Last-Modified", "")
+        m = _DISPOSITION_RX.search(r.headers.get("Content-Disposition", ""))
+        filename = urllib.parse.unquote(m.group(1)).strip() if m else ""
+        filename = Path(filename or urllib.parse.urlsplit(job["url"]).path).name or f"dce_{job['id']}"
+        # Digest gilt nur für die aktuelle Fassung der Datei -> bei jedem _plan neu lesen
+        server_sha = None
+        m = _DIGEST_RX.search(r.headers.get("Repr-Digest") or r.headers.get("Digest") or "")
+        if m:
+            try:
+                server_sha = base64.b64decode(m.group(1)).hex()
+            except ValueError:
+                pass
+
+        if ranges and size:
+            n = max(1, min(self.segments, size // self.min_segment))
+            step = -(-size // n)
+            parts = [(i, i * step, min(size, (i + 1) * step) - 1) for i in range(n)]
+        else:
+            parts = [(0, 0, None)]
+        with self._lock:
+            self._conn.execute("DELETE FROM dce_parts WHERE job_id = ?", (job["id"],))
+            self._conn.executemany("INSERT INTO dce_parts (job_id, part_no, start, stop) VALUES (?, ?, ?, ?)",
+                                   [(job["id"],) + p for p in parts])
+            self._conn.execute(
+                "UPDATE dce_jobs SET size = ?, ranges = ?, validator = ?, filename = ?, server_sha256 = ? WHERE id = ?",
+                (size, int(ranges), validator or None, filename, server_sha, job["id"]))
+            self._conn.commit()
+        return self.job(job["id"]), parts
+
+    def _load_parts(self, job_id: int) -> List[Tuple[int, int, Optional[int]]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT part_no, start, stop FROM dce_parts WHERE job_id = ? ORDER BY part_no", (job_id,)).fetchall()
+
+    def _drop_parts(self, job_id: int):
+        for p in self.tmp.glob(f"{job_id}.*"):
+            p.unlink()
+        with self._lock:
+            self._conn.execute("DELETE FROM dce_parts WHERE job_id = ?", (job_id,))
+            self._conn.commit()
+
+    def _part_path(self, job_id: int, part_no: int) -> Path:
+        return self.tmp / f"{job_id}.{part_no}.part"
+
+    def _fetch_part(self, job: Dict, part: Tuple[int, int, Optional[int]], abort: threading.Event):
+        part_no, start, stop = part
+        path = self._part_path(job["id"], part_no)
+        have = path.stat().st_size if path.exists() else 0
+        length = None if stop is None else stop - start + 1
+        if length is not None and have >= length:
+            if have > length:
+                raise DownloadError("Teilstück größer als erwartet", restart=True)
+            return
+        headers = {}
+        if job["ranges"]:
+            headers["Range"] = f"bytes={start + have}-{'' if stop is None else stop}"
+            if job["validator"]:
+                headers["If-Range"] = job["validator"]
+        else:
+            have = 0  # ohne Range-Unterstützung nur von vorn
+
+        with self._host_slot(job["url"]):
+            if abort.is_set():
+                raise self._aborted()
+            r = self._session().get(job["url"], headers=headers, stream=True, timeout=self.timeout)
+            try:
+                if job["ranges"] and r.status_code == 200:
+                    # If-Range passt nicht mehr: Server liefert die (geänderte) Datei komplett
+                    raise DownloadError("Datei auf dem Server geändert", restart=True)
+                if r.status_code not in (200, 206):
+                    raise DownloadError(f"HTTP {r.status_code}",
+                                        retry=r.status_code >= 500 or r.status_code in (408, 429))
+                got = 0
+                with open(path, "ab" if have else "wb") as f:
+                    for chunk in r.iter_content(self.chunk_size):
+                        if abort.is_set() or self._stop.is_set():
+                            raise self._aborted()
+                        f.write(chunk)
+                        got += len(chunk)
+                        self._count(len(chunk))
+            finally:
+                r.close()
+        if length is not None and have + got != length:
+            raise DownloadError(f"Teilstück unvollständig ({have + got}/{length} Bytes)")
+
+    @staticmethod
+    def _aborted() -> DownloadError:
+        e = DownloadError("abgebrochen")
+        e.aborted = True
+        return e
+
+    def _assemble(self, job: Dict, parts: List[Tuple[int, int, Optional[int]]]):
+        """Teilstücke prüfen (Größe, SHA-256) und in den Store verschieben; identische Inhalte nur einmal."""
+        paths = [self._part_path(job["id"], p[0]) for p in parts]
+        h = hashlib.sha256()
+        if len(paths) == 1:
+            blob = paths[0]
+            with open(blob, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        else:
+            blob = self.tmp / f"{job['id']}.blob"
+            with open(blob, "wb") as out:
+                for p in paths:
+                    with open(p, "rb") as f:
+                        for chunk in iter(lambda: f.read(1 << 20), b""):
+                            h.update(chunk)
+                            out.write(chunk)
+        size = blob.stat().st_size
+        sha = h.hexdigest()
+        if job["size"] is not None and size != job["size"]:
+            raise DownloadError(f"Größe {size} statt {job['size']} Bytes", restart=True)
+        if job["expected_sha256"] and sha != job["expected_sha256"]:
+            raise DownloadError("Prüfsumme (SHA-256) stimmt nicht", restart=True)
+        if job["server_sha256"] and sha != job["server_sha256"]:
+            raise DownloadError("Prüfsumme (Digest-Header) stimmt nicht", restart=True)
+
+        dest = self.path_for(sha)
+        with self._lock:
+            if dest.exists():
+                self.dedup_hits += 1
+                self.dedup_bytes += size
+                blob.unlink()
+            else:
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(blob, dest)
+            self.files_done += 1
+        self._drop_parts(job["id"])
+        self._update(job["id"], status="done", sha256=sha, size=size, error=None)
+
+    # --- Verbindungen / Metriken ---
+
+    def _session(self) -> requests.Session:
+        # requests.Session ist nicht threadsicher -> eine je Download-Thread
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = self.session_factory()
+        return s
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _count(self, n: int):
+        now = time.monotonic()
+        with self._lock:
+            self.bytes_total += n
+            self._window.append((now, n))
+            while self._window and self._window[0][0] < now - self.window_s:
+                self._window.popleft()
+
+    def _busy(self, delta: int) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if delta > 0 and self._stop.is_set():
+                self._pending.clear()
+                return False
+            self._running += delta
+            if delta > 0 and self._running == 1:
+                self._busy_since = now
+            elif self._running == 0 and self._busy_since is not None:
+                self._busy_s += now - self._busy_since
+                self._busy_since = None
+            if self._running == 0 and self._stop.is_set():
+                self._conn.close()
+            return True
+
+    def stats(self) -> Dict[str, float]:
+        now = time.monotonic()
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM dce_jobs GROUP BY status").fetchall())
+            recent = sum(n for t, n in self._window if t >= now - self.window_s)
+            busy = self._busy_s + ((now - self._busy_since) if self._busy_since is not None else 0.0)
+            return {
+                "queued": counts.get("queued", 0),
+                "running": counts.get("running", 0),
+                "done": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+                "bytes": self.bytes_total,
+                "bytes_per_s": recent / self.window_s,
+                "avg_bytes_per_s": (self.bytes_total / busy) if busy else 0.0,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "dedup_hits": self.dedup_hits,
+                "dedup_bytes": self.dedup_bytes,
+                "retries": self.retries,
+            }
+
+    def close(self):
+        # laufende Jobs bleiben 'running' bzw. werden 'queued' -> nächster Start setzt per Range fort
+        with self._lock:
+            self._stop.set()
+            if not self._running:
+                self._conn.close()
+            # sonst schließt der letzte laufende Job die Verbindung (_busy)
+        self._jobs.shutdown(wait=False, cancel_futures=True)
+        self._parts.shutdown(wait=False, cancel_futures=True)
+
+
+def reconcile_tree(tree: ttk.Treeview, rows: Sequence, key: Callable, version: Callable,
+                   values: Callable, versions: Dict[str, object]) -> int:
+    """
+    Treeview-Inhalt auf rows abgleichen statt neu aufzubauen: Item-ID = str(key(row)),
+    es werden nur Löschungen, Einfügungen, Verschiebungen und geänderte Zeilen (version(row)
+    weicht von versions[iid] ab) an Tk geschickt. Scrollposition, Fokus und Auswahl bleiben erhalten.
+    versions gehört dem Aufrufer (ein dict je Treeview). Gibt die Anzahl Tk-Operationen zurück.
+    """
+    ops = 0
+    new_ids = [str(key(r)) for r in rows]
+    wanted = set(new_ids)
+    remaining = []
+    for iid in tree.get_children():
+        if iid in wanted:
+            remaining.append(iid)
+        else:
+            tree.delete(iid)
+            versions.pop(iid, None)
+            ops += 1
+    present = set(remaining)
+    moved = set()  # vorgezogene Items; der Zeiger j überspringt sie (statt remaining.remove: O(n) je Zug)
+    j = 0
+    for i, (iid, row) in enumerate(zip(new_ids, rows)):
+        ver = version(row)
+        if iid not in present:
+            tree.insert("", i, iid=iid, values=values(row))
+            versions[iid] = ver
+            ops += 1
+            continue
+        while j < len(remaining) and remaining[j] in moved:
+            j += 1
+        if j < len(remaining) and remaining[j] == iid:
+            j += 1
+        else:
+            tree.move(iid, "", i)
+            moved.add(iid)
+            ops += 1
+        if versions.get(iid) != ver:
+            tree.item(iid, values=values(row))
+            versions[iid] = ver
+            ops += 1
+    return ops
+
+
+def next_sort(current: Optional[Tuple[str, bool]], key: str) -> Tuple[str, bool]:
+    # Klick auf dieselbe Spalte kehrt die Richtung um, neue Spalte beginnt aufsteigend
+    return key, bool(current and current[0] == key and not current[1])
+
+
+def mark_sort_heading(tree: ttk.Treeview, columns: Sequence[str], column: Optional[str], desc: bool = False):
+    for c in columns:
+        arrow = (" ▼" if desc else " ▲") if c == column else ""
+        tree.heading(c, text=c + arrow)
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Virtualisierte Liste für große Datenmengen:
+    - das Treeview enthält nur die sichtbaren Zeilen (Item-ID = Schlüssel, Abgleich über reconcile_tree)
+    - Daten kommen seitenweise über fetch(offset, limit, sort, after) -> rows; row[0] ist der Schlüssel (z.B. tender id),
+      after = letzte Zeile der vorigen Seite, wenn diese im Cache liegt (Keyset-Paging), sonst None
+    - count() -> Gesamtzahl, formatter(row) -> Anzeige-Werte, version(row) -> Versionsstempel
+      (ohne version wird die ganze Zeile verglichen)
+    - Auswahl wird über Schlüssel gemerkt und bleibt beim Scrollen/Refresh erhalten
+    - Klick auf eine Spalte aus sort_keys sortiert (Sortierung macht fetch, also die DB)
+    """
+
+    def __init__(self, parent, columns, fetch, count, formatter, sort_keys: Optional[Dict[str, str]] = None,
+                 version: Optional[Callable] = None, page_size: int = 200, cache_pages: int = 8,
+                 height: int = 18, **frame_kw):
+        super().__init__(parent, **frame_kw)
+        self._fetch = fetch
+        self._count = count
+        self._fmt = formatter
+        self._version = version or tuple
+        self._versions: Dict[str, object] = {}
+        self._sort_keys = sort_keys or {}
+        self._page_size = max(1, page_size)
+        self._cache_pages = max(1, cache_pages)
+        self._pages: "OrderedDict[int, List]" = OrderedDict()
+        self._total = 0
+        self._top = 0
+        self._visible = height
+        self._selected: set = set()
+        self._row_keys: Dict[str, object] = {}
+        self.sort: Optional[Tuple[str, bool]] = None
+
+        self.columns = columns
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="extended")
+        self.sb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.sb.pack(side="right", fill="y")
+        for c in columns:
+            if c in self._sort_keys:
+                self.tree.heading(c, text=c, command=lambda c=c: self.sort_by(c))
+            else:
+                self.tree.heading(c, text=c)
+
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        # einfacher Klick ersetzt die Auswahl (auch nicht sichtbare Zeilen); Strg/Shift erweitern sie
+        self.tree.bind("<Button-1>", self._on_click)
+        self.tree.bind("<Control-Button-1>", lambda e: None)
+        self.tree.bind("<Shift-Button-1>", lambda e: None)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: (self.scroll(-self._visible), "break")[1])
+        self.tree.bind("<Next>", lambda e: (self.scroll(self._visible), "break")[1])
+        self.tree.bind("<Up>", self._on_key_up)
+        self.tree.bind("<Down>", self._on_key_down)
+        self.tree.bind("<Configure>", self._on_configure)
+
+    # ---------- Daten ----------
+
+    def refresh(self):
+        """Daten neu laden (z.B. nach Filterwechsel); Scrollposition und Auswahl bleiben soweit möglich."""
+        self._pages.clear()
+        self._total = int(self._count() or 0)
+        self._top = max(0, min(self._top, self._total - self._visible))
+        self._render()
+
+    @property
+    def page_size(self) -> int:
+        return self._page_size
+
+    def show(self, total: int, first_page: List):
+        """
+        Ergebnis einer im Hintergrund gelaufenen Abfrage übernehmen (z.B. Suche während der Eingabe):
+        first_page = die ersten page_size Zeilen (bzw. alle), kein fetch im GUI-Thread. Springt nach oben.
+        """
+        self._pages.clear()
+        self._pages[0] = list(first_page)
+        self._total = int(total)
+        self._top = 0
+        self._render()
+
+    def _rows(self, offset: int, n: int) -> List:
+        if n <= 0:
+            return []
+        ps = self._page_size
+        out: List = []
+        for p in range(offset // ps, (offset + n - 1) // ps + 1):
+            page = self._pages.get(p)
+            if page is None:
+                prev = self._pages.get(p - 1) if self.sort else None
+                after = prev[-1] if prev and len(prev) == ps else None
+                page = list(self._fetch(p * ps, ps, self.sort, after))
+                self._pages[p] = page
+                while len(self._pages) > self._cache_pages:
+                    self._pages.popitem(last=False)
+            else:
+                self._pages.move_to_end(p)
+            out.extend(page)
+        start = offset - (offset // ps) * ps
+        return out[start:start + n]
+
+    def _render(self):
+        n = max(0, min(self._visible, self._total - self._top))
+        rows = self._rows(self._top, n)
+        reconcile_tree(self.tree, rows, key=lambda r: r[0], version=self._version, values=self._fmt,
+                       versions=self._versions)
+        self._row_keys = {str(r[0]): r[0] for r in rows}
+        sel = [iid for iid, key in self._row_keys.items() if key in self._selected]
+        if set(sel) != set(self.tree.selection()):
+            self.tree.selection_set(sel)
+        if self._total:
+            self.sb.set(self._top / self._total, (self._top + len(rows)) / self._total)
+        else:
+            self.sb.set(0.0, 1.0)
+
+    # ---------- Scrollen ----------
+
+    def scroll(self, delta_rows: int):
+        self.scroll_to(self._top + delta_rows)
+
+    def scroll_to(self, top: int):
+        top = max(0, min(int(top), self._total - self._visible))
+        if top != self._top:
+            self._top = top
+            self._render()
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self._total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll(step * self._visible if args[2] == "pages" else step)
+
+    def _on_configure(self, event):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        visible = max(1, (event.height - rowheight) // rowheight)
+        if visible != self._visible:
+            self._visible = visible
+            self._top = max(0, min(self._top, self._total - self._visible))
+            self._render()
+
+    def _on_key_up(self, event):
+        items = self.tree.get_children()
+        if items and self.tree.focus() == items[0] and self._top > 0:
+            self.scroll(-1)
+            self._select_iid(self.tree.get_children()[0])
+            return "break"
+        return None
+
+    def _on_key_down(self, event):
+        items = self.tree.get_children()
+        if items and self.tree.focus() == items[-1] and self._top + self._visible < self._total:
+            self.scroll(1)
+            self._select_iid(self.tree.get_children()[-1])
+            return "break"
+        return None
+
+    def _select_iid(self, iid: str):
+        self._selected = {self._row_keys[iid]} if iid in self._row_keys else set()
+        self.tree.selection_set([iid])
+        self.tree.focus(iid)
+
+    # ---------- Auswahl / Sortierung ----------
+
+    def _on_click(self, event):
+        if self.tree.identify_region(event.x, event.y) == "cell":
+            self._selected.clear()
+
+    def _on_select(self, event=None):
+        visible_sel = set(self.tree.selection())
+        for iid, key in self._row_keys.items():
+            if iid in visible_sel:
+                self._selected.add(key)
+            else:
+                self._selected.discard(key)
+
+    def selected_keys(self) -> List:
+        return list(self._selected)
+
+    def deselect(self, key):
+        self._selected.discard(key)
+
+    def current_key(self):
+        """Schlüssel der fokussierten (oder sonst einer ausgewählten) Zeile, None wenn nichts gewählt."""
+        focus = self.tree.focus()
+        if focus and focus in self.tree.selection():
+            return self._row_keys.get(focus)
+        return next(iter(self._selected), None)
+
+    def sort_by(self, column: str):
+        key = self._sort_keys.get(column)
+        if not key:
+            return
+        self.sort = next_sort(self.sort, key)
+        mark_sort_heading(self.tree, self.columns, column, self.sort[1])
+        self._top = 0
+        self.refresh()
+
+
+class UiDispatcher:
+    """
+    Nachrichten aus Hintergrund-Threads an den Tk-Thread (statt queue.Queue + Polling alle 100 ms):
+    - put((typ, payload)) aus beliebigem Thread; der Tk-Loop wird per event_generate geweckt,
+      höchstens ein ausstehendes Event (weitere Nachrichten landen im selben Frame)
+    - der Tk-Thread leert die Queue und ruft handler(typ, payloads) einmal je Typ auf
+      (Reihenfolge des ersten Auftretens); Typen aus latest_only bekommen nur die letzte Nachricht
+    - je Frame wird gemessen: Queue-Tiefe beim Leeren, Anzahl Handler-Aufrufe, Zeit im Tk-Thread (ms)
+    Ohne Thread-fähiges Tcl wird wie bisher alle poll_ms gepollt.
+    """
+
+    EVENT = "<<SafkatyDispatch>>"
+
+    def __init__(self, root: tk.Tk, handler: Callable[[str, List], None], latest_only: Sequence[str] = (),
+                 poll_ms: int = 100, history: int = 500):
+        self.root = root
+        self._handler = handler
+        self._latest_only = set(latest_only)
+        self._poll_ms = poll_ms
+        self._q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._wake_pending = False
+        self._running = False
+        self._threaded = bool(root.tk.call("info", "exists", "tcl_platform(threaded)"))
+        self.frames: deque = deque(maxlen=history)  # (queue_depth, updates, ui_ms)
+
+    def start(self):
+        self.root.bind(self.EVENT, self._drain)
+        # erst wecken, wenn mainloop läuft (event_generate aus Threads blockiert sonst bis zum Timeout)
+        self.root.after_idle(self._on_loop_started)
+
+    def stop(self):
+        self._running = False
+
+    def _on_loop_started(self):
+        self._running = True
+        self._drain()
+        if not self._threaded:
+            self.root.after(self._poll_ms, self._poll)
+
+    def _poll(self):
+        if not self._running:
+            return
+        self._drain()
+        self.root.after(self._poll_ms, self._poll)
+
+    def put(self, item: Tuple[str, object]):
+        self._q.put(item)
+        if not self._running or not self._threaded:
+            return
+        with self._lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self.root.event_generate(self.EVENT, when="tail")
+        except (tk.TclError, RuntimeError):
+            # Fenster schon zu / Loop beendet
+            with self._lock:
+                self._wake_pending = False
+
+    def _drain(self, event=None):
+        with self._lock:
+            self._wake_pending = False  # was ab jetzt kommt, weckt einen neuen Frame
+        started = time.perf_counter()
+        depth = self._q.qsize()
+        batches: Dict[str, List] = {}
+        for _ in range(depth):
+            typ, payload = self._q.get_nowait()
+            if typ in self._latest_only:
+                batches[typ] = [payload]
+            else:
+                batches.setdefault(typ, []).append(payload)
+        for typ, payloads in batches.items():
+            try:
+                self._handler(typ, payloads)
+            except Exception:
+                self.root.report_callback_exception(*sys.exc_info())
+        if depth:
+            self.frames.append((depth, len(batches), (time.perf_counter() - started) * 1000))
+
+    def stats(self) -> Dict[str, float]:
+        """Kennzahlen über die letzten Frames: Nachrichten, Handler-Aufrufe, max. Queue-Tiefe, UI-Zeit (ms)."""
+        frames = list(self.frames)
+        if not frames:
+            return {"frames": 0, "messages": 0, "updates": 0, "max_depth": 0,
+                    "ui_ms_p50": 0.0, "ui_ms_p95": 0.0, "ui_ms_max": 0.0}
+        ms = sorted(f[2] for f in frames)
+        return {
+            "frames": len(frames),
+            "messages": sum(f[0] for f in frames),
+            "updates": sum(f[1] for f in frames),
+            "max_depth": max(f[0] for f in frames),
+            "ui_ms_p50": ms[len(ms) // 2],
+            "ui_ms_p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+            "ui_ms_max": ms[-1],
+        }
+
 
 class SafkatyApp:
+    DEADLINE_WINDOWS = {
+        "24 Stunden": timedelta(hours=24),
+        "72 Stunden": timedelta(hours=72),
+        "7 Tage": timedelta(days=7),
+        "30 Tage": timedelta(days=30),
+    }
+    OPEN_STATUSES = ("neu", "in_bearbeitung", "angebot_abgegeben")
+    # Detailseiten gleichzeitig laden (je Thread polite_delay); Standard 1 = Anfragerate wie bisher,
+    # mehr nur auf Wunsch (Einstellungen), dann speisen sie den ParsePool auf mehreren Kernen
+    FETCH_WORKERS = 1
+    # Spaltenüberschrift -> Database.SORT_COLUMNS
+    MY_SORT_KEYS = {
+        "ID": "id", "Ref": "reference", "Titre": "titre", "Organisation": "organisation", "Lieux": "lieux",
+        "Est": "estimation", "Caution": "caution", "Échéance": "echeance", "Status": "status", "Prio": "priority",
+    }
+    DASH_SORT_KEYS = {
+        "Ref": "reference", "Titre": "titre", "Organisation": "organisation", "Lieux": "lieux",
+        "Estimation": "estimation", "Caution": "caution", "Échéance": "echeance", "Status": "status", "Prio": "priority",
+    }
+    # Spaltenüberschrift -> Sortierschlüssel für Tender (fehlende Beträge/Fristen ans Ende)
+    SEARCH_SORT_KEYS = {
+        "Reference": lambda t: (t.reference or "").lower(),
+        "Titre": lambda t: (t.titre or "").lower(),
+        "Lieux": lambda t: (t.lieux or "").lower(),
+        "Estimation": lambda t: (t.estimation is None, t.estimation or 0.0),
+        "Caution": lambda t: (t.caution is None, t.caution or 0.0),
+        "Échéance": lambda t: (not t.echeance, t.echeance or "", t.echeance_time or ""),
+        "Organisation": lambda t: (t.organisation or "").lower(),
+        "URL": lambda t: t.url or "",
+    }
+
     def __init__(self):
-        self.db = Database()
-        self.scraper = MarchesPublicsScraper()
-        self.q = queue.Queue()
+        # Startzeit für startup_metrics (Fenster sichtbar / erste Daten, in ms ab hier)
+        self._t_start = time.perf_counter()
+        self.startup_metrics: Dict[str, float] = {}
+        self._log_backlog: List[str] = []  # Log-Zeilen, bevor der Web-Suche-Tab (mit dem Log) gebaut ist
+        self.scraper = MarchesPublicsScraper(fetch_workers=self.FETCH_WORKERS)
+        self._import_cancel: Optional[threading.Event] = None
+        # Suchergebnisse: Treeview-Item-ID -> Tender aus scraper.search (Import ohne erneuten Abruf)
+        self.search_results: Dict[str, Tender] = {}
+        # zuletzt angezeigte row_version je Item (reconcile_tree)
+        self._dash_versions: Dict[str, object] = {}
+        self._deadline_versions: Dict[str, object] = {}
+        # Sortierung per Spaltenkopf (None = Standard-Reihenfolge)
+        self._dash_sort: Optional[Tuple[str, bool]] = None
+        self._search_sort: Optional[Tuple[str, bool]] = None
+        # Suche in "Meine AO": Debounce-Timer, Generation (neuere Eingabe -> ältere Abfrage veraltet),
+        # Latenz ab Abfragestart bis Anzeige in ms
+        self._my_search_after: Optional[str] = None
+        self._my_search_gen = 0
+        self.search_latency: deque = deque(maxlen=200)
 
         self.root = tk.Tk()
         self.root.title("SAFKATY • Marchés Publics Manager")
         self.root.geometry("1400x900")
         self.root.minsize(1180, 780)
+        # Nachrichten aus Worker-Threads (Suche, Import, Archiv, DB-Callbacks) -> _dispatch im Tk-Thread
+        self.q = UiDispatcher(self.root, self._dispatch,
+                              latest_only=("SEARCH_OK", "IMPORT_PROGRESS", "MY_SEARCH_OK", "DASH_OK"))
 
         self._style()
         self._build_ui()
 
-        self.root.after(100, self._process_queue)
+        # Fenster sofort zeigen; DB öffnen (Migrationen, FTS-Aufbau, MinHash-Nachberechnung) im Hintergrund.
+        # Bis DB_READY sind nur Dashboard-Rahmen und Log sichtbar, die übrigen Tabs gesperrt.
+        self.db: Optional[Database] = None
+        self.parse_cache: Optional[ParseCache] = None
+        self.parse_pool: Optional[ParsePool] = None
+        self.session_store: Optional[SessionStore] = None
+        self._opened_db: Optional[Database] = None  # auch wenn das Fenster vor DB_READY geschlossen wird
+        for tab in (self.tab_search, self.tab_my, self.tab_deadlines, self.tab_details, self.tab_settings):
+            self.nb.tab(tab, state="disabled")
+        self.status_var.set("Datenbank wird geöffnet …")
+        self.root.bind("<Map>", self._on_first_map)
+        self.q.start()
+        self._db_thread = threading.Thread(target=self._open_database, name="safkaty-db-open", daemon=True)
+        self._db_thread.start()
+
+    def _open_database(self):
+        # Worker-Thread: Database() führt Migrationen aus und kann dauern
+        try:
+            db = Database()
+        except Exception as e:
+            self.q.put(("DB_ERR", str(e)))
+            return
+        self._opened_db = db
+        self.q.put(("DB_READY", db))
+
+    def _on_db_ready(self, db: Database):
+        self.db = db
+        # Parse-Cache (Seiteninhalt -> Parser-Ergebnis) neben der DB; bleibt beim Wechsel der Base URL erhalten
+        self.parse_cache = ParseCache(str(Path(self.db.db_file).with_name("safkaty_parse_cache.db")))
+        self.scraper.parse_cache = self.parse_cache
+        # Parsen in eigenen Prozessen, damit BeautifulSoup der GUI nicht die GIL wegnimmt (nur bei mehreren Kernen)
+        self.parse_pool = ParsePool() if (os.cpu_count() or 1) > 1 else None
+        self.scraper.parse_pool = self.parse_pool
+        # Portal-Sitzung (Endpoint, Cookies) aus dem letzten Lauf übernehmen -> erste Suche ohne Aufwärmen
+        self.session_store = SessionStore(str(Path(self.db.db_file).with_name("safkaty_session.json")))
+        self.scraper.session_store = self.session_store
+        self.scraper.restore_session()
+        for tab in self.nb.tabs():
+            self.nb.tab(tab, state="normal")
+        if self._tab_built(self.tab_dashboard):
+            for b in self.dash_buttons:
+                b.state(["!disabled"])
+        self.status_var.set("Bereit.")
+        self._mark_startup("db_ready_ms")
         self._refresh_dashboard()
-        self._load_my_tenders()
+        self._start_archiving()
+
+    def _on_first_map(self, event=None):
+        # after_idle: erst nachdem Tk die ausstehenden Zeichenaufträge abgearbeitet hat
+        self.root.unbind("<Map>")
+        self.root.after_idle(lambda: self._mark_startup("first_paint_ms"))
+
+    def _mark_startup(self, key: str):
+        if key in self.startup_metrics:
+            return
+        self.startup_metrics[key] = (time.perf_counter() - self._t_start) * 1000
+        if len(self.startup_metrics) == 3:
+            m = self.startup_metrics
+            self._log(f"Start: Fenster nach {m['first_paint_ms']:.0f} ms, DB offen nach {m['db_ready_ms']:.0f} ms, "
+                      f"Dashboard-Daten nach {m['first_data_ms']:.0f} ms")
 
     def _style(self):
         self.root.configure(bg="#0b1220")
@@ -1234,30 +3930,49 @@ class SafkatyApp:
 
         self.nb = ttk.Notebook(self.root)
         self.nb.pack(fill="both", expand=True, padx=16, pady=(0, 12))
+        self.nb.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
         self.tab_dashboard = ttk.Frame(self.nb)
         self.tab_search = ttk.Frame(self.nb)
         self.tab_my = ttk.Frame(self.nb)
+        self.tab_deadlines = ttk.Frame(self.nb)
         self.tab_details = ttk.Frame(self.nb)
         self.tab_settings = ttk.Frame(self.nb)
 
         self.nb.add(self.tab_dashboard, text="🏠 Dashboard")
         self.nb.add(self.tab_search, text="🔎 Web-Suche")
         self.nb.add(self.tab_my, text="📌 Meine AO")
+        self.nb.add(self.tab_deadlines, text="⏰ Fristen")
         self.nb.add(self.tab_details, text="📄 Details")
         self.nb.add(self.tab_settings, text="⚙️ Settings")
 
-        self._build_dashboard()
-        self._build_search()
-        self._build_my()
-        self._build_details()
-        self._build_settings()
+        # Tab-Inhalte werden beim ersten Anzeigen gebaut (_ensure_tab); beim Start nur das Dashboard
+        self._tab_builders = {
+            str(self.tab_dashboard): self._build_dashboard,
+            str(self.tab_search): self._build_search,
+            str(self.tab_my): self._build_my,
+            str(self.tab_deadlines): self._build_deadlines,
+            str(self.tab_details): self._build_details,
+            str(self.tab_settings): self._build_settings,
+        }
+        self._ensure_tab(self.tab_dashboard)
 
         bottom = ttk.Frame(self.root)
         bottom.pack(fill="x", padx=16, pady=(0, 14))
         self.progress = ttk.Progressbar(bottom, mode="indeterminate")
         self.progress.pack(side="right", fill="x", expand=False)
 
+    def _ensure_tab(self, tab) -> bool:
+        """Tab-Inhalt bauen, falls noch nicht geschehen. True, wenn er gerade gebaut wurde."""
+        build = self._tab_builders.pop(str(tab), None)
+        if build is None:
+            return False
+        build()
+        return True
+
+    def _tab_built(self, tab) -> bool:
+        return str(tab) not in self._tab_builders
+
     def _make_card(self, parent, title: str, value: str):
         f = ttk.Frame(parent, style="Card.TFrame")
         ttk.Label(f, text=title, style="CardTitle.TLabel").pack(anchor="w", padx=12, pady=(10, 0))
@@ -1286,10 +4001,17 @@ class SafkatyApp:
         actions = ttk.Frame(container)
         actions.pack(fill="x", pady=(0, 10))
 
-        ttk.Button(actions, text="🔎 Zur Web-Suche", style="Primary.TButton",
-                   command=lambda: self.nb.select(self.tab_search)).pack(side="left", padx=4)
-        ttk.Button(actions, text="📌 Meine AO", command=lambda: self.nb.select(self.tab_my)).pack(side="left", padx=4)
-        ttk.Button(actions, text="🔄 Refresh", command=self._refresh_dashboard).pack(side="left", padx=4)
+        # bis DB_READY gesperrt (Ziel-Tabs sind noch deaktiviert, Refresh bräuchte die DB)
+        self.dash_buttons = [
+            ttk.Button(actions, text="🔎 Zur Web-Suche", style="Primary.TButton",
+                       command=lambda: self.nb.select(self.tab_search)),
+            ttk.Button(actions, text="📌 Meine AO", command=lambda: self.nb.select(self.tab_my)),
+            ttk.Button(actions, text="🔄 Refresh", command=self._refresh_dashboard),
+        ]
+        for b in self.dash_buttons:
+            b.pack(side="left", padx=4)
+            if self.db is None:
+                b.state(["disabled"])
 
         box = ttk.Frame(container, style="Card.TFrame")
         box.pack(fill="both", expand=True, padx=6, pady=6)
@@ -1299,7 +4021,7 @@ class SafkatyApp:
         cols = ("Ref", "Titre", "Organisation", "Lieux", "Estimation", "Caution", "Échéance", "Status", "Prio")
         self.dashboard_tree = ttk.Treeview(box, columns=cols, show="headings", height=12)
         for c in cols:
-            self.dashboard_tree.heading(c, text=c)
+            self.dashboard_tree.heading(c, text=c, command=lambda c=c: self._sort_dashboard(c))
         self.dashboard_tree.column("Ref", width=150)
         self.dashboard_tree.column("Titre", width=420)
         self.dashboard_tree.column("Organisation", width=240)
@@ -1339,6 +4061,24 @@ class SafkatyApp:
         ttk.Button(row, text="🚀 Suchen", style="Primary.TButton", command=self._start_search).pack(side="left", padx=8)
         ttk.Button(row, text="🧹 Clear", command=self._clear_search_results).pack(side="left", padx=4)
 
+        # Kriterien der erweiterten Suche (SearchQuery): filtert das Portal, leer = egal
+        row2 = ttk.Frame(panel, style="Card.TFrame")
+        row2.pack(fill="x", padx=12, pady=(0, 12))
+        ttk.Label(row2, text="Kategorie:", style="CardTitle.TLabel").pack(side="left")
+        self.search_cat_var = tk.StringVar(value="Alle")
+        ttk.Combobox(row2, textvariable=self.search_cat_var, values=["Alle"] + list(SEARCH_CATEGORIES),
+                     state="readonly", width=12).pack(side="left", padx=8)
+        self.search_lieu_var = tk.StringVar()
+        self.search_acheteur_var = tk.StringVar()
+        self.search_dead_from_var = tk.StringVar()
+        self.search_dead_to_var = tk.StringVar()
+        for text, var, width in (("Lieu:", self.search_lieu_var, 16), ("Acheteur:", self.search_acheteur_var, 22),
+                                 ("Frist von:", self.search_dead_from_var, 11), ("bis:", self.search_dead_to_var, 11)):
+            ttk.Label(row2, text=text, style="CardTitle.TLabel").pack(side="left", padx=(10, 0))
+            ent = ttk.Entry(row2, textvariable=var, width=width)
+            ent.pack(side="left", padx=8)
+            ent.bind("<Return>", lambda e: self._start_search())
+
         box = ttk.Frame(container, style="Card.TFrame")
         box.pack(fill="both", expand=True, padx=6, pady=6)
 
@@ -1347,7 +4087,7 @@ class SafkatyApp:
         cols = ("Reference", "Titre", "Lieux", "Estimation", "Caution", "Échéance", "Organisation", "URL")
         self.search_tree = ttk.Treeview(box, columns=cols, show="headings", height=16)
         for c in cols:
-            self.search_tree.heading(c, text=c)
+            self.search_tree.heading(c, text=c, command=lambda c=c: self._sort_search_results(c))
 
         self.search_tree.column("Reference", width=180)
         self.search_tree.column("Titre", width=520)
@@ -1370,6 +4110,9 @@ class SafkatyApp:
                    command=self._import_selected).pack(side="left", padx=4)
         ttk.Button(btns, text="📥 Alles importieren", command=self._import_all).pack(side="left", padx=4)
         ttk.Button(btns, text="🌐 URL öffnen", command=self._open_search_url).pack(side="left", padx=4)
+        self.import_cancel_btn = ttk.Button(btns, text="⛔ Import abbrechen", style="Danger.TButton",
+                                            command=self._cancel_import, state="disabled")
+        self.import_cancel_btn.pack(side="left", padx=4)
 
         logbox = ttk.Frame(container, style="Card.TFrame")
         logbox.pack(fill="x", padx=6, pady=6)
@@ -1377,6 +4120,10 @@ class SafkatyApp:
         self.log = ScrolledText(logbox, height=6, bg="#0f1729", fg="#e8eefc", insertbackground="#e8eefc",
                                 font=("Consolas", 9), relief="flat", borderwidth=0)
         self.log.pack(fill="x", padx=12, pady=(0, 12))
+        if self._log_backlog:
+            self.log.insert("end", "".join(self._log_backlog))
+            self.log.see("end")
+            self._log_backlog.clear()
 
     def _build_my(self):
         container = ttk.Frame(self.tab_my)
@@ -1392,7 +4139,8 @@ class SafkatyApp:
         self.my_search_var = tk.StringVar(value="")
         e = ttk.Entry(row, textvariable=self.my_search_var, width=40)
         e.pack(side="left", padx=8)
-        e.bind("<Return>", lambda ev: self._load_my_tenders())
+        e.bind("<Return>", lambda ev: self._run_my_search())
+        self.my_search_var.trace_add("write", lambda *a: self._schedule_my_search())
 
         ttk.Label(row, text="Status:", style="CardTitle.TLabel").pack(side="left", padx=(10, 0))
         self.status_filter_var = tk.StringVar(value="Alle")
@@ -1409,6 +4157,10 @@ class SafkatyApp:
         self.prio_filter.pack(side="left", padx=8)
         self.prio_filter.bind("<<ComboboxSelected>>", lambda ev: self._load_my_tenders())
 
+        self.include_archive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(row, text="inkl. Archiv", variable=self.include_archive_var,
+                        command=self._load_my_tenders).pack(side="left", padx=8)
+
         ttk.Button(row, text="🔄 Refresh", command=self._load_my_tenders).pack(side="left", padx=8)
         ttk.Button(row, text="📤 Export CSV", command=self._export_csv).pack(side="left", padx=4)
 
@@ -1418,9 +4170,20 @@ class SafkatyApp:
         ttk.Label(box, text="Meine Ausschreibungen", style="CardTitle.TLabel").pack(anchor="w", padx=12, pady=(10, 6))
 
         cols = ("ID", "Ref", "Titre", "Organisation", "Lieux", "Est", "Caution", "Échéance", "Status", "Prio")
-        self.my_tree = ttk.Treeview(box, columns=cols, show="headings", height=18)
-        for c in cols:
-            self.my_tree.heading(c, text=c)
+        self.my_list = VirtualTreeview(
+            box, cols,
+            fetch=lambda offset, limit, sort, after: self.db.list_tenders_page(
+                **self._my_filter(), offset=offset, limit=limit, sort=sort, after=after),
+            count=lambda: self.db.count_tenders(**self._my_filter()),
+            formatter=lambda r: (
+                r[0], r[1], (r[2] or "")[:180], (r[3] or "")[:120], (r[4] or "")[:140],
+                fmt_money(r[5]), fmt_money(r[6]), fmt_date_iso(r[7]), r[8], r[9]
+            ),
+            sort_keys=self.MY_SORT_KEYS,
+            version=lambda r: r[10],
+            height=18, style="Card.TFrame",
+        )
+        self.my_tree = self.my_list.tree
 
         self.my_tree.column("ID", width=60, anchor="center")
         self.my_tree.column("Ref", width=180)
@@ -1433,10 +4196,7 @@ class SafkatyApp:
         self.my_tree.column("Status", width=140, anchor="center")
         self.my_tree.column("Prio", width=60, anchor="center")
 
-        sb = ttk.Scrollbar(box, orient="vertical", command=self.my_tree.yview)
-        self.my_tree.configure(yscrollcommand=sb.set)
-        self.my_tree.pack(side="left", fill="both", expand=True, padx=(12, 0), pady=(0, 12))
-        sb.pack(side="right", fill="y", padx=(0, 12), pady=(0, 12))
+        self.my_list.pack(fill="both", expand=True, padx=12, pady=(0, 12))
 
         self.my_tree.bind("<Double-1>", lambda e: self._open_selected_details())
 
@@ -1447,6 +4207,53 @@ class SafkatyApp:
         ttk.Button(btns, text="🌐 URL öffnen", command=self._open_selected_url).pack(side="left", padx=4)
         ttk.Button(btns, text="🗑️ Löschen", style="Danger.TButton", command=self._delete_selected).pack(side="left", padx=4)
 
+    def _build_deadlines(self):
+        container = ttk.Frame(self.tab_deadlines)
+        container.pack(fill="both", expand=True, padx=6, pady=6)
+
+        panel = ttk.Frame(container, style="Card.TFrame")
+        panel.pack(fill="x", padx=6, pady=6)
+
+        row = ttk.Frame(panel, style="Card.TFrame")
+        row.pack(fill="x", padx=12, pady=12)
+
+        ttk.Label(row, text="Zeitraum:", style="CardTitle.TLabel").pack(side="left")
+        self.deadline_window_var = tk.StringVar(value="72 Stunden")
+        cb = ttk.Combobox(row, textvariable=self.deadline_window_var, state="readonly",
+                          values=list(self.DEADLINE_WINDOWS.keys()), width=14)
+        cb.pack(side="left", padx=8)
+        cb.bind("<<ComboboxSelected>>", lambda ev: self._load_deadlines())
+
+        self.deadline_open_only_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(row, text="nur offene", variable=self.deadline_open_only_var,
+                        command=self._load_deadlines).pack(side="left", padx=8)
+        ttk.Button(row, text="🔄 Refresh", command=self._load_deadlines).pack(side="left", padx=8)
+
+        box = ttk.Frame(container, style="Card.TFrame")
+        box.pack(fill="both", expand=True, padx=6, pady=6)
+
+        ttk.Label(box, text="Nächste Fristen", style="CardTitle.TLabel").pack(anchor="w", padx=12, pady=(10, 6))
+
+        cols = ("ID", "Frist", "Ref", "Titre", "Organisation", "Est", "Status", "Prio")
+        self.deadline_tree = ttk.Treeview(box, columns=cols, show="headings", height=18)
+        for c in cols:
+            self.deadline_tree.heading(c, text=c)
+        self.deadline_tree.column("ID", width=60, anchor="center")
+        self.deadline_tree.column("Frist", width=150, anchor="center")
+        self.deadline_tree.column("Ref", width=180)
+        self.deadline_tree.column("Titre", width=460)
+        self.deadline_tree.column("Organisation", width=260)
+        self.deadline_tree.column("Est", width=120, anchor="e")
+        self.deadline_tree.column("Status", width=140, anchor="center")
+        self.deadline_tree.column("Prio", width=60, anchor="center")
+
+        sb = ttk.Scrollbar(box, orient="vertical", command=self.deadline_tree.yview)
+        self.deadline_tree.configure(yscrollcommand=sb.set)
+        self.deadline_tree.pack(side="left", fill="both", expand=True, padx=(12, 0), pady=(0, 12))
+        sb.pack(side="right", fill="y", padx=(0, 12), pady=(0, 12))
+
+        self.deadline_tree.bind("<Double-1>", lambda e: self._open_deadline_details())
+
     def _build_details(self):
         container = ttk.Frame(self.tab_details)
         container.pack(fill="both", expand=True, padx=6, pady=6)
@@ -1466,6 +4273,7 @@ class SafkatyApp:
             ("lieux", "Lieu d'exécution"),
             ("estimation", "Estimation"),
             ("caution", "Caution"),
+            ("lots", "Lots"),
             ("echeance", "Date limite"),
             ("categorie", "Catégorie"),
             ("contact_phone", "Téléphone"),
@@ -1517,6 +4325,18 @@ class SafkatyApp:
         self.detail_notes.pack(fill="both", expand=True, padx=12, pady=(0, 12))
         ttk.Button(right, text="💾 Notizen speichern", command=self._save_notes).pack(anchor="w", padx=12, pady=(0, 12))
 
+        ttk.Label(right, text="Ähnliche Ausschreibungen", style="CardTitle.TLabel").pack(anchor="w", padx=12, pady=(0, 6))
+        cols = ("ID", "Ref", "Titre", "Ähnlich")
+        self.similar_tree = ttk.Treeview(right, columns=cols, show="headings", height=5)
+        for c in cols:
+            self.similar_tree.heading(c, text=c)
+        self.similar_tree.column("ID", width=50, anchor="center")
+        self.similar_tree.column("Ref", width=150)
+        self.similar_tree.column("Titre", width=320)
+        self.similar_tree.column("Ähnlich", width=70, anchor="center")
+        self.similar_tree.pack(fill="x", padx=12, pady=(0, 12))
+        self.similar_tree.bind("<Double-1>", lambda e: self._open_similar_details())
+
         self.current_tender_id: Optional[int] = None
 
     def _build_settings(self):
@@ -1534,6 +4354,9 @@ class SafkatyApp:
         ttk.Label(row, text="Base URL:", style="CardTitle.TLabel").pack(side="left")
         self.base_url_var = tk.StringVar(value=self.scraper.base_url)
         ttk.Entry(row, textvariable=self.base_url_var, width=50).pack(side="left", padx=8)
+        ttk.Label(row, text="Parallele Abrufe:", style="CardTitle.TLabel").pack(side="left", padx=(10, 0))
+        self.fetch_workers_var = tk.IntVar(value=self.scraper.fetch_workers)
+        ttk.Spinbox(row, from_=1, to=8, textvariable=self.fetch_workers_var, width=4).pack(side="left", padx=8)
         ttk.Button(row, text="✅ Übernehmen", style="Primary.TButton", command=self._apply_settings).pack(side="left", padx=8)
 
         info = ("Tipp: Stell 'Max' zuerst auf 10, um Block/CAPTCHA zu vermeiden.")
@@ -1544,14 +4367,28 @@ class SafkatyApp:
         if not url.startswith("http"):
             messagebox.showerror("Fehler", "Bitte eine gültige URL eingeben, z.B. https://www.marchespublics.gov.ma")
             return
-        self.scraper = MarchesPublicsScraper(url)
-        self._log(f"Base URL gesetzt auf: {url}")
+        try:
+            workers = min(8, max(1, int(self.fetch_workers_var.get())))
+        except (tk.TclError, ValueError):
+            workers = self.FETCH_WORKERS
+        self.scraper.save_session()
+        self.scraper = MarchesPublicsScraper(url, parse_cache=self.parse_cache, parse_pool=self.parse_pool,
+                                             fetch_workers=workers, session_store=self.session_store)
+        self._log(f"Base URL gesetzt auf: {url} ({workers} parallele Abrufe)")
         self.status_var.set("Settings gespeichert.")
 
     def _log(self, msg: str):
+        self._log_lines([msg])
+
+    def _log_lines(self, msgs: List[str]):
+        # mehrere Zeilen mit einem insert/see (gebündelte Nachrichten aus dem UiDispatcher)
         ts = datetime.now().strftime("%H:%M:%S")
+        text = "".join(f"[{ts}] {m}\n" for m in msgs)
+        if not self._tab_built(self.tab_search):
+            self._log_backlog.append(text)
+            return
         try:
-            self.log.insert("end", f"[{ts}] {msg}\n")
+            self.log.insert("end", text)
             self.log.see("end")
         except Exception:
             pass
@@ -1566,17 +4403,33 @@ class SafkatyApp:
 
     def _start_search(self):
         kw = self.keyword_var.get().strip()
-        if not kw:
-            messagebox.showwarning("Hinweis", "Bitte Keyword eingeben.")
+        dates = {}
+        for key, var in (("deadline_from", self.search_dead_from_var), ("deadline_to", self.search_dead_to_var)):
+            raw = var.get().strip()
+            dates[key] = parse_date_ddmmyyyy(raw) or ""
+            if raw and not dates[key]:
+                messagebox.showwarning("Hinweis", f"Ungültiges Datum: {raw} (TT/MM/JJJJ)")
+                return
+        cat = self.search_cat_var.get()
+        query = SearchQuery(
+            keyword=kw,
+            category="" if cat == "Alle" else cat,
+            lieu=self.search_lieu_var.get().strip(),
+            acheteur=self.search_acheteur_var.get().strip(),
+            **dates,
+        )
+        if query == SearchQuery():
+            messagebox.showwarning("Hinweis", "Bitte Keyword oder Suchkriterium eingeben.")
             return
         maxr = int(self.max_var.get())
+        criteria = ", ".join(f"{k}={v}" for k, v in vars(query).items() if v and k != "keyword")
         self._set_busy(True, f"Suche '{kw}' …")
-        self._log(f"Starte Suche: '{kw}' (max {maxr})")
-        threading.Thread(target=self._worker_search, args=(kw, maxr), daemon=True).start()
+        self._log(f"Starte Suche: '{kw}' (max {maxr})" + (f" [{criteria}]" if criteria else ""))
+        threading.Thread(target=self._worker_search, args=(query, maxr), daemon=True).start()
 
-    def _worker_search(self, kw: str, maxr: int):
+    def _worker_search(self, query: SearchQuery, maxr: int):
         try:
-            tenders = self.scraper.search(kw, max_results=maxr)
+            tenders = self.scraper.search(query, max_results=maxr)
             self.q.put(("SEARCH_OK", tenders))
         except Exception as e:
             self.q.put(("SEARCH_ERR", str(e)))
@@ -1584,8 +4437,11 @@ class SafkatyApp:
     def _show_search_results(self, tenders: List[Tender]):
         for it in self.search_tree.get_children():
             self.search_tree.delete(it)
+        self.search_results.clear()
+        self._search_sort = None
+        mark_sort_heading(self.search_tree, self.search_tree["columns"], None)
         for t in tenders:
-            self.search_tree.insert("", "end", values=(
+            item = self.search_tree.insert("", "end", values=(
                 t.reference,
                 (t.titre or "")[:220],
                 (t.lieux or "")[:220],
@@ -1595,12 +4451,32 @@ class SafkatyApp:
                 (t.organisation or "")[:120],
                 (t.url or "")[:200],
             ))
+            # vollständiges Tender-Objekt (inkl. Lots/Kontakte) für den Import aufheben
+            self.search_results[item] = t
         self._set_busy(False, f"{len(tenders)} Ergebnisse.")
         self._log(f"Fertig: {len(tenders)} Ergebnisse geladen.")
+        pc = self.parse_cache.stats()
+        self._log(f"Parse-Cache: {pc['hits']} Treffer ({pc['disk_hits']} von Platte), {pc['misses']} geparst, "
+                  f"Trefferquote {pc['hit_rate']:.0%}")
+        ps = self.scraper.popup_stats
+        self._log(f"Lot-Popups: {ps['requests']} abgerufen, {ps['avoided']} dank Detailseite übersprungen")
+
+    def _sort_search_results(self, column: str):
+        # Suchergebnisse liegen nur im Speicher (search_results) -> hier sortiert Python, nicht SQL
+        keyfn = self.SEARCH_SORT_KEYS.get(column)
+        if not keyfn:
+            return
+        self._search_sort = next_sort(self._search_sort, column)
+        items = sorted(self.search_tree.get_children(), key=lambda iid: keyfn(self.search_results[iid]),
+                       reverse=self._search_sort[1])
+        for i, iid in enumerate(items):
+            self.search_tree.move(iid, "", i)
+        mark_sort_heading(self.search_tree, self.search_tree["columns"], column, self._search_sort[1])
 
     def _clear_search_results(self):
         for it in self.search_tree.get_children():
             self.search_tree.delete(it)
+        self.search_results.clear()
         self._log("Suchergebnisse gelöscht.")
         self.status_var.set("Bereit.")
 
@@ -1609,44 +4485,72 @@ class SafkatyApp:
         if not sel:
             messagebox.showwarning("Hinweis", "Bitte Ergebnis auswählen.")
             return
-        url = self.search_tree.item(sel[0], "values")[7]
+        t = self.search_results.get(sel[0])
+        url = t.url if t else self.search_tree.item(sel[0], "values")[7]
         if url:
             webbrowser.open(url)
 
+    # Import: Tender aus search_results in Batches schreiben (keine Netzwerkzugriffe), Fortschritt über self.q
+    IMPORT_BATCH = 50
+
     def _import_selected(self):
         sel = self.search_tree.selection()
         if not sel:
             messagebox.showwarning("Hinweis", "Bitte mindestens 1 Ergebnis auswählen.")
             return
-        imported = 0
-        for item in sel:
-            vals = self.search_tree.item(item, "values")
-            ref = vals[0]
-            url = vals[7]
-            try:
-                extra = self.scraper.fetch_details_by_url(url)
-            except Exception:
-                extra = {}
-            t = Tender(
-                reference=ref,
-                titre=vals[1],
-                lieux=vals[2] if vals[2] != "—" else "",
-                estimation=safe_float_amount(vals[3]),
-                caution=safe_float_amount(vals[4]),
-                echeance=parse_date_ddmmyyyy(vals[5]) or (extra.get("echeance") or None),
-                echeance_time=extra.get("echeance_time",""),
-                organisation=vals[6] if vals[6] != "—" else "",
-                contact_email=extra.get("contact_email",""),
-                contact_phone=extra.get("contact_phone",""),
-                categorie=extra.get("categorie",""),
-                url=url
-            )
-            new, _ = self.db.upsert_tender(t)
-            if new:
-                imported += 1
-        messagebox.showinfo("Import", f"Import abgeschlossen. Neu: {imported}")
+        if self._import_cancel is not None:
+            messagebox.showwarning("Hinweis", "Es läuft bereits ein Import.")
+            return
+        tenders = [self.search_results[item] for item in sel if item in self.search_results]
+        if not tenders:
+            return
+        self._import_cancel = threading.Event()
+        self.import_cancel_btn.config(state="normal")
+        self._set_busy(True, f"Import 0/{len(tenders)} …")
+        self._log(f"Starte Import: {len(tenders)} Ergebnisse")
+        threading.Thread(target=self._worker_import, args=(tenders, self._import_cancel), daemon=True).start()
+
+    def _cancel_import(self):
+        if self._import_cancel is not None:
+            self._import_cancel.set()
+            self._log("Import wird abgebrochen …")
+
+    def _worker_import(self, tenders: List[Tender], cancel: threading.Event):
+        imported = duplicates = done = 0
+        try:
+            for i in range(0, len(tenders), self.IMPORT_BATCH):
+                if cancel.is_set():
+                    break
+                batch = tenders[i:i + self.IMPORT_BATCH]
+                for new, tid in self.db.upsert_tenders(batch):
+                    if not new:
+                        continue
+                    imported += 1
+                    sims = self.db.similar_tenders(tid, limit=3)
+                    if sims:
+                        duplicates += 1
+                        self.q.put(("IMPORT_LOG", f"Mögliches Duplikat: #{tid} ~ "
+                                    + ", ".join(f"{s[1]} ({s[4]:.0%})" for s in sims)))
+                done += len(batch)
+                self.q.put(("IMPORT_PROGRESS", (done, len(tenders))))
+        except Exception as e:
+            self.q.put(("IMPORT_LOG", f"Import-Fehler: {e}"))
+        self.q.put(("IMPORT_DONE", (imported, duplicates, cancel.is_set())))
+
+    def _finish_import(self, imported: int, duplicates: int, cancelled: bool):
+        self._import_cancel = None
+        self.import_cancel_btn.config(state="disabled")
+        self._set_busy(False, "Import abgebrochen." if cancelled else "Import fertig.")
+        msg = f"Import {'abgebrochen' if cancelled else 'abgeschlossen'}. Neu: {imported}"
+        if duplicates:
+            msg += f"\nMögliche Duplikate: {duplicates} (siehe Log / Details)"
+        self._log(msg.replace("\n", " – "))
+        ui = self.q.stats()
+        self._log(f"UI: {ui['messages']} Nachrichten in {ui['frames']} Frames ({ui['updates']} Updates), "
+                  f"max. Queue-Tiefe {ui['max_depth']}, UI-Zeit p95 {ui['ui_ms_p95']:.1f} ms / max {ui['ui_ms_max']:.1f} ms")
         self._load_my_tenders()
         self._refresh_dashboard()
+        messagebox.showinfo("Import", msg)
 
     def _import_all(self):
         items = self.search_tree.get_children()
@@ -1658,23 +4562,92 @@ class SafkatyApp:
         self.search_tree.selection_set(items)
         self._import_selected()
 
-    def _load_my_tenders(self):
-        rows = self.db.list_tenders(
+    def _my_filter(self) -> Dict:
+        return dict(
             search=self.my_search_var.get(),
             status=self.status_filter_var.get() if self.status_filter_var.get() != "Alle" else "Alle",
             priority=self.prio_filter_var.get() if self.prio_filter_var.get() != "Alle" else "Alle",
+            include_archive=self.include_archive_var.get(),
         )
-        for it in self.my_tree.get_children():
-            self.my_tree.delete(it)
-        for r in rows:
-            tid, ref, titre, org, lieux, est, cau, ech, st, pr = r
-            self.my_tree.insert("", "end", values=(
-                tid, ref, (titre or "")[:180], (org or "")[:120], (lieux or "")[:140],
-                fmt_money(est), fmt_money(cau), fmt_date_iso(ech), st, pr
-            ))
+
+    def _load_my_tenders(self):
+        if not self._tab_built(self.tab_my):
+            return  # wird beim ersten Öffnen geladen
+        self._my_search_gen += 1  # laufende Suche ist damit veraltet
+        self.my_list.refresh()
+
+    # Suche während der Eingabe: entprellt, Abfrage im Hintergrund, veraltete Abfragen werden abgebrochen
+    SEARCH_DEBOUNCE_MS = 150
+    SEARCH_MIN_CHARS = 3
+
+    def _schedule_my_search(self):
+        if self._my_search_after is not None:
+            self.root.after_cancel(self._my_search_after)
+            self._my_search_after = None
+        term = self.my_search_var.get().strip()
+        if 0 < len(term) < self.SEARCH_MIN_CHARS:
+            return  # 1–2 Zeichen treffen fast alles und nutzen den Index nicht -> erst mit Enter
+        self._my_search_after = self.root.after(self.SEARCH_DEBOUNCE_MS, self._run_my_search)
+
+    def _run_my_search(self):
+        if self._my_search_after is not None:
+            self.root.after_cancel(self._my_search_after)
+            self._my_search_after = None
+        self._my_search_gen += 1
+        gen = self._my_search_gen
+        started = time.perf_counter()
+
+        def _done(fut):
+            try:
+                total, rows = fut.result()
+            except Exception as e:
+                if gen == self._my_search_gen:
+                    self.q.put(("MY_SEARCH_ERR", str(e)))
+                return
+            self.q.put(("MY_SEARCH_OK", (gen, started, (time.perf_counter() - started) * 1000, total, rows)))
+
+        self.db.submit(self.db.filter_page, **self._my_filter(), limit=self.my_list.page_size,
+                       sort=self.my_list.sort, is_stale=lambda: gen != self._my_search_gen, callback=_done)
+
+    def _show_my_search(self, gen: int, started: float, query_ms: float, total: int, rows: List):
+        if gen != self._my_search_gen:
+            return  # inzwischen weitergetippt
+        self.my_list.show(total, rows)
+        ms = (time.perf_counter() - started) * 1000
+        self.search_latency.append(ms)
+        p95 = sorted(self.search_latency)[int(len(self.search_latency) * 0.95)]
+        self.status_var.set(f"Suche: {total} Treffer · Abfrage {query_ms:.0f} ms · "
+                            f"bis Anzeige {ms:.0f} ms (p95 {p95:.0f} ms)")
 
     def _refresh_dashboard(self):
-        st = self.db.stats()
+        # Daten im Hintergrund laden, Anzeige über DASH_OK -> _show_dashboard
+        # (vor DB_READY nichts tun; _on_db_ready lädt mit der dann gewählten Sortierung)
+        if self.db is None or not self._tab_built(self.tab_dashboard):
+            return
+
+        sort = self._dash_sort
+
+        def _load():
+            return self.db.stats(), self.db.list_tenders_page(search="", status="Alle", priority="Alle",
+                                                              limit=50, sort=sort)
+
+        def _done(fut):
+            try:
+                self.q.put(("DASH_OK", fut.result()))
+            except Exception as e:
+                self.q.put(("DASH_ERR", str(e)))
+
+        self.db.submit(_load, callback=_done)
+
+    def _sort_dashboard(self, column: str):
+        key = self.DASH_SORT_KEYS.get(column)
+        if not key:
+            return
+        self._dash_sort = next_sort(self._dash_sort, key)
+        mark_sort_heading(self.dashboard_tree, self.dashboard_tree["columns"], column, self._dash_sort[1])
+        self._refresh_dashboard()
+
+    def _show_dashboard(self, st: Dict[str, int], rows: List[Tuple]):
         total = st.get("TOTAL", 0)
         neu = st.get("neu", 0)
         bearb = st.get("in_bearbeitung", 0)
@@ -1684,26 +4657,57 @@ class SafkatyApp:
         self.card_bearb.value_label.config(text=str(bearb))  # type: ignore
         self.card_done.value_label.config(text=str(done))    # type: ignore
 
-        rows = self.db.list_tenders(search="", status="Alle", priority="Alle")[:50]
-        for it in self.dashboard_tree.get_children():
-            self.dashboard_tree.delete(it)
-        for r in rows:
-            tid, ref, titre, org, lieux, est, cau, ech, stt, pr = r
-            self.dashboard_tree.insert("", "end", values=(
-                ref, (titre or "")[:140], (org or "")[:120], (lieux or "")[:120],
-                fmt_money(est), fmt_money(cau), fmt_date_iso(ech), stt, pr
-            ))
+        reconcile_tree(
+            self.dashboard_tree, rows, key=lambda r: r[0], version=lambda r: r[10],
+            values=lambda r: (
+                r[1], (r[2] or "")[:140], (r[3] or "")[:120], (r[4] or "")[:120],
+                fmt_money(r[5]), fmt_money(r[6]), fmt_date_iso(r[7]), r[8], r[9]
+            ),
+            versions=self._dash_versions,
+        )
+        self._mark_startup("first_data_ms")
+
+    def _on_tab_changed(self, event=None):
+        tab = self.nb.select()
+        first = self._ensure_tab(tab)
+        if tab == str(self.tab_deadlines):
+            self._load_deadlines()
+        elif tab == str(self.tab_my) and first:
+            self._run_my_search()  # erste Seite im Hintergrund
+
+    def _load_deadlines(self):
+        now = datetime.now()
+        window = self.DEADLINE_WINDOWS.get(self.deadline_window_var.get(), timedelta(hours=72))
+        status = self.OPEN_STATUSES if self.deadline_open_only_var.get() else None
+        rows = self.db.due_between(now, now + window, status=status)
+
+        def _values(r):
+            tid, ref, titre, org, lieux, est, cau, ech_at, st, pr, _ver = r
+            day, _, hhmm = (ech_at or "").partition(" ")
+            return (tid, f"{fmt_date_iso(day)} {hhmm}".strip(), ref, (titre or "")[:180], (org or "")[:120],
+                    fmt_money(est), st, pr)
+
+        reconcile_tree(self.deadline_tree, rows, key=lambda r: r[0], version=lambda r: r[10],
+                       values=_values, versions=self._deadline_versions)
+
+    def _open_deadline_details(self):
+        sel = self.deadline_tree.selection()
+        if not sel:
+            return
+        tid = int(self.deadline_tree.item(sel[0], "values")[0])
+        self._load_details(tid)
+        self.nb.select(self.tab_details)
 
     def _open_selected_details(self):
-        sel = self.my_tree.selection()
-        if not sel:
+        tid = self.my_list.current_key()
+        if tid is None:
             messagebox.showwarning("Hinweis", "Bitte in 'Meine AO' etwas auswählen.")
             return
-        tid = int(self.my_tree.item(sel[0], "values")[0])
         self._load_details(tid)
         self.nb.select(self.tab_details)
 
     def _load_details(self, tender_id: int):
+        self._ensure_tab(self.tab_details)
         data = self.db.get_tender(tender_id)
         if not data:
             return
@@ -1714,6 +4718,12 @@ class SafkatyApp:
         self.detail_labels["lieux"].set(data.get("lieux") or "—")
         self.detail_labels["estimation"].set(fmt_money(data.get("estimation")))
         self.detail_labels["caution"].set(fmt_money(data.get("caution")))
+        lots = data.get("lots") or []
+        self.detail_labels["lots"].set(
+            " · ".join(f"Lot {l['lot_no']}: {fmt_money(l['estimation'])}" for l in lots[:6])
+            + (f" · … (+{len(lots) - 6})" if len(lots) > 6 else "")
+            if lots else "—"
+        )
         dt = fmt_date_iso(data.get("echeance"))
         if data.get("echeance_time"):
             dt = f"{dt} {data.get('echeance_time')}"
@@ -1728,6 +4738,16 @@ class SafkatyApp:
         self.detail_prio_var.set(int(data.get("priority") or 3))
         self.detail_notes.delete("1.0", "end")
         self.detail_notes.insert("1.0", data.get("notes") or "")
+        for it in self.similar_tree.get_children():
+            self.similar_tree.delete(it)
+        for sid, sref, stitre, _org, score in self.db.similar_tenders(tender_id):
+            self.similar_tree.insert("", "end", values=(sid, sref, (stitre or "")[:140], f"{score:.0%}"))
+
+    def _open_similar_details(self):
+        sel = self.similar_tree.selection()
+        if not sel:
+            return
+        self._load_details(int(self.similar_tree.item(sel[0], "values")[0]))
 
     def _save_workflow(self):
         if not self.current_tender_id:
@@ -1751,11 +4771,10 @@ class SafkatyApp:
             webbrowser.open(url)
 
     def _open_selected_url(self):
-        sel = self.my_tree.selection()
-        if not sel:
+        tid = self.my_list.current_key()
+        if tid is None:
             messagebox.showwarning("Hinweis", "Bitte Ausschreibung auswählen.")
             return
-        tid = int(self.my_tree.item(sel[0], "values")[0])
         data = self.db.get_tender(tid)
         if data and data.get("url"):
             webbrowser.open(data["url"])
@@ -1763,17 +4782,14 @@ class SafkatyApp:
             messagebox.showwarning("Hinweis", "Keine URL gespeichert.")
 
     def _delete_selected(self):
-        sel = self.my_tree.selection()
-        if not sel:
+        tid = self.my_list.current_key()
+        if tid is None:
             messagebox.showwarning("Hinweis", "Bitte Ausschreibung auswählen.")
             return
-        tid = int(self.my_tree.item(sel[0], "values")[0])
         if not messagebox.askyesno("Löschen", "Wirklich löschen?"):
             return
-        cur = self.db.conn.cursor()
-        cur.execute("DELETE FROM tender_status WHERE tender_id=?", (tid,))
-        cur.execute("DELETE FROM tenders WHERE id=?", (tid,))
-        self.db.conn.commit()
+        self.db.delete_tender(tid)
+        self.my_list.deselect(tid)
         self._load_my_tenders()
         self._refresh_dashboard()
 
@@ -1782,6 +4798,7 @@ class SafkatyApp:
             search=self.my_search_var.get(),
             status=self.status_filter_var.get() if self.status_filter_var.get() != "Alle" else "Alle",
             priority=self.prio_filter_var.get() if self.prio_filter_var.get() != "Alle" else "Alle",
+            include_archive=self.include_archive_var.get(),
         )
         if not rows:
             messagebox.showwarning("Export", "Keine Daten zum Export.")
@@ -1793,32 +4810,75 @@ class SafkatyApp:
             w = csv.writer(f, delimiter=";")
             w.writerow(["ID", "Reference", "Objet", "Acheteur", "Lieu", "Estimation", "Caution", "Echeance", "Status", "Priority", "URL"])
             for r in rows:
-                tid, ref, titre, org, lieux, est, cau, ech, st, pr = r
+                tid, ref, titre, org, lieux, est, cau, ech, st, pr, _ver = r
                 data = self.db.get_tender(tid) or {}
                 w.writerow([tid, ref, titre, org, lieux, est, cau, ech, st, pr, data.get("url","")])
         messagebox.showinfo("Export", f"Exportiert: {fn}")
 
-    def _process_queue(self):
-        try:
-            while True:
-                typ, payload = self.q.get_nowait()
-                if typ == "SEARCH_OK":
-                    self._show_search_results(payload)
-                elif typ == "SEARCH_ERR":
-                    self._set_busy(False, "Fehler.")
-                    messagebox.showerror("Scraper Fehler", payload)
-                    self._log(f"ERROR: {payload}")
-                self.q.task_done()
-        except queue.Empty:
-            pass
-        self.root.after(100, self._process_queue)
+    def _start_archiving(self):
+        # Abgelaufene Tender im Hintergrund ins Archiv verschieben (hält das Hot-Set klein)
+        def _done(fut):
+            try:
+                self.q.put(("ARCHIVE_OK", fut.result()))
+            except Exception as e:
+                self.q.put(("ARCHIVE_ERR", str(e)))
+        self.db.submit(self.db.archive_expired, callback=_done)
+
+    def _dispatch(self, typ: str, payloads: List):
+        # ein Aufruf je Nachrichtentyp und Frame (UiDispatcher fasst zusammen)
+        if typ == "SEARCH_OK":
+            self._show_search_results(payloads[-1])
+        elif typ == "SEARCH_ERR":
+            self._set_busy(False, "Fehler.")
+            messagebox.showerror("Scraper Fehler", payloads[-1])
+            self._log_lines([f"ERROR: {p}" for p in payloads])
+        elif typ == "ARCHIVE_OK":
+            moved = sum(payloads)
+            if moved:
+                self._log(f"Archiv: {moved} abgelaufene Ausschreibungen verschoben.")
+                self._load_my_tenders()
+                self._refresh_dashboard()
+        elif typ == "ARCHIVE_ERR":
+            self._log_lines([f"Archiv-Fehler: {p}" for p in payloads])
+        elif typ == "IMPORT_PROGRESS":
+            done, total = payloads[-1]
+            self.status_var.set(f"Import {done}/{total} …")
+        elif typ == "IMPORT_LOG":
+            self._log_lines(payloads)
+        elif typ == "IMPORT_DONE":
+            for p in payloads:
+                self._finish_import(*p)
+        elif typ == "DASH_OK":
+            self._show_dashboard(*payloads[-1])
+        elif typ == "DASH_ERR":
+            self._log_lines([f"Dashboard-Fehler: {p}" for p in payloads])
+        elif typ == "MY_SEARCH_OK":
+            self._show_my_search(*payloads[-1])
+        elif typ == "MY_SEARCH_ERR":
+            self._log_lines([f"Suche-Fehler: {p}" for p in payloads])
+        elif typ == "DB_READY":
+            self._on_db_ready(payloads[-1])
+        elif typ == "DB_ERR":
+            self.status_var.set("Datenbank-Fehler.")
+            messagebox.showerror("Datenbank", payloads[-1])
 
     def run(self):
         self.root.mainloop()
-        self.db.close()
+        self.q.stop()
+        self.scraper.save_session()
+        # Fenster evtl. vor DB_READY geschlossen: Öffnen abwarten, damit die DB sauber geschlossen wird
+        self._db_thread.join()
+        if self.parse_pool is not None:
+            self.parse_pool.close()
+        if self.parse_cache is not None:
+            self.parse_cache.close()
+        if self._opened_db is not None:
+            self._opened_db.close()
 
 
 def main():
+    # ParsePool startet Prozesse per spawn; in der gebauten .exe muss der Kindprozess hier abzweigen
+    multiprocessing.freeze_support()
     app = SafkatyApp()
     app.run()
 
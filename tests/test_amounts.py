@@ -0,0 +1,206 @@
+"""Betrags-Grammatik (_AMOUNT_RX / normalize_amount[s]): fester Korpus, Zufallseigenschaften, Benchmark.
+
+Benchmark gegen die früheren Einzel-Helfer (eingefrorene Kopie unten), aus dem Repo-Wurzelverzeichnis:
+    python -m tests.test_amounts [anzahl]
+"""
+import random
+import re
+import sys
+import time
+
+import pytest
+
+import safkaty
+from safkaty import find_amount, normalize_amount, normalize_amounts, parse_date_ddmmyyyy, parse_dates
+
+# Eingabe -> erwarteter Wert; Grenzfälle der Grammatik (ein Trenner + genau 3 Ziffern = Tausender,
+# außer bei führender 0; bei "," und "." ist das letzte der Dezimaltrenner)
+CORPUS = {
+    "0.500": 0.5,
+    "0,500": 0.5,
+    "1.234": 1234.0,
+    "1,234": 1234.0,
+    "400.200": 400200.0,
+    "400 200,00": 400200.0,
+    "400.200,00": 400200.0,
+    "400200.00": 400200.0,
+    "400\u00A0200,00 DH": 400200.0,
+    "400\u202F200,00": 400200.0,
+    "1,234.50 DH": 1234.5,
+    "1.234,50 MAD": 1234.5,
+    "1 234 567,89 Dirhams": 1234567.89,
+    "1.234.567": 1234567.0,
+    "12,5": 12.5,
+    "12.50": 12.5,
+    "1234": 1234.0,
+    "Estimation : 35 000,00 DHS TTC": 35000.0,
+    "Caution provisoire: 5.000 dh": 5000.0,
+    "": None,
+    "néant": None,
+    None: None,
+}
+
+
+@pytest.mark.parametrize("text,expected", list(CORPUS.items()))
+def test_corpus(text, expected):
+    assert normalize_amount(text) == expected
+
+
+def test_find_amount_currency_and_hint():
+    assert find_amount("Montant 1,234.50 dirhams") == ("1,234.50", "DH")
+    assert find_amount("400\u00A0200,00 DHS") == ("400 200,00", "DHS")
+    # Telefonnummer / ID ohne Trenner und Währung wird mit require_hint übersprungen
+    assert find_amount("Tél 0522123456 - caution 5.000,00", require_hint=True) == ("5.000,00", "")
+    assert find_amount("Réf 20261234", require_hint=True) is None
+
+
+def _render(rng: random.Random, units: int, cents: int):
+    """Betrag in einer zufälligen, laut Grammatik eindeutigen Schreibweise."""
+    grp, dec = rng.choice([(" ", ","), ("\u00A0", ","), ("\u202F", ","), (".", ","), (",", "."), ("", ","), ("", ".")])
+    digits = str(units)
+    if grp:
+        head = len(digits) % 3 or 3
+        digits = grp.join([digits[:head]] + [digits[i:i + 3] for i in range(head, len(digits), 3)])
+    if cents or rng.random() < 0.5:
+        digits += f"{dec}{cents:02d}"
+    elif not grp and units >= 1000 and rng.random() < 0.5:
+        digits += f"{dec}00"  # "400200.00"
+    cur = rng.choice(["", " DH", " DHS", " MAD", " Dirhams", "DH", "\u00A0MAD"])
+    ctx = rng.choice(["{}", "Estimation : {} TTC", "Caution provisoire {}", "{}\n12"])
+    return ctx.format(digits + cur)
+
+
+def test_random_renderings_round_trip():
+    rng = random.Random(20261019)
+    for _ in range(5000):
+        units = rng.choice([rng.randrange(0, 1000), rng.randrange(1000, 10 ** 6), rng.randrange(10 ** 6, 10 ** 11)])
+        cents = rng.randrange(100) if rng.random() < 0.6 else 0
+        text = _render(rng, units, cents)
+        assert normalize_amount(text) == pytest.approx(units + cents / 100), repr(text)
+
+
+def test_batch_matches_single():
+    rng = random.Random(7)
+    texts = [_render(rng, rng.randrange(10 ** 8), rng.randrange(100)) for _ in range(500)]
+    texts += rng.choices(texts, k=500) + [None, "", "néant"]
+    assert normalize_amounts(texts) == [normalize_amount(t) for t in texts]
+
+
+def test_batch_array_without_numpy(monkeypatch):
+    monkeypatch.setattr(safkaty, "np", None)
+    assert normalize_amounts(["1,234.50 DH", "néant"], as_array=True) == [1234.5, None]
+
+
+# --- Eingefrorene Kopie der früheren Helfer (Stand vor der gemeinsamen Grammatik), nur als Vergleichsbasis ---
+
+def _old_norm(s: str) -> str:
+    if not s:
+        return ""
+    s = s.replace("\u00A0", " ")
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def old_safe_float_amount(text: str):
+    if not text:
+        return None
+    t = text.strip().replace("\u00A0", " ")
+    t = re.sub(r"(MAD|DH|DHS|Dirhams?)", "", t, flags=re.IGNORECASE).strip()
+    t = t.replace(" ", "")
+    if "," in t and t.count(",") == 1:
+        t = t.replace(".", "").replace(",", ".")
+    m = re.search(r"(\d+(?:\.\d+)?)", t)
+    if not m:
+        return None
+    try:
+        return float(m.group(1))
+    except Exception:
+        return None
+
+
+def old_safkaty_money(s: str) -> str:
+    if not s:
+        return ""
+    m = re.search(r"([0-9][0-9\s\.,\u00A0\u202F]*)\s*(DH|DHS|MAD)?", s, flags=re.I)
+    if not m:
+        return ""
+    num = re.sub(r"\s+", " ", m.group(1)).strip()
+    cur = (m.group(2) or "").strip()
+    if cur:
+        return f"{num} {cur}".replace("  ", " ")
+    return f"{num} DH"
+
+
+def old_parse_money_from_text(t: str) -> str:
+    # früher verschachtelt in fetch_details_by_url
+    if not t:
+        return ""
+    t = _old_norm(t)
+    candidates = re.findall(r"([0-9][0-9\s\.,\u00A0\u202F]*)(?:\s*(DH|DHS|MAD))?", t, flags=re.IGNORECASE)
+    for num_raw, cur in candidates:
+        num = _old_norm(num_raw)
+        cur = (cur or "").strip().upper()
+        if ("," not in num_raw and "." not in num_raw) and not cur:
+            continue
+        digits = re.sub(r"[^0-9]", "", num_raw)
+        if len(digits) > 15:
+            continue
+        out = num
+        if cur:
+            out = f"{out} {cur}"
+        return out.strip()
+    return ""
+
+
+def old_parse_date_ddmmyyyy(text: str):
+    if not text:
+        return None
+    m = re.search(r"(\d{2})/(\d{2})/(\d{4})", text)
+    if m:
+        return f"{m.group(3)}-{m.group(2)}-{m.group(1)}"
+    m2 = re.search(r"(\d{4})-(\d{2})-(\d{2})", text)
+    if m2:
+        return f"{m2.group(1)}-{m2.group(2)}-{m2.group(3)}"
+    return None
+
+
+def test_old_helpers_disagreed():
+    # Grund für die gemeinsame Grammatik: die alten Helfer lasen diese Formate falsch
+    assert old_safe_float_amount("400.200") == 400.2 and normalize_amount("400.200") == 400200.0
+    assert old_safe_float_amount("1,234.50 DH") == 1.2345 and normalize_amount("1,234.50 DH") == 1234.5
+    assert old_safkaty_money("Lot 2 : 400 200,00") == "2 DH" and find_amount("400 200,00") == ("400 200,00", "")
+    assert old_parse_date_ddmmyyyy("5/9/2026") is None and parse_date_ddmmyyyy("5/9/2026") == "2026-09-05"
+
+
+def _timed(name: str, n: int, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    dt = time.perf_counter() - t0
+    print(f"{name:42s} {n / dt:12,.0f} Strings/s")
+    return out
+
+
+def _bench(n: int):
+    rng = random.Random(1)
+    # typische Importlast: viele Wiederholungen (Lots mit identischer Caution/Estimation)
+    distinct = [_render(rng, rng.randrange(10 ** 8), rng.randrange(100)) for _ in range(max(1, n // 10))]
+    texts = rng.choices(distinct, k=n)
+    print(f"{n:,} Beträge, {len(distinct):,} verschieden")
+    old = _timed("alt: safe_float_amount (einzeln)", n, lambda: [old_safe_float_amount(t) for t in texts])
+    _timed("alt: _safkaty_money (einzeln)", n, lambda: [old_safkaty_money(t) for t in texts])
+    _timed("alt: parse_money_from_text (einzeln)", n, lambda: [old_parse_money_from_text(t) for t in texts])
+    new = _timed("neu: normalize_amount (einzeln)", n, lambda: [normalize_amount(t) for t in texts])
+    _timed("neu: find_amount (einzeln)", n, lambda: [find_amount(t, require_hint=True) for t in texts])
+    _timed("neu: normalize_amounts (Batch)", n, lambda: normalize_amounts(texts))
+    _timed("neu: normalize_amounts (as_array)", n, lambda: normalize_amounts(texts, as_array=True))
+    print(f"abweichende Werte alt/neu: {sum(1 for a, b in zip(old, new) if a != b):,} von {n:,}")
+
+    dates = rng.choices([f"{rng.randrange(1, 29)}/{rng.randrange(1, 13):02d}/2026 10:00" for _ in range(max(1, n // 10))]
+                        + ["2026-11-20", ""], k=n)
+    print(f"{n:,} Datumsangaben")
+    _timed("alt: parse_date_ddmmyyyy (einzeln)", n, lambda: [old_parse_date_ddmmyyyy(t) for t in dates])
+    _timed("neu: parse_date_ddmmyyyy (einzeln)", n, lambda: [parse_date_ddmmyyyy(t) for t in dates])
+    _timed("neu: parse_dates (Batch)", n, lambda: parse_dates(dates))
+
+
+if __name__ == "__main__":
+    _bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
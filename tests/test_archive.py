@@ -0,0 +1,71 @@
+"""Archivierung abgelaufener Tender: Umzug in safkaty_archive.db, Wiederaufnahme, Re-Import."""
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from safkaty import Database, Tender, TenderLot
+
+NOW = datetime(2026, 10, 1, 12, 0)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    d = Database()
+    yield d
+    d.close()
+
+
+def _tender(i: int, echeance: str = "2026-01-15", lots=None) -> Tender:
+    return Tender(reference=f"{i}/DAAF/2026", titre=f"Objet {i}", echeance=echeance, echeance_time="10:00",
+                  estimation=100.0 * i, lots=lots or [])
+
+
+def _ids(db, schema: str):
+    return sorted(r[0] for r in db.pool.read(lambda c: c.execute(f"SELECT id FROM {schema}.tenders").fetchall()))
+
+
+def test_archive_moves_expired_and_uses_wal(db):
+    db.upsert_tenders([_tender(i) for i in range(5)] + [_tender(9, echeance="2099-01-01")])
+    assert db.archive_expired(now=NOW, batch_size=2) == 5
+    assert len(_ids(db, "main")) == 1 and len(_ids(db, "archive")) == 5
+    assert db.count_tenders(include_archive=True) == 6
+    with sqlite3.connect(db.archive_file) as c:
+        assert c.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_interrupted_move_is_completed(db):
+    db.upsert_tenders([_tender(1, lots=[TenderLot(1, "a", 10.0, 1.0), TenderLot(2, "b", 20.0, 2.0)])])
+    tid = _ids(db, "main")[0]
+    db.update_status(tid, "verloren")
+    # Absturz nach dem Kopieren, vor dem Löschen in main: Zeile liegt in beiden Dateien
+    now_ts = NOW.strftime("%Y-%m-%d %H:%M")
+    assert db.pool.write(lambda c: db._archive_copy(c, now_ts, now_ts, 100)) == [tid]
+    assert _ids(db, "main") == _ids(db, "archive") == [tid]
+    # inzwischen fällt in main ein Lot weg -> der Abschluss übernimmt den aktuellen Stand
+    db.upsert_tenders([_tender(1, lots=[TenderLot(1, "a", 10.0, 1.0)])])
+    assert db.archive_expired(now=NOW) == 1
+    assert _ids(db, "main") == [] and _ids(db, "archive") == [tid]
+    assert db.count_tenders(include_archive=True) == 1
+    assert [l.lot_no for l in db.get_lots(tid)] == [1]
+    assert db.get_tender(tid)["status"] == "verloren"
+
+
+def test_reimport_of_archived_tender_updates_in_place(db):
+    db.upsert_tenders([_tender(3, lots=[TenderLot(1, "a", 10.0, 1.0)])])
+    tid = _ids(db, "main")[0]
+    db.update_notes(tid, "wichtig")
+    db.archive_expired(now=NOW)
+    created, new_id = db.upsert_tender(replace_titre(_tender(3, lots=[TenderLot(1, "a", 15.0, 1.0)]), "neu"))
+    assert (created, new_id) == (False, tid)
+    assert _ids(db, "main") == [] and _ids(db, "archive") == [tid]
+    data = db.get_tender(tid)
+    assert data["titre"] == "neu" and data["notes"] == "wichtig"
+    assert [l.estimation for l in db.get_lots(tid)] == [15.0]
+    assert db.count_tenders(include_archive=True) == 1
+
+
+def replace_titre(t: Tender, titre: str) -> Tender:
+    t.titre = titre
+    return t
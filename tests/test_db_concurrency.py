@@ -0,0 +1,88 @@
+"""Stresstest für DbConnectionManager/Database: paralleler Import, Listen und Status-Updates."""
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from safkaty import Database, DbConnectionManager, Tender, TenderLot
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    d = Database()
+    yield d
+    d.close()
+
+
+def _tender(i: int) -> Tender:
+    return Tender(
+        reference=f"{i}/BP/2026",
+        titre=f"Travaux lot {i}",
+        lieux="RABAT",
+        estimation=1000.0 + i,
+        caution=10.0,
+        echeance="2099-12-31",
+        organisation="COMMUNE",
+        lots=[TenderLot(1, "a", 500.0 + i, 5.0), TenderLot(2, "b", 500.0, 5.0)],
+    )
+
+
+def test_concurrent_import_list_and_status(db):
+    importers, per_importer = 4, 100
+    errors = []
+    done = threading.Event()
+
+    def importer(k):
+        for start in range(0, per_importer, 10):
+            db.upsert_tenders([_tender(k * 1000 + i) for i in range(start, start + 10)])
+
+    def lister():
+        while not done.is_set():
+            rows = db.list_tenders_page(limit=50, sort=("estimation", True))
+            assert len(rows) <= 50
+            db.count_tenders(search="travaux")
+            db.stats()
+
+    def updater():
+        while not done.is_set():
+            for row in db.list_tenders_page(limit=20):
+                db.update_status(row[0], "in_bearbeitung")
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        readers = [ex.submit(lister) for _ in range(2)] + [ex.submit(updater) for _ in range(2)]
+        for f in [ex.submit(importer, k) for k in range(importers)]:
+            f.result()
+        done.set()
+        for f in readers:
+            try:
+                f.result(timeout=30)
+            except Exception as e:
+                errors.append(e)
+
+    assert not errors
+    total = importers * per_importer
+    assert db.count_tenders() == total
+    assert db.stats()["TOTAL"] == total
+    assert db.check_counters(repair=False)
+    assert len(db.lot_totals()) == total
+
+
+def test_failed_begin_fails_whole_batch(tmp_path):
+    # BEGIN IMMEDIATE scheitert ("database is locked") -> alle Futures des Batches bekommen den Fehler
+    path = str(tmp_path / "t.db")
+    mgr = DbConnectionManager(path, setup=lambda c: c.execute("CREATE TABLE t (x)"), readers=1)
+    mgr._wconn.execute("PRAGMA busy_timeout = 50")
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        futs = [mgr.submit_write(lambda c: c.execute("INSERT INTO t VALUES (1)")) for _ in range(5)]
+        for f in futs:
+            with pytest.raises(sqlite3.OperationalError):
+                f.result(timeout=5)
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert mgr.write(lambda c: c.execute("INSERT INTO t VALUES (2)").rowcount) == 1
+    mgr.close()
@@ -0,0 +1,253 @@
+"""DceDownloader gegen einen lokalen HTTP-Server (Range/If-Range, ETag, Repr-Digest, Abbrüche)."""
+import base64
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from safkaty import DceDownloader, dce_url
+
+
+class FileServer:
+    """files: name -> bytes; drop: name -> Bytes, nach denen die Verbindung einmal abreißt (dann on_drop())."""
+
+    def __init__(self):
+        self.files = {}
+        self.drop = {}
+        self.on_drop = None
+        self.ranges = True
+        self.html = set()
+        self.sent = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+        self.srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.srv.daemon_threads = True
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.srv.server_address[1]}"
+
+    def url(self, name: str) -> str:
+        return f"{self.base}/f/{name}"
+
+    def handle(self, h):
+        name = h.path.rsplit("/", 1)[-1]
+        if name in self.html:
+            body = b"<html><body>login</body></html>"
+            h.send_response(200)
+            h.send_header("Content-Type", "text/html")
+            h.send_header("Content-Length", str(len(body)))
+            h.end_headers()
+            h.wfile.write(body)
+            return
+        data = self.files.get(name)
+        if data is None:
+            h.send_response(404)
+            h.send_header("Content-Length", "0")
+            h.end_headers()
+            return
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        start, end, status = 0, len(data) - 1, 200
+        rng, if_range = h.headers.get("Range"), h.headers.get("If-Range")
+        if rng and self.ranges and (not if_range or if_range == etag):
+            m = re.match(r"bytes=(\d+)-(\d*)", rng)
+            start = int(m.group(1))
+            end = min(int(m.group(2)) if m.group(2) else len(data) - 1, len(data) - 1)
+            status = 206
+        body = data[start:end + 1]
+        h.send_response(status)
+        h.send_header("Content-Type", "application/zip")
+        h.send_header("Content-Length", str(len(body)))
+        h.send_header("ETag", etag)
+        h.send_header("Repr-Digest", "sha-256=:" + base64.b64encode(hashlib.sha256(data).digest()).decode() + ":")
+        h.send_header("Content-Disposition", f'attachment; filename="{name}.zip"')
+        if status == 206:
+            h.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        h.end_headers()
+        with self.lock:
+            drop = self.drop.get(name)
+            if drop is not None and len(body) > drop:
+                del self.drop[name]
+            else:
+                drop = None
+        if drop is not None:
+            h.wfile.write(body[:drop])
+            h.wfile.flush()
+            h.close_connection = True
+            if self.on_drop:
+                self.on_drop()
+            return
+        h.wfile.write(body)
+        with self.lock:
+            self.sent += len(body)
+
+    def close(self):
+        self.srv.shutdown()
+        self.srv.server_close()
+
+
+def blob(n: int, seed: int) -> bytes:
+    return hashlib.shake_256(str(seed).encode()).digest(n)
+
+
+@pytest.fixture
+def server():
+    s = FileServer()
+    yield s
+    s.close()
+
+
+class Done:
+    """on_done-Callback: wartet auf n fertige/fehlgeschlagene Jobs."""
+
+    def __init__(self):
+        self.jobs = []
+        self.cond = threading.Condition()
+
+    def __call__(self, job):
+        with self.cond:
+            self.jobs.append(job)
+            self.cond.notify_all()
+
+    def wait(self, n: int, timeout: float = 30):
+        with self.cond:
+            assert self.cond.wait_for(lambda: len(self.jobs) >= n, timeout), self.jobs
+
+
+def make(tmp_path, done, **kw):
+    kw.setdefault("min_segment", 64 << 10)
+    return DceDownloader(str(tmp_path / "DCE"), on_done=done, retry_delay=0.01, **kw)
+
+
+def test_parallel_ranges_dedup_and_host_limit(tmp_path, server, monkeypatch):
+    server.files.update({"a": blob(1_000_000, 1), "b": blob(300_000, 2), "c": blob(1_000_000, 1)})
+    active, peak, lock = [0], [0], threading.Lock()
+    orig = DceDownloader._host_slot
+
+    class Slot:
+        def __init__(self, sem):
+            self.sem = sem
+
+        def __enter__(self):
+            self.sem.acquire()
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+
+        def __exit__(self, *a):
+            with lock:
+                active[0] -= 1
+            self.sem.release()
+
+    monkeypatch.setattr(DceDownloader, "_host_slot", lambda self, url: Slot(orig(self, url)))
+    done = Done()
+    d = make(tmp_path, done, workers=6, per_host=2, segments=4)
+    try:
+        ids = [d.enqueue(server.url(n), tender_id=i) for i, n in enumerate("abc")]
+        assert d.enqueue(server.url("a"), tender_id=0) == ids[0]
+        done.wait(3)
+        jobs = {j["url"].rsplit("/", 1)[-1]: j for j in d.jobs()}
+        for name, j in jobs.items():
+            assert j["status"] == "done"
+            assert j["filename"] == f"{name}.zip"
+            assert d.path_for(j["sha256"]).read_bytes() == server.files[name]
+        st = d.stats()
+        assert st["dedup_hits"] == 1 and st["dedup_bytes"] == 1_000_000
+        assert peak[0] <= 2
+        assert len(list(d.objects.rglob("*"))) == 2 + 2  # 2 Dateien + 2 Unterordner
+    finally:
+        d.close()
+
+
+def test_resume_after_dropped_connection(tmp_path, server):
+    data = server.files["big"] = blob(800_000, 5)
+    server.drop["big"] = 300_000
+    done = Done()
+    d = make(tmp_path, done, segments=1, max_attempts=1)
+    try:
+        jid = d.enqueue(server.url("big"), tender_id=1)
+        done.wait(1)
+        assert d.job(jid)["status"] == "failed"
+        server.sent = 0
+        d.enqueue(server.url("big"), tender_id=1)  # fehlgeschlagen -> neu einreihen, Teilstück bleibt
+        done.wait(2)
+        j = d.job(jid)
+        assert j["status"] == "done" and d.path_for(j["sha256"]).read_bytes() == data
+        # fortgesetzt statt neu: nur der Rest ab dem letzten vollständig geschriebenen Block
+        assert len(data) - 300_000 <= server.sent <= len(data) - 200_000
+    finally:
+        d.close()
+
+
+def test_changed_file_restarts_with_fresh_digest(tmp_path, server):
+    # Datei ändert sich mitten im Download: If-Range liefert 200 -> Neustart, Digest der neuen Fassung gilt
+    server.files["chg"] = blob(600_000, 8)
+    server.drop["chg"] = 100_000
+    server.on_drop = lambda: server.files.update(chg=blob(600_000, 9))
+    done = Done()
+    d = make(tmp_path, done, segments=2)
+    try:
+        jid = d.enqueue(server.url("chg"), tender_id=2)
+        done.wait(1)
+        j = d.job(jid)
+        assert j["status"] == "done", j["error"]
+        assert d.path_for(j["sha256"]).read_bytes() == server.files["chg"]
+        assert j["server_sha256"] == j["sha256"] and j["expected_sha256"] is None
+    finally:
+        d.close()
+
+
+def test_failures_and_single_stream(tmp_path, server):
+    server.files.update({"tiny": b"x" * 10, "plain": blob(200_000, 3)})
+    server.html.add("page")
+    done = Done()
+    d = make(tmp_path, done)
+    try:
+        bad = d.enqueue(server.url("tiny"), tender_id=3, expected_sha256="00" * 32)
+        page = d.enqueue(server.url("page"), tender_id=4)
+        done.wait(2)
+        assert d.job(bad)["status"] == "failed" and d.job(bad)["attempts"] == d.max_attempts
+        assert d.job(page)["status"] == "failed" and d.job(page)["attempts"] == 1
+        server.ranges = False
+        plain = d.enqueue(server.url("plain"), tender_id=5)
+        done.wait(3)
+        j = d.job(plain)
+        assert j["status"] == "done" and not j["ranges"]
+    finally:
+        d.close()
+
+
+def test_queue_survives_restart(tmp_path, server):
+    server.files["q"] = blob(100_000, 4)
+    d = make(tmp_path, None)
+    d._stop.set()  # wie beim Beenden: enqueue plant nichts mehr ein, der Job bleibt in der Warteschlange
+    jid = d.enqueue(server.url("q"), tender_id=6)
+    d._stop.clear()
+    d.close()
+    done = Done()
+    d = make(tmp_path, done)
+    try:
+        assert d.job(jid)["status"] == "queued"
+        d.start()
+        done.wait(1)
+        assert d.job(jid)["status"] == "done"
+    finally:
+        d.close()
+
+
+def test_dce_url():
+    u = dce_url("https://www.marchespublics.gov.ma/index.php?page=entreprise.EntrepriseDetailsConsultation"
+                "&refConsultation=123&orgAcronyme=x9k")
+    assert u == ("https://www.marchespublics.gov.ma/index.php?page=entreprise.EntrepriseDemandeTelechargementDce"
+                 "&refConsultation=123&orgAcronyme=x9k")
+    assert dce_url("https://example.ma/index.php?page=x") == ""
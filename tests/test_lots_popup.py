@@ -0,0 +1,27 @@
+"""Lot-Popup (iter_lots_popup): Lot-Köpfe, Werte im eigenen Block, Lot-unique-Fallback."""
+from safkaty import iter_lots_popup
+
+POPUP = (
+    "<p>Lot 1 :</p><p>Aménagement de voirie</p><p>Estimation</p><p>400 200,00</p><p>Caution provisoire</p><p>5.000 DHS</p>"
+    "<p>Lot n° 2 - Fournitures</p><p>Catégorie : Fournitures</p>"
+    "<p>Lot 3</p><p>Réseau</p><p>Estimation : -</p><p>Caution provisoire: 1,234.50 dirhams</p>"
+)
+
+
+def test_blocks_with_values_in_own_block():
+    assert list(iter_lots_popup(POPUP)) == [
+        (1, "Aménagement de voirie", "400 200,00 DH", "5.000 DHS"),
+        (3, "Réseau", "", "1,234.50 DH"),
+    ]
+
+
+def test_value_after_other_lines_and_no_phone_numbers():
+    html = "<p>Lot 1</p><p>Objet</p><p>Estimation</p><p>-</p><p>:</p><p>12 000,00</p>" \
+           "<p>Caution provisoire</p><p>Tél 0522123456</p><p>Lot 2</p><p>Éclairage</p><p>Estimation : 7,5</p>"
+    assert list(iter_lots_popup(html)) == [(1, "Objet", "12 000,00 DH", ""), (2, "Éclairage", "7,5 DH", "")]
+
+
+def test_lot_unique_fallback():
+    html = "<div>Estimation : 100 000,00 DH</div><div>Caution provisoire : 2 000,00</div>"
+    assert list(iter_lots_popup(html)) == [(1, "", "100 000,00 DH", "2 000,00 DH")]
+    assert list(iter_lots_popup("")) == []
@@ -0,0 +1,79 @@
+"""ParseCache: Treffer/Fehlschläge, LRU-Grenze im Speicher, Grenze der SQLite-Datei, Parser-Version."""
+import sqlite3
+
+import pytest
+
+import safkaty
+from safkaty import ParseCache
+
+
+class Parser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, body):
+        self.calls += 1
+        return {"len": len(body), "items": [body[:3]]}
+
+
+@pytest.fixture
+def parse():
+    return Parser()
+
+
+def test_miss_then_hit(parse):
+    c = ParseCache()
+    first = c.get_or_parse("popup", "<p>a</p>", parse)
+    first["items"].append("x")  # Treffer sind frische Kopien
+    assert c.get_or_parse("popup", "<p>a</p>", parse) == {"len": 8, "items": ["<p>"]}
+    assert parse.calls == 1
+    # weitere Parser-Eingaben (extra) gehören zum Schlüssel
+    c.get_or_parse("popup", "<p>a</p>", parse, extra="https://other")
+    assert parse.calls == 2
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 2
+
+
+def test_memory_lru_is_bounded(parse):
+    c = ParseCache(capacity=2)
+    for body in ("a", "b", "a", "c"):  # "a" frisch genutzt -> "b" fliegt raus
+        c.get_or_parse("popup", body, parse)
+    assert c.stats()["size"] == 2 and parse.calls == 3
+    c.get_or_parse("popup", "a", parse)
+    c.get_or_parse("popup", "c", parse)
+    assert parse.calls == 3
+    c.get_or_parse("popup", "b", parse)
+    assert parse.calls == 4
+
+
+def test_disk_is_bounded_and_survives_restart(parse, tmp_path):
+    path = str(tmp_path / "cache.db")
+    c = ParseCache(path, capacity=0, disk_capacity=10)
+    for i in range(30):
+        c.get_or_parse("detail", f"page {i}", parse)
+    assert 10 <= c.stats()["disk_size"] <= 11
+    c.close()
+
+    c = ParseCache(path, capacity=0, disk_capacity=10)
+    c.get_or_parse("detail", "page 29", parse)  # jüngster Eintrag: von Platte
+    assert parse.calls == 30 and c.stats()["disk_hits"] == 1
+    c.get_or_parse("detail", "page 0", parse)   # ältester: weggeräumt
+    assert parse.calls == 31
+    c.close()
+
+
+def test_version_bump_drops_old_rows(parse, tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.db")
+    c = ParseCache(path)
+    c.get_or_parse("popup", "x", parse)
+    c.get_or_parse("detail", "y", parse)
+    c.close()
+
+    monkeypatch.setitem(safkaty.PARSER_VERSIONS, "popup", safkaty.PARSER_VERSIONS["popup"] + 1)
+    c = ParseCache(path)
+    c.get_or_parse("popup", "x", parse)
+    c.get_or_parse("detail", "y", parse)
+    assert parse.calls == 3  # nur popup neu geparst
+    c.close()
+    with sqlite3.connect(path) as conn:
+        rows = conn.execute("SELECT kind, version FROM parse_cache ORDER BY kind").fetchall()
+    assert rows == [("detail", safkaty.PARSER_VERSIONS["detail"]), ("popup", safkaty.PARSER_VERSIONS["popup"])]
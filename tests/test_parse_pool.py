@@ -0,0 +1,55 @@
+"""ParsePool: PAGE_PARSERS und ihre Argumente gehen in Worker-Prozesse, Ausfall des Pools -> Parsen im Thread."""
+import pickle
+
+import pytest
+
+from safkaty import PAGE_PARSERS, ParsePool, SearchQuery
+
+BASE = "https://www.marchespublics.gov.ma"
+SEARCH = "<table>" + "".join(
+    f"<tr><td>Appel d'offres ouvert</td><td>01/09/2026</td><td><b>{i}/BP/2026</b><br/>Objet : Travaux {i}"
+    f"<br/>Acheteur public : COMMUNE</td><td>RABAT</td><td>20/11/2026 10:00</td>"
+    f"<td><a href='index.php?page=entreprise.EntrepriseDetailsConsultation&amp;refConsultation={i}"
+    f"&amp;orgAcronyme=x9k'>Accéder à la consultation</a></td></tr>" for i in range(5)) + "</table>"
+DETAIL = ("<table><tr><td>Référence :</td><td>7/BP/2026</td></tr><tr><td>Estimation (en Dhs TTC) :</td>"
+          "<td>400 200,00</td></tr></table>")
+POPUP = "<p>Lot 1</p><p>Voirie</p><p>Estimation : 12 000,00</p>"
+JOBS = [("search", SEARCH, BASE, 3, SearchQuery(keyword="travaux", deadline_to="2026-12-31")),
+        ("detail", DETAIL), ("popup", POPUP)]
+
+
+def test_parsers_and_arguments_pickle():
+    for kind, fn in PAGE_PARSERS.items():
+        assert pickle.loads(pickle.dumps(fn)) is fn, kind
+    q = SearchQuery(lieu="Rabat", ignored=("lieu",))
+    assert pickle.loads(pickle.dumps(q)) == q
+
+
+@pytest.fixture
+def pool():
+    p = ParsePool(processes=1)
+    yield p
+    p.close()
+
+
+def test_pool_matches_inline(pool):
+    for kind, html, *args in JOBS:
+        assert pool.parse(kind, html, *args) == PAGE_PARSERS[kind](html, *args), kind
+    assert pool.stats()["jobs"] == 3 and pool.stats()["inline"] == 0
+
+
+def test_broken_pool_falls_back_inline(pool):
+    pool.parse("popup", POPUP)
+    for proc in list(pool._exec._processes.values()):
+        proc.kill()
+        proc.join()
+    for kind, html, *args in JOBS:
+        assert pool.parse(kind, html, *args) == PAGE_PARSERS[kind](html, *args), kind
+    st = pool.stats()
+    assert st["broken"] and st["inline"] == 3
+
+
+def test_parser_errors_are_not_swallowed(pool):
+    with pytest.raises(AttributeError):
+        pool.parse("search", SEARCH, BASE, None, object())  # object() hat kein matches()
+    assert pool.stats()["inline"] == 0 and not pool.stats()["broken"]
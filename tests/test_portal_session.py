@@ -0,0 +1,161 @@
+"""Portal-Sitzung (SessionStore): Endpoint/Cookies wiederverwenden, Ablehnung erkennen, leere Suchen."""
+import re
+import threading
+import urllib.parse
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import safkaty
+from safkaty import MarchesPublicsScraper, ParseCache, SearchQuery, SessionStore
+
+ROWS = [("RABAT", 900001), ("FES", 900002), ("TEMARA", 900003)]
+REGIONS = {"RABAT-SALÉ-KÉNITRA": {"RABAT", "TEMARA"}}
+
+
+class Portal:
+    """index.php mit PHP-Sitzung; unbekannte Sitzung -> 302 auf die Startseite; index.php5 fehlt."""
+
+    def __init__(self):
+        self.drop_lieu = False  # Portal verwirft lieuxExecution per Umleitung und filtert nicht
+        self.captcha = 0  # so viele Suchanfragen mit CAPTCHA-Seite beantworten
+        self.sessions = set()
+        self.hits = Counter()
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def do_GET(self):
+                portal.handle(self)
+
+        self.srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.srv.daemon_threads = True
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.srv.server_address[1]}"
+
+    def send(self, h, status, body=b"", headers=()):
+        h.send_response(status)
+        for k, v in headers:
+            h.send_header(k, v)
+        h.send_header("Content-Length", str(len(body)))
+        h.end_headers()
+        h.wfile.write(body)
+
+    def handle(self, h):
+        u = urllib.parse.urlsplit(h.path)
+        q = dict(urllib.parse.parse_qsl(u.query))
+        self.hits[q.get("page", "")] += 1
+        if u.path.endswith(".php5"):
+            return self.send(h, 404)
+        m = re.search(r"PHPSESSID=(\w+)", h.headers.get("Cookie", ""))
+        headers = []
+        if not m or m.group(1) not in self.sessions:
+            sid = uuid.uuid4().hex
+            self.sessions.add(sid)
+            self.hits["new_session"] += 1
+            headers.append(("Set-Cookie", f"PHPSESSID={sid}; path=/"))
+            if m:
+                # abgelaufene Sitzung: neue Sitzung, Umleitung auf die Startseite
+                self.hits["rejected"] += 1
+                return self.send(h, 302, headers=headers + [("Location", "/index.php?page=entreprise.EntrepriseHome")])
+        if q.get("page") != "entreprise.EntrepriseAdvancedSearch":
+            return self.send(h, 200, b"<html><body>Accueil</body></html>", headers)
+        if self.captcha and q.get("page") == "entreprise.EntrepriseAdvancedSearch":
+            self.captcha -= 1
+            return self.send(h, 200, b"<html><body>Veuillez saisir le captcha</body></html>", headers)
+        if self.drop_lieu and "lieuxExecution" in q:
+            del q["lieuxExecution"]
+            return self.send(h, 302, headers=headers + [("Location", "/index.php?" + urllib.parse.urlencode(q))])
+        lieu = q.get("lieuxExecution", "").upper()
+        rows = "".join(
+            f"<tr><td>Appel d'offres ouvert</td><td>01/09/2026</td><td><b>{i}/BP/2026</b><br/>Objet : Travaux {i}"
+            f"<br/>Acheteur public : COMMUNE</td><td>{city}</td><td>20/11/2026 10:00</td>"
+            f"<td><a href='index.php?page=entreprise.EntrepriseDetailsConsultation&amp;refConsultation={i}"
+            f"&amp;orgAcronyme=x9k'>Accéder à la consultation</a></td></tr>"
+            for city, i in ROWS if not lieu or city in REGIONS.get(lieu, {lieu}))
+        body = ("<html><body><form action='index.php?page=entreprise.EntrepriseAdvancedSearch' method='post'>"
+                f"</form><table>{rows}</table></body></html>")
+        return self.send(h, 200, body.encode("utf-8"), headers + [("Content-Type", "text/html; charset=utf-8")])
+
+
+@pytest.fixture
+def portal():
+    p = Portal()
+    yield p
+    p.srv.shutdown()
+    p.srv.server_close()
+
+
+def _scraper(portal, store):
+    return MarchesPublicsScraper(portal.base, parse_cache=ParseCache(), session_store=store)
+
+
+def _search(sc, q):
+    return sc.search(q, max_results=10, polite_delay=0, enrich_details=False)
+
+
+def test_restored_session_skips_warm_up(portal, tmp_path):
+    store = SessionStore(str(tmp_path / "session.json"))
+    assert len(_search(_scraper(portal, store), "travaux")) == 3
+    assert portal.hits["entreprise.EntrepriseAdvancedSearch"] == 2  # index.php5 + index.php
+    portal.hits.clear()
+    sc = _scraper(portal, store)
+    assert sc.endpoint == "index.php"
+    assert len(_search(sc, "travaux")) == 3
+    assert portal.hits["entreprise.EntrepriseAdvancedSearch"] == 1 and portal.hits["new_session"] == 0
+
+
+def test_rejected_session_is_rebuilt(portal, tmp_path):
+    store = SessionStore(str(tmp_path / "session.json"))
+    _search(_scraper(portal, store), "travaux")
+    portal.sessions.clear()  # Portal hat die Sitzung verworfen
+    portal.hits.clear()
+    assert len(_search(_scraper(portal, store), "travaux")) == 3
+    assert portal.hits["rejected"] == 1
+    portal.hits.clear()
+    _search(_scraper(portal, store), "travaux")
+    assert portal.hits["entreprise.EntrepriseAdvancedSearch"] == 1 and portal.hits["rejected"] == 0
+
+
+def test_empty_result_keeps_session(portal, tmp_path):
+    store = SessionStore(str(tmp_path / "session.json"))
+    _search(_scraper(portal, store), "travaux")
+    portal.hits.clear()
+    sc = _scraper(portal, store)
+    assert _search(sc, SearchQuery(keyword="travaux", lieu="Tanger")) == []
+    assert portal.hits["entreprise.EntrepriseAdvancedSearch"] == 1 and portal.hits["new_session"] == 0
+    assert store.load(portal.base)["cookies"]
+
+
+def test_cold_empty_result_stores_endpoint(portal, tmp_path):
+    store = SessionStore(str(tmp_path / "session.json"))
+    assert _search(_scraper(portal, store), SearchQuery(keyword="x", lieu="Tanger")) == []
+    assert store.load(portal.base)["endpoint"] == "index.php"
+
+
+def test_lieu_filtered_by_portal_is_kept(portal, tmp_path):
+    sc = _scraper(portal, SessionStore(str(tmp_path / "session.json")))
+    got = _search(sc, SearchQuery(keyword="travaux", lieu="Rabat-Salé-Kénitra"))
+    assert sorted(t.lieux for t in got) == ["RABAT", "TEMARA"]
+
+
+def test_lieu_dropped_by_portal_is_filtered_locally(portal, tmp_path):
+    portal.drop_lieu = True
+    sc = _scraper(portal, SessionStore(str(tmp_path / "session.json")))
+    assert [t.lieux for t in _search(sc, SearchQuery(keyword="travaux", lieu="Rabat"))] == ["RABAT"]
+
+
+def test_transport_error_keeps_session(portal, tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "session.json"))
+    _search(_scraper(portal, store), "travaux")
+    cookies = store.load(portal.base)["cookies"]
+    monkeypatch.setattr(safkaty.time, "sleep", lambda s: None)
+    portal.captcha = 3  # alle Versuche von _get auf dem bekannten Endpoint scheitern
+    portal.hits.clear()
+    assert len(_search(_scraper(portal, store), "travaux")) == 3
+    assert portal.hits["new_session"] == 0 and portal.hits["rejected"] == 0
+    assert store.load(portal.base)["cookies"] == cookies
@@ -0,0 +1,70 @@
+"""reconcile_tree: Treeview auf neue Zeilen abgleichen (Reihenfolge, geänderte Werte, Anzahl Tk-Operationen)."""
+import random
+
+import pytest
+
+from safkaty import reconcile_tree
+
+
+class FakeTree:
+    """Die Teile von ttk.Treeview, die reconcile_tree benutzt (flache Liste)."""
+
+    def __init__(self):
+        self.order = []
+        self.vals = {}
+
+    def get_children(self):
+        return tuple(self.order)
+
+    def delete(self, iid):
+        self.order.remove(iid)
+        del self.vals[iid]
+
+    def insert(self, parent, index, iid, values):
+        self.order.insert(index, iid)
+        self.vals[iid] = values
+
+    def move(self, iid, parent, index):
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+    def item(self, iid, values):
+        self.vals[iid] = values
+
+
+def _sync(tree, rows, versions):
+    return reconcile_tree(tree, rows, key=lambda r: r[0], version=lambda r: r[1],
+                          values=lambda r: (r[0], r[1]), versions=versions)
+
+
+@pytest.mark.parametrize("old,new,ops", [
+    ([1, 2, 3, 4], [1, 2, 3, 4], 0),
+    ([1, 2, 3, 4], [4, 1, 2, 3], 1),        # letzte Zeile nach vorn: ein move
+    ([1, 2, 3, 4], [2, 3, 4, 1], 3),        # erste nach hinten: die anderen ziehen vor
+    (list(range(50)), list(range(49, -1, -1)), 49),  # Sortierung umgedreht
+    ([1, 2, 3], [3, 5, 1], 3),              # delete 2, move 3, insert 5
+])
+def test_order_and_ops(old, new, ops):
+    tree, versions = FakeTree(), {}
+    _sync(tree, [(k, 0) for k in old], versions)
+    assert _sync(tree, [(k, 0) for k in new], versions) == ops
+    assert tree.order == [str(k) for k in new]
+
+
+def test_changed_versions_update_values():
+    tree, versions = FakeTree(), {}
+    _sync(tree, [(1, 0), (2, 0)], versions)
+    assert _sync(tree, [(2, 1), (1, 0)], versions) == 2  # move + item
+    assert tree.vals == {"1": (1, 0), "2": (2, 1)} and versions == {"1": 0, "2": 1}
+
+
+def test_random_pages():
+    rng = random.Random(37)
+    tree, versions = FakeTree(), {}
+    for _ in range(300):
+        keys = rng.sample(range(120), rng.randrange(0, 60))
+        rows = [(k, rng.randrange(3)) for k in keys]
+        _sync(tree, rows, versions)
+        assert tree.order == [str(k) for k in keys]
+        assert all(tree.vals[str(k)] == (k, v) for k, v in rows)
+        assert set(versions) == set(tree.order)
@@ -0,0 +1,44 @@
+"""SearchQuery.matches: lokale Nachfilterung darf vom Portal richtig gelieferte Zeilen nicht verwerfen."""
+import pytest
+
+from safkaty import SearchQuery
+
+
+@pytest.mark.parametrize("lieu,row_lieux", [
+    ("Rabat-Salé-Kénitra", "RABAT"),
+    ("Rabat-Salé-Kénitra", "TEMARA"),
+    ("Casablanca-Settat", "MOHAMMEDIA"),
+])
+def test_lieu_sent_to_portal_is_not_filtered_locally(lieu, row_lieux):
+    assert SearchQuery(lieu=lieu).matches({"lieux": row_lieux})
+
+
+@pytest.mark.parametrize("lieu,row_lieux,expected", [
+    ("El Jadida", "EL KELAA DES SRAGHNA", False),
+    ("Sidi Kacem", "SIDI BENNOUR", False),
+    ("casa", "CASABLANCA", False),
+    ("Rabat", "RABAT", True),
+    ("Fès", "PREFECTURE DE FES", True),
+    ("El Jadida", "Province d'El-Jadida", True),
+    ("Rabat", "", True),  # unbekannter Ort schließt nichts aus
+])
+def test_lieu_ignored_by_portal_is_whole_phrase(lieu, row_lieux, expected):
+    assert SearchQuery(lieu=lieu, ignored=("lieu",)).matches({"lieux": row_lieux}) is expected
+
+
+@pytest.mark.parametrize("acheteur,org,expected", [
+    ("Ministère de la Santé", "MINISTERE DE LA SANTE ET DE LA PROTECTION SOCIALE", True),
+    ("commune de Rabat", "COMMUNE DE RABAT", True),
+    ("commune de Rabat", "COMMUNE DE RABAT-HASSAN", True),
+    ("Ministère de la Santé", "MINISTERE DE L'EQUIPEMENT ET DE L'EAU", False),
+    ("ONE", "ONEE", False),
+])
+def test_acheteur_ignored_by_portal(acheteur, org, expected):
+    assert SearchQuery(acheteur=acheteur).matches({"organisation_raw": org})
+    assert SearchQuery(acheteur=acheteur, ignored=("acheteur",)).matches({"organisation_raw": org}) is expected
+
+
+def test_dates_still_strict():
+    q = SearchQuery(deadline_from="2026-10-01", deadline_to="2026-10-31")
+    assert q.matches({"date_limite_raw": "15/10/2026 10:00"})
+    assert not q.matches({"date_limite_raw": "01/11/2026"})
@@ -0,0 +1,72 @@
+"""iter_table_rows (Stream-Parser) == soup.find_all("tr") auf kaputtem/verschachteltem Markup; limit hört früh auf."""
+import pytest
+from bs4 import BeautifulSoup
+
+from safkaty import is_detail_href, iter_table_rows, parse_search_html
+
+BASE = "https://www.marchespublics.gov.ma"
+D = "index.php?page=entreprise.EntrepriseDetailsConsultation&amp;refConsultation={}&amp;orgAcronyme=x"
+
+
+def _row(i: int) -> str:
+    return (f"<tr><td>Appel d'offres ouvert</td><td>01/09/2026</td><td><b>{i}/BP/2026</b><br/>Objet : Travaux {i}"
+            f"<br/>Acheteur public : COMMUNE</td><td>RABAT</td><td>20/11/2026 10:00</td>"
+            f"<td><a href='index.php?page=x.InfoSite'>InfoSite</a> <a href='{D.format(i)}'>Accéder</a></td></tr>")
+
+
+SAMPLES = {
+    "normal": "<table>" + "".join(_row(i) for i in range(3)) + "</table>",
+    "unclosed tr/td": f"<table><tr><td>a<td>b <a href='{D.format(1)}'>x</a><tr><td>c</table>",
+    "nested table": f"<table><tr><td>out<table><tr><td>in <a href='{D.format(2)}'>y</a></td></tr></table>"
+                    "tail</td></tr><tr><td>last</td></tr></table>",
+    "nested tr without table": f"<tr><td>a<tr><td>b <a href='{D.format(3)}'>z</a></td></tr>c</td></tr>",
+    "comment and script": f"<table><!-- <tr><td>no</td></tr> --><tr><td>a<script>var s='<tr><td>x</td></tr>';"
+                          f"</script><style>td{{}}</style> <a href='{D.format(4)}'>q</a></td></tr></table>",
+    "self-closing link and voids": f"<table><tr><td><a href='{D.format(5)}'/>after<br>x<img src=y>z</td></tr></table>",
+    "stray end tags": f"</tr></table><table><tr><td>a</b></td></span><a href='{D.format(6)}'>l</a></tr></tr></table>",
+    "unclosed link": f"<table><tr><td><a href='{D.format(7)}'>open<b>bold</td></tr><tr><td>next</td></tr></table>",
+    "entities": f"<table><tr><td>A&amp;B&nbsp;C &eacute;t&eacute; <a href='{D.format(8)}'>&lt;x&gt;</a></td></tr></table>",
+    "no detail link": "<table><tr><td>a <a href='index.php?page=x'>nope</a></td></tr><tr><td></td></tr></table>",
+    "text outside rows": f"<p>head</p><table>cap<tr><td>a <a href='{D.format(9)}'>w</a></td></tr>foot</table>",
+}
+
+
+def _soup_rows(html: str):
+    out = []
+    for tr in BeautifulSoup(html, "html.parser").find_all("tr"):
+        link = next((a for a in tr.find_all("a", href=True) if is_detail_href(a["href"])), None)
+        out.append((tr.get_text("\n", strip=True), link["href"] if link else None,
+                    link.get_text("\n", strip=True) if link else None))
+    return out
+
+
+@pytest.mark.parametrize("name", list(SAMPLES))
+@pytest.mark.parametrize("chunk", [7, 1 << 13])
+def test_rows_match_soup(name, chunk):
+    html = SAMPLES[name]
+    got = [("\n".join(texts), href, "\n".join(link) if link is not None else None)
+           for texts, href, link in iter_table_rows(html, chunk=chunk)]
+    assert got == _soup_rows(html)
+
+
+class _Tracked(str):
+    """str, der sich merkt, bis wohin der Parser gelesen hat."""
+
+    read_to = 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            _Tracked.read_to = max(_Tracked.read_to, item.stop or len(self))
+        return str.__getitem__(self, item)
+
+
+def test_limit_stops_early():
+    html = "<html><body><table>" + "".join(_row(i) for i in range(500)) + "</table></body></html>"
+    _n, all_rows, _fb = parse_search_html(html, BASE)
+    _n, rows, _fb = parse_search_html(html, BASE, limit=5)
+    assert len(all_rows) == 500 and rows == all_rows[:5]
+
+    _Tracked.read_to = 0
+    it = iter_table_rows(_Tracked(html))
+    first = [next(it) for _ in range(5)]
+    assert len(first) == 5 and _Tracked.read_to < len(html) // 10